@@ -0,0 +1,143 @@
+"""
+学习事件统计
+
+    python analyze_sessions.py                    统计所有学习者
+    python analyze_sessions.py --learner alice    只统计指定学习者
+    python analyze_sessions.py --top 30 --min-attempts 5
+
+读取 learning_data/events 下的事件日志，计算每个单词的错误率、错误率最高的单元，
+以及作答用时的分位数。统计全部用 numpy 的数组运算完成，事件数达到数百万条时也只需几秒。
+需要安装 numpy。
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+from tabulate import tabulate
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from session_log import MODES, load_events
+
+BASE_DIR = Path(__file__).absolute().parent
+
+
+def load_settings() -> dict:
+    with open(BASE_DIR / "settings.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def rank_error_rates(ids, correct, strings, top: int, min_attempts: int) -> list:
+    """
+    按错误率从高到低排列
+
+    Args:
+        ids: 每条事件所属对象（单词或单元）在字符串表中的序号
+        correct: 每条事件是否答对
+        strings: 字符串表
+        top: 返回的条数
+        min_attempts: 作答次数少于该值的对象不参与排序
+
+    Returns:
+        [名称, 作答次数, 错误次数, 错误率] 列表
+    """
+    attempts = np.bincount(ids, minlength=len(strings))
+    errors = np.bincount(ids, weights=1 - correct, minlength=len(strings))
+    candidates = np.flatnonzero(attempts >= max(min_attempts, 1))
+    rates = errors[candidates] / attempts[candidates]
+    # 错误率相同时作答次数多的排在前面
+    order = np.lexsort((-attempts[candidates], -rates))[:top]
+    return [
+        [
+            strings[candidates[i]] or "-",
+            int(attempts[candidates[i]]),
+            int(errors[candidates[i]]),
+            f"{rates[i]:.1%}",
+        ]
+        for i in order
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="学习事件统计")
+    parser.add_argument(
+        "--learner", action="append", help="只统计指定的学习者，可以重复指定"
+    )
+    parser.add_argument("--top", type=int, default=20, help="显示的条数，默认为 20")
+    parser.add_argument(
+        "--min-attempts",
+        type=int,
+        default=3,
+        help="作答次数少于该值的单词和单元不参与错误率排序，默认为 3",
+    )
+    args = parser.parse_args()
+
+    if np is None:
+        print("统计需要 numpy，请先安装: python -m pip install numpy")
+        return
+
+    event_log_settings = load_settings().get("event_log", dict())
+    root = BASE_DIR / event_log_settings.get("directory", "learning_data/events")
+    events, strings, learner_names = load_events(root, args.learner)
+
+    total = len(events["time"])
+    if total == 0:
+        print("没有学习记录")
+        return
+
+    correct = events["correct"].astype(np.float64)
+    print(
+        f"学习者: {', '.join(learner_names)}  作答次数: {total}  "
+        f"正确率: {correct.mean():.1%}"
+    )
+
+    # 用时分位数（总体和各学习模式）
+    percentiles = [50, 90, 99]
+    rows = list()
+    for mode_id, mode in enumerate(MODES):
+        response_ms = events["response_ms"][events["mode"] == mode_id]
+        if len(response_ms):
+            rows.append(
+                [mode, len(response_ms)]
+                + [
+                    f"{value / 1000:.2f}"
+                    for value in np.percentile(response_ms, percentiles)
+                ]
+            )
+    rows.append(
+        ["全部", total]
+        + [
+            f"{value / 1000:.2f}"
+            for value in np.percentile(events["response_ms"], percentiles)
+        ]
+    )
+    print("\n作答用时（秒）")
+    print(tabulate(rows, headers=["模式", "次数"] + [f"P{p}" for p in percentiles]))
+
+    print("\n错误率最高的单词")
+    print(
+        tabulate(
+            rank_error_rates(
+                events["word"], correct, strings, args.top, args.min_attempts
+            ),
+            headers=["单词", "次数", "错误", "错误率"],
+        )
+    )
+
+    print("\n错误率最高的单元")
+    print(
+        tabulate(
+            rank_error_rates(
+                events["unit"], correct, strings, args.top, args.min_attempts
+            ),
+            headers=["单元", "次数", "错误", "错误率"],
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+常驻后台的音频引擎
+
+在单独的线程里运行一个长期存在的 asyncio 事件循环，语音合成和播放都在这个循环里执行，
+不用每次朗读都新建、销毁事件循环。播放通过命令队列完成，支持：
+
+- play：打断当前播放和排队的音频，立即播放
+- enqueue：排在已有音频之后播放
+- interrupt：停止当前播放并清空队列
+- wait_until_idle：等待队列中的音频全部播放完
+
+每段音频按时长等待结束，等待期间可以被新的命令打断，不需要轮询播放状态。
+解码后的音频保存在 SoundCache 中，重复播放同一段音频时不再读盘和解码。
+
+pygame 在第一次创建引擎时才导入，只浏览菜单时不需要加载它和初始化音频设备。
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Coroutine, Optional, Union
+
+if TYPE_CHECKING:
+    import pygame
+
+# 音频来源：文件路径、文件对象，或者返回二者之一的函数（只在缓存未命中时调用）
+AudioSource = Union[str, BinaryIO, Callable[[], Union[str, BinaryIO]]]
+
+
+class SoundCache:
+    """
+    解码后的 pygame.mixer.Sound 缓存
+
+    按解码后的字节数限制总大小，超出时淘汰最久没有播放的音频。
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._sounds: OrderedDict[str, tuple["pygame.mixer.Sound", int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def estimate_size(sound: "pygame.mixer.Sound") -> int:
+        """根据时长和混音器格式估算解码后的字节数（get_raw 会复制整段数据）"""
+        import pygame
+
+        frequency, size, channels = pygame.mixer.get_init()
+        return int(sound.get_length() * frequency * channels * abs(size) // 8)
+
+    def get(self, key: str) -> Optional["pygame.mixer.Sound"]:
+        with self._lock:
+            item = self._sounds.get(key)
+            if item is None:
+                return None
+            self._sounds.move_to_end(key)
+            return item[0]
+
+    def put(self, key: str, sound: "pygame.mixer.Sound") -> None:
+        size = self.estimate_size(sound)
+        with self._lock:
+            if key in self._sounds:
+                self.total_bytes -= self._sounds.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._sounds[key] = (sound, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._sounds.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            item = self._sounds.pop(key, None)
+            if item is not None:
+                self.total_bytes -= item[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sounds.clear()
+            self.total_bytes = 0
+
+
+class _Track:
+    """队列中的一段音频，future 在播放结束或被打断时完成"""
+
+    def __init__(
+        self,
+        source: AudioSource,
+        cache_key: Optional[str],
+        future: asyncio.Future,
+        on_start: Optional[Callable[[], None]] = None,
+    ):
+        self.source = source
+        self.cache_key = cache_key
+        self.future = future
+        self.on_start = on_start
+
+
+class AudioEngine:
+    """常驻后台的音频引擎，一个进程共用一个（见 get_audio_engine）"""
+
+    def __init__(self, sound_cache_max_bytes: int = 64 * 1024 * 1024) -> None:
+        # 第一次朗读时才导入 pygame，不显示它的欢迎信息，以免打乱已经画好的界面
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        import pygame
+
+        self._pygame = pygame
+        # 音频无法解码或文件损坏时抛出的异常类型
+        self.load_error = pygame.error
+        pygame.mixer.init()
+        self.sound_cache = SoundCache(sound_cache_max_bytes)
+        # 预留一个声道专门播放语音，避免和其他声音抢声道
+        pygame.mixer.set_reserved(1)
+        self.channel = pygame.mixer.Channel(0)
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run_loop, name="audio-engine", daemon=True
+        )
+        self._thread.start()
+        self.run(self._start_player())
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _start_player(self) -> None:
+        self._queue: asyncio.Queue[_Track] = asyncio.Queue()
+        self._interrupted = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._current: Optional[_Track] = None
+        self._player_task = asyncio.create_task(self._player())
+
+    def submit(self, coroutine: Coroutine) -> concurrent.futures.Future:
+        """把协程交给引擎的事件循环执行，立即返回 Future"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine: Coroutine) -> Any:
+        """把协程交给引擎的事件循环执行，并等待结果"""
+        return self.submit(coroutine).result()
+
+    def _load_sound(
+        self, source: AudioSource, cache_key: Optional[str]
+    ) -> "pygame.mixer.Sound":
+        if cache_key is not None:
+            sound = self.sound_cache.get(cache_key)
+            if sound is not None:
+                return sound
+
+        sound = self._pygame.mixer.Sound(source() if callable(source) else source)
+        if cache_key is not None:
+            self.sound_cache.put(cache_key, sound)
+        return sound
+
+    async def _player(self) -> None:
+        while True:
+            track = await self._queue.get()
+            if track.future.done():
+                # 排队期间已被打断
+                self._update_idle()
+                continue
+
+            try:
+                sound = self._load_sound(track.source, track.cache_key)
+            except Exception as e:
+                track.future.set_exception(e)
+                self._update_idle()
+                continue
+
+            self._interrupted.clear()
+            self._current = track
+            self.channel.play(sound)
+            if track.on_start is not None:
+                track.on_start()
+            try:
+                await asyncio.wait_for(
+                    self._interrupted.wait(), timeout=sound.get_length()
+                )
+                self.channel.stop()
+            except asyncio.TimeoutError:
+                # 正常播放结束
+                pass
+            finally:
+                self._current = None
+                if not track.future.done():
+                    track.future.set_result(None)
+                self._update_idle()
+
+    def _update_idle(self) -> None:
+        if self._current is None and self._queue.empty():
+            self._idle.set()
+
+    def _interrupt_now(self) -> None:
+        """停止当前播放并清空队列（必须在引擎的事件循环中调用）"""
+        while not self._queue.empty():
+            track = self._queue.get_nowait()
+            if not track.future.done():
+                track.future.set_result(None)
+        self._interrupted.set()
+        self._update_idle()
+
+    async def _add_track(
+        self,
+        source: AudioSource,
+        cache_key: Optional[str],
+        interrupt: bool,
+        on_start: Optional[Callable[[], None]] = None,
+    ) -> None:
+        if interrupt:
+            self._interrupt_now()
+        track = _Track(source, cache_key, self.loop.create_future(), on_start)
+        self._idle.clear()
+        self._queue.put_nowait(track)
+        await track.future
+
+    async def _on_engine_loop(self, coroutine: Coroutine) -> Any:
+        """在任意事件循环中等待引擎循环上的协程"""
+        if asyncio.get_running_loop() is self.loop:
+            return await coroutine
+        return await asyncio.wrap_future(self.submit(coroutine))
+
+    async def play_async(
+        self,
+        source: AudioSource,
+        cache_key: Optional[str] = None,
+        on_start: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        打断当前播放并播放音频，播放结束或被打断后返回
+
+        Args:
+            source: 音频来源
+            cache_key: 解码缓存的键，为None时不缓存解码结果
+            on_start: 开始播放时在引擎的事件循环中调用（排队期间被打断则不会调用）
+        """
+        await self._on_engine_loop(
+            self._add_track(source, cache_key, interrupt=True, on_start=on_start)
+        )
+
+    async def enqueue_async(
+        self, source: AudioSource, cache_key: Optional[str] = None
+    ) -> None:
+        """把音频排在已有音频之后播放，播放结束或被打断后返回"""
+        await self._on_engine_loop(self._add_track(source, cache_key, interrupt=False))
+
+    def play(
+        self, source: AudioSource, cache_key: Optional[str] = None, wait: bool = True
+    ) -> None:
+        future = self.submit(self._add_track(source, cache_key, interrupt=True))
+        if wait:
+            future.result()
+
+    def enqueue(
+        self, source: AudioSource, cache_key: Optional[str] = None, wait: bool = False
+    ) -> None:
+        future = self.submit(self._add_track(source, cache_key, interrupt=False))
+        if wait:
+            future.result()
+
+    def interrupt(self) -> None:
+        self.loop.call_soon_threadsafe(self._interrupt_now)
+
+    def wait_until_idle(self) -> None:
+        self.run(self._idle.wait())
+
+
+_shared_engine: Optional[AudioEngine] = None
+_shared_engine_lock = threading.Lock()
+_shared_engine_options: dict = dict()
+
+
+def configure_audio_engine(sound_cache_max_bytes: Optional[int] = None) -> None:
+    """
+    设置共用音频引擎的参数，引擎还没有创建时在创建时生效
+
+    Args:
+        sound_cache_max_bytes: 解码后音频的内存缓存上限（字节），None为使用默认值
+    """
+    with _shared_engine_lock:
+        if sound_cache_max_bytes is None:
+            return
+        _shared_engine_options["sound_cache_max_bytes"] = sound_cache_max_bytes
+        if _shared_engine is not None:
+            _shared_engine.sound_cache.max_bytes = sound_cache_max_bytes
+
+
+def get_audio_engine() -> AudioEngine:
+    """返回进程内共用的音频引擎，第一次调用时创建"""
+    global _shared_engine
+    with _shared_engine_lock:
+        if _shared_engine is None:
+            _shared_engine = AudioEngine(**_shared_engine_options)
+        return _shared_engine
@@ -0,0 +1,262 @@
+"""
+合成语音的后处理：去掉首尾静音、统一响度
+
+合成的 mp3 首尾带有静音，en-US、en-GB 和 zh-CN 语音的响度也不一致。首尾静音让每次朗读都多等一段时间，
+听写每条提示读两遍，等待也翻倍。开启后处理后，新合成的语音在写入缓存前：
+
+1. 解码为 16 位单声道采样（WAV 直接读取，mp3 用 pygame 解码）
+2. 按 10 毫秒分帧计算能量，整体用 numpy 数组运算，比最响的一帧低 silence_threshold_db 以上的帧视为静音，
+   去掉首尾的静音帧（两端各保留 padding_ms）
+3. 按非静音部分的均方根响度调整到 target_dbfs，并限制峰值不削波
+4. 编码为 WAV 写入缓存
+
+处理在进程池中执行，批量预生成时多条语音同时处理，不占用音频引擎的事件循环。
+需要安装 numpy，处理失败时保留原始音频。
+
+慢速、快速播放（见 settings.json 的 playback_speed）也在这里完成：把缓存中的语音按 WSOLA 方法变速不变调，
+每一帧在预期位置附近找与上一帧衔接最好的位置再叠加，不需要重新合成。
+"""
+
+import asyncio
+import importlib.util
+import io
+import multiprocessing
+import os
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy
+
+# mp3 解码后的采样率（edge-tts 输出 24kHz）
+DECODE_SAMPLE_RATE = 24000
+# 允许的播放速度范围
+MIN_PLAYBACK_SPEED = 0.5
+MAX_PLAYBACK_SPEED = 2.0
+
+
+@dataclass
+class PostprocessOptions:
+    """
+    Args:
+        silence_threshold_db: 比最响的一帧低多少分贝以上视为静音（负数）
+        padding_ms: 去掉静音后两端保留的时长（毫秒）
+        target_dbfs: 非静音部分的目标均方根响度（dBFS）
+        peak_limit: 调整响度后峰值的上限（满幅为 1）
+        frame_ms: 计算能量的帧长（毫秒）
+    """
+
+    silence_threshold_db: float = -40.0
+    padding_ms: float = 30.0
+    target_dbfs: float = -20.0
+    peak_limit: float = 0.98
+    frame_ms: float = 10.0
+
+
+def decode_audio(data: bytes) -> Tuple["numpy.ndarray", int]:
+    """解码为 [-1, 1] 之间的单声道 float32 采样，返回 (采样, 采样率)"""
+    import numpy as np
+
+    if data[:4] == b"RIFF":
+        with wave.open(io.BytesIO(data)) as wav_file:
+            if wav_file.getsampwidth() != 2:
+                raise ValueError("只支持 16 位 WAV")
+            channels = wav_file.getnchannels()
+            sample_rate = wav_file.getframerate()
+            frames = wav_file.readframes(wav_file.getnframes())
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768
+        return samples.reshape(-1, channels).mean(axis=1), sample_rate
+
+    # mp3 只在进程池的子进程中用 pygame 解码，子进程不播放声音，用空的音频驱动即可
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+
+    if not pygame.mixer.get_init():
+        pygame.mixer.init(frequency=DECODE_SAMPLE_RATE, size=-16, channels=1)
+    sample_rate, size, channels = pygame.mixer.get_init()
+    raw = pygame.mixer.Sound(io.BytesIO(data)).get_raw()
+    samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    return samples.reshape(-1, channels).mean(axis=1), sample_rate
+
+
+def encode_wav(samples: "numpy.ndarray", sample_rate: int) -> bytes:
+    import numpy as np
+
+    pcm = np.clip(np.round(samples * 32767), -32768, 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def trim_and_normalize(
+    samples: "numpy.ndarray", sample_rate: int, options: PostprocessOptions
+) -> "numpy.ndarray":
+    """去掉首尾静音并调整响度（全部为数组运算，不逐个采样循环）"""
+    import numpy as np
+
+    frame_length = max(1, int(sample_rate * options.frame_ms / 1000))
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return samples
+
+    frames = samples[: frame_count * frame_length].reshape(frame_count, frame_length)
+    energy = np.mean(frames * frames, axis=1)
+    energy_db = 10 * np.log10(np.maximum(energy, 1e-12))
+    voiced = np.flatnonzero(energy_db > energy_db.max() + options.silence_threshold_db)
+    if len(voiced) == 0 or energy.max() <= 1e-12:
+        return samples
+
+    padding = int(sample_rate * options.padding_ms / 1000)
+    start = max(0, voiced[0] * frame_length - padding)
+    end = min(len(samples), (voiced[-1] + 1) * frame_length + padding)
+    trimmed = samples[start:end]
+
+    voiced_rms = np.sqrt(np.mean(energy[voiced]))
+    gain = 10 ** ((options.target_dbfs - 20 * np.log10(voiced_rms)) / 20)
+    peak = np.max(np.abs(trimmed))
+    if peak * gain > options.peak_limit:
+        gain = options.peak_limit / peak
+    return trimmed * np.float32(gain)
+
+
+def check_playback_speed(speed: float) -> None:
+    if not MIN_PLAYBACK_SPEED <= speed <= MAX_PLAYBACK_SPEED:
+        raise ValueError(
+            f"播放速度 {speed} 超出范围，应在 {MIN_PLAYBACK_SPEED} 到 {MAX_PLAYBACK_SPEED} 之间"
+        )
+
+
+def time_stretch(
+    samples: "numpy.ndarray",
+    sample_rate: int,
+    speed: float,
+    frame_ms: float = 40.0,
+    tolerance_ms: float = 10.0,
+) -> "numpy.ndarray":
+    """
+    WSOLA 变速不变调
+
+    输出每隔半帧放一帧（汉宁窗），输入中对应的位置按 speed 前进；每一帧在预期位置前后 tolerance_ms 内
+    找与上一帧的自然延续最相似的位置（互相关最大），避免叠加时相位抵消产生杂音。
+
+    Args:
+        speed: 播放速度，小于 1 变慢，大于 1 变快
+    """
+    import numpy as np
+
+    check_playback_speed(speed)
+    frame_length = max(2, int(sample_rate * frame_ms / 1000))
+    hop = frame_length // 2
+    tolerance = int(sample_rate * tolerance_ms / 1000)
+    output_length = int(len(samples) / speed)
+    if speed == 1 or len(samples) < frame_length:
+        return samples
+
+    window = np.hanning(frame_length).astype(np.float32)
+    padded = np.concatenate(
+        [
+            np.zeros(tolerance, np.float32),
+            samples.astype(np.float32),
+            np.zeros(frame_length * 2 + tolerance, np.float32),
+        ]
+    )
+    frame_count = output_length // hop + 1
+    output = np.zeros(frame_count * hop + frame_length, np.float32)
+    weight = np.zeros_like(output)
+
+    previous = tolerance
+    for index in range(frame_count):
+        expected = tolerance + int(round(index * hop * speed))
+        if index == 0:
+            position = expected
+        else:
+            continuation = padded[previous + hop : previous + hop + frame_length]
+            start = max(0, expected - tolerance)
+            region = padded[start : expected + tolerance + frame_length]
+            similarity = np.correlate(region, continuation, mode="valid")
+            position = start + int(np.argmax(similarity))
+        output[index * hop : index * hop + frame_length] += (
+            padded[position : position + frame_length] * window
+        )
+        weight[index * hop : index * hop + frame_length] += window
+        previous = position
+
+    return (output / np.maximum(weight, 1e-3))[:output_length]
+
+
+def stretch_audio(data: bytes, speed: float) -> bytes:
+    """把一条语音变速（在进程池中执行），返回 WAV"""
+    samples, sample_rate = decode_audio(data)
+    return encode_wav(time_stretch(samples, sample_rate, speed), sample_rate)
+
+
+def process_audio(data: bytes, options: dict) -> Tuple[bytes, float]:
+    """
+    处理一条合成结果（在进程池中执行）
+
+    Returns:
+        (处理后的 WAV, 去掉的时长（秒）)
+    """
+    samples, sample_rate = decode_audio(data)
+    processed = trim_and_normalize(samples, sample_rate, PostprocessOptions(**options))
+    return (
+        encode_wav(processed, sample_rate),
+        (len(samples) - len(processed)) / sample_rate,
+    )
+
+
+def postprocess_available() -> bool:
+    """是否安装了 numpy（只查找，不导入）"""
+    return importlib.util.find_spec("numpy") is not None
+
+
+class AudioPostprocessor:
+    """把后处理交给进程池执行，进程池在第一次使用时创建"""
+
+    def __init__(self, workers: Optional[int] = None, **options):
+        """
+        Args:
+            workers: 进程池的进程数，None 为 CPU 核数
+            options: PostprocessOptions 的参数
+        """
+        if not postprocess_available():
+            raise ValueError(
+                "语音后处理需要 numpy，请先安装: python -m pip install numpy"
+            )
+        self.options = asdict(PostprocessOptions(**options))
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 音频引擎等后台线程已经在运行，用 spawn 启动子进程，避免 fork 带走线程持有的锁
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def process(self, data: bytes) -> Tuple[bytes, float]:
+        """在进程池中处理一条音频，返回 (处理后的音频, 去掉的时长)"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, process_audio, data, self.options
+        )
+
+    async def stretch(self, data: bytes, speed: float) -> bytes:
+        """在进程池中把一条音频变速，返回 WAV"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, stretch_audio, data, speed
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,583 @@
+"""
+性能基准测试
+
+    python benchmark.py                              运行全部测试，结果写入 benchmark_results/
+    python benchmark.py --only parse --only cache    只运行名称以这些前缀开头的测试
+    python benchmark.py --quick                      用较小的规模快速跑一遍
+    python benchmark.py --compare benchmark_results/20260101_120000.json
+                                                     与之前的结果比较，变慢超过阈值时返回码为 1
+
+测试内容：
+
+- parse：在临时目录中生成不同规模的单词本，测量 parse_all_word_books 的完整解析、写快照和读快照
+- cache：缓存清单中有 1 万到 10 万条记录时，测量 _get_cache_file_path、is_cached（命中/未命中）、
+  get_uncached 和清单写入
+- pregenerate：用离线合成后端（固定延迟和失败率）测量 pregenerate_voices 的吞吐量
+- postprocess：开启和关闭语音后处理（去首尾静音、统一响度）时的预生成耗时和语音总时长
+- quiz：用脚本输入（ScriptedIO）和不出声的音频引擎跑完 process_section 和 dictation，测量每道题的耗时
+
+所有测试都在临时目录中进行，不会读写 profiles、data、voice_cache 和 .cache。
+结果为 JSON，每项记录中位数、最小值、重复次数和每秒处理条数，可以直接比较两次运行。
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from py_handle_profiles import handle_configuration_files, handle_word_books
+from session_io import NullAudioEngine, ScriptedIO
+from voice_player_with_cache import VoicePlayerWithCache
+from word_learner import WordLearner
+
+BASE_DIR = Path(__file__).absolute().parent
+RESULTS_DIR = BASE_DIR / "benchmark_results"
+RESULTS_VERSION = 1
+
+EN_VOICE = "en-US-AriaNeural"
+ZH_VOICE = "zh-CN-XiaoxiaoNeural"
+
+
+def measure(
+    func: Callable[[], Any],
+    repeats: int,
+    setup: Optional[Callable[[], Any]] = None,
+) -> List[float]:
+    """重复执行 func，返回每次的耗时（秒），setup 的耗时不计入"""
+    timings = list()
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def make_result(
+    name: str, params: Dict[str, Any], items: int, timings: List[float]
+) -> Dict[str, Any]:
+    median = statistics.median(timings)
+    return {
+        "name": name,
+        "params": params,
+        "items": items,
+        "repeats": len(timings),
+        "median_seconds": median,
+        "min_seconds": min(timings),
+        "items_per_second": items / median if median > 0 else None,
+    }
+
+
+def write_synthetic_library(root: Path, word_count: int) -> None:
+    """
+    在 root 下生成 profiles 和 data 目录
+
+    每个数据文件 20 个单元、每单元 50 个单词和 5 个短语，每个单词本用 auto 方式引用 5 个数据文件，
+    释义中混入常用词，与真实单词本一样有大量重复的词性和释义。
+    """
+    profiles_dir = root / "profiles"
+    data_dir = root / "data"
+    profiles_dir.mkdir(parents=True)
+    data_dir.mkdir(parents=True)
+
+    rng = random.Random(word_count)
+    parts_of_speech = ["n.", "v.", "adj.", "adv.", "prep.", "conj."]
+    common_meanings = ["学习", "时间", "朋友", "重要的", "快速地", "问题", "世界"]
+    units_per_file, words_per_unit = 20, 50
+    file_count = max(1, word_count // (units_per_file * words_per_unit))
+
+    serial = 0
+    for file_index in range(file_count):
+        data = dict()
+        for unit_index in range(units_per_file):
+            words = list()
+            for _ in range(words_per_unit):
+                serial += 1
+                words.append(
+                    {
+                        "word": f"word{serial}",
+                        "phonetic_symbol": f"/wɜːd{serial}/",
+                        "meaning": f"{rng.choice(common_meanings)}{serial}",
+                        "part_of_speech": rng.choice(parts_of_speech),
+                    }
+                )
+            phrases = [
+                {"phrase": f"phrase {serial} {i}", "meaning": f"短语{serial}_{i}"}
+                for i in range(5)
+            ]
+            data[f"unit{unit_index + 1}"] = {"words": words, "phrases": phrases}
+        with open(data_dir / f"vocab_{file_index}.json", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    for book_index in range(0, file_count, 5):
+        content = [
+            {
+                "name": f"第{file_index + 1}册",
+                "generate_method": "auto",
+                "content": {
+                    "data_file_name": f"vocab_{file_index}.json",
+                    "unit_keys": [f"unit{i + 1}" for i in range(units_per_file)],
+                },
+            }
+            for file_index in range(book_index, min(book_index + 5, file_count))
+        ]
+        with open(profiles_dir / f"book_{book_index}.json", "w", encoding="utf-8") as f:
+            json.dump(
+                {"book_name": f"单词本{book_index}", "content": content},
+                f,
+                ensure_ascii=False,
+            )
+
+
+@contextlib.contextmanager
+def use_library(root: Path):
+    """临时把单词本解析模块的目录指向 root 下的 profiles、data 和 .cache"""
+    saved = (
+        handle_word_books.PROFILES_DIR,
+        handle_word_books.DATA_DIR,
+        handle_word_books.SNAPSHOT_PATH,
+        handle_configuration_files.DATA_DIR,
+        handle_configuration_files.DATA_FILE_INDEX_DIR,
+    )
+    handle_word_books.PROFILES_DIR = str(root / "profiles")
+    handle_word_books.DATA_DIR = str(root / "data")
+    handle_word_books.SNAPSHOT_PATH = str(root / ".cache" / "snapshot.pickle")
+    handle_configuration_files.DATA_DIR = str(root / "data")
+    handle_configuration_files.DATA_FILE_INDEX_DIR = str(root / ".cache" / "index")
+    try:
+        yield
+    finally:
+        (
+            handle_word_books.PROFILES_DIR,
+            handle_word_books.DATA_DIR,
+            handle_word_books.SNAPSHOT_PATH,
+            handle_configuration_files.DATA_DIR,
+            handle_configuration_files.DATA_FILE_INDEX_DIR,
+        ) = saved
+        clear_data_file_caches()
+
+
+def clear_data_file_caches() -> None:
+    handle_configuration_files._data_file_cache.clear()
+    handle_configuration_files._data_file_index_cache.clear()
+    handle_configuration_files._data_unit_cache.clear()
+
+
+def bench_parse(scales: List[int], repeats: int) -> List[Dict[str, Any]]:
+    results = list()
+    for word_count in scales:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            write_synthetic_library(root, word_count)
+            params = {"words": word_count}
+            snapshot_path = root / ".cache" / "snapshot.pickle"
+
+            with use_library(root):
+
+                def remove_snapshot() -> None:
+                    clear_data_file_caches()
+                    snapshot_path.unlink(missing_ok=True)
+
+                results.append(
+                    make_result(
+                        "parse.full",
+                        params,
+                        word_count,
+                        measure(
+                            lambda: handle_word_books.parse_all_word_books(False),
+                            repeats,
+                            setup=clear_data_file_caches,
+                        ),
+                    )
+                )
+                results.append(
+                    make_result(
+                        "parse.full_and_write_snapshot",
+                        params,
+                        word_count,
+                        measure(
+                            handle_word_books.parse_all_word_books,
+                            repeats,
+                            setup=remove_snapshot,
+                        ),
+                    )
+                )
+                results.append(
+                    make_result(
+                        "parse.read_snapshot",
+                        params,
+                        word_count,
+                        measure(handle_word_books.parse_all_word_books, repeats),
+                    )
+                )
+    return results
+
+
+def bench_cache(scales: List[int], repeats: int) -> List[Dict[str, Any]]:
+    results = list()
+    for entry_count in scales:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            player = VoicePlayerWithCache(
+                cache_dir=temp_dir, default_voice=EN_VOICE, backend="offline"
+            )
+            texts = [f"word{i}" for i in range(entry_count)]
+            for text in texts:
+                player.manifest.add(
+                    player.get_file_name(text, EN_VOICE), EN_VOICE, text, 4096, 0.5
+                )
+            missing_texts = [f"missing{i}" for i in range(entry_count)]
+            half_cached = texts[::2] + missing_texts[::2]
+            params = {"entries": entry_count}
+
+            def lookup_paths() -> None:
+                for text in texts:
+                    player._get_cache_file_path(text)
+
+            def lookup_hits() -> None:
+                for text in texts:
+                    player.is_cached(text)
+
+            def lookup_misses() -> None:
+                for text in missing_texts:
+                    player.is_cached(text)
+
+            for name, func, items in (
+                ("cache.get_cache_file_path", lookup_paths, entry_count),
+                ("cache.is_cached_hit", lookup_hits, entry_count),
+                ("cache.is_cached_miss", lookup_misses, entry_count),
+                (
+                    "cache.get_uncached_batch",
+                    lambda: player.get_uncached(half_cached),
+                    len(half_cached),
+                ),
+            ):
+                results.append(make_result(name, params, items, measure(func, repeats)))
+
+            # 每次写入前都要有改动，否则 save 直接返回
+            def touch_one() -> None:
+                player.manifest.touch(player.get_file_name(texts[0], EN_VOICE))
+
+            results.append(
+                make_result(
+                    "cache.manifest_save",
+                    params,
+                    entry_count,
+                    measure(player.manifest.save, repeats, setup=touch_one),
+                )
+            )
+    return results
+
+
+def bench_pregenerate(scales: List[int], repeats: int) -> List[Dict[str, Any]]:
+    results = list()
+    for word_count in scales:
+        for latency, failure_rate in ((0.02, 0.0), (0.02, 0.05)):
+            params = {
+                "words": word_count,
+                "latency": latency,
+                "failure_rate": failure_rate,
+            }
+            timings = list()
+            final_concurrency = list()
+            failed = 0
+            for repeat in range(repeats):
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    player = VoicePlayerWithCache(
+                        cache_dir=temp_dir,
+                        default_voice=EN_VOICE,
+                        retry_base_delay=0.01,
+                        retry_max_delay=0.1,
+                        backend="offline",
+                        backend_options={
+                            "latency": latency,
+                            "latency_jitter": latency,
+                            "failure_rate": failure_rate,
+                            "seed": repeat,
+                        },
+                    )
+                    words = [f"word{i}" for i in range(word_count)]
+                    start = time.perf_counter()
+                    report = asyncio.run(
+                        player.pregenerate_voices(words, show_progress_bar=False)
+                    )
+                    timings.append(time.perf_counter() - start)
+                    final_concurrency.append(report.final_concurrency)
+                    failed += len(report.failed)
+            result = make_result("pregenerate.offline", params, word_count, timings)
+            result["final_concurrency"] = final_concurrency
+            result["failed"] = failed
+            results.append(result)
+    return results
+
+
+def bench_postprocess(scales: List[int], repeats: int) -> List[Dict[str, Any]]:
+    """
+    对比开启和关闭语音后处理时的预生成耗时和缓存中语音的总时长
+
+    离线后端在每条语音首尾各加 0.3 秒静音，模拟在线合成结果中的静音。
+    """
+    results = list()
+    for word_count in scales:
+        for enabled in (False, True):
+            params = {"words": word_count, "postprocess": enabled}
+            timings = list()
+            audio_seconds = 0.0
+            for repeat in range(repeats):
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    player = VoicePlayerWithCache(
+                        cache_dir=temp_dir,
+                        default_voice=EN_VOICE,
+                        max_concurrency=32,
+                        min_concurrency=8,
+                        backend="offline",
+                        backend_options={"latency": 0, "silence": 0.3},
+                        postprocess={"enabled": enabled},
+                    )
+                    words = [f"word{i}" for i in range(word_count)]
+                    start = time.perf_counter()
+                    asyncio.run(
+                        player.pregenerate_voices(words, show_progress_bar=False)
+                    )
+                    timings.append(time.perf_counter() - start)
+                    audio_seconds = sum(
+                        entry["duration"] for entry in player.manifest.entries.values()
+                    )
+                    if player.postprocessor is not None:
+                        player.postprocessor.shutdown()
+            result = make_result("postprocess.pregenerate", params, word_count, timings)
+            # 朗读这些语音需要的总时长，即每条语音带给学习过程的等待
+            result["audio_seconds"] = audio_seconds
+            results.append(result)
+    return results
+
+
+def create_quiz_learner(cache_dir: str, io: ScriptedIO) -> WordLearner:
+    return WordLearner(
+        ZH_VOICE,
+        EN_VOICE,
+        voice_player_options={
+            "cache_dir": cache_dir,
+            "backend": "offline",
+            "backend_options": {"latency": 0},
+            "audio_engine": NullAudioEngine(),
+        },
+        io=io,
+    )
+
+
+def make_quiz_items(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "word": f"word{i}",
+            "phonetic_symbol": f"/wɜːd{i}/",
+            "meaning": f"释义{i}",
+            "part_of_speech": "n.",
+        }
+        for i in range(count)
+    ]
+
+
+def bench_quiz(scales: List[int], repeats: int) -> List[Dict[str, Any]]:
+    results = list()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for item_count in scales:
+            items = make_quiz_items(item_count)
+
+            for learning, accuracy in ((True, 1.0), (False, 1.0), (False, 0.9)):
+                params = {
+                    "items": item_count,
+                    "learning": learning,
+                    "accuracy": accuracy,
+                }
+                learner = create_quiz_learner(
+                    temp_dir, ScriptedIO(items, accuracy, seed=0, keep_output=False)
+                )
+                # 先把语音生成好，测量的是学习过程本身
+                learner.audio_engine.run(
+                    learner.voice_player.pregenerate_voices(
+                        [item["word"] for item in items], show_progress_bar=False
+                    )
+                )
+
+                def run_section() -> None:
+                    learner.process_section(items, "words", "word", learning)
+                    learner.audio_engine.wait_until_idle()
+
+                results.append(
+                    make_result(
+                        "quiz.process_section",
+                        params,
+                        item_count,
+                        measure(run_section, repeats),
+                    )
+                )
+                learner.voice_player.manifest.save()
+
+            learner = create_quiz_learner(
+                temp_dir, ScriptedIO(items, seed=0, keep_output=False)
+            )
+
+            def run_dictation() -> None:
+                learner.dictation(
+                    {"words": list(items), "phrases": []},
+                    delay=0,
+                    use_dictation_start_sound=True,
+                )
+
+            # 第一次运行生成听写提示的语音，不计入
+            run_dictation()
+            results.append(
+                make_result(
+                    "quiz.dictation",
+                    {"items": item_count},
+                    item_count,
+                    measure(run_dictation, repeats),
+                )
+            )
+            learner.voice_player.manifest.save()
+    return results
+
+
+BENCHMARKS: Dict[str, Callable[[List[int], int], List[Dict[str, Any]]]] = {
+    "parse": bench_parse,
+    "cache": bench_cache,
+    "pregenerate": bench_pregenerate,
+    "postprocess": bench_postprocess,
+    "quiz": bench_quiz,
+}
+
+# (完整规模, --quick 规模)
+SCALES: Dict[str, tuple] = {
+    "parse": ([1_000, 10_000, 100_000], [1_000, 10_000]),
+    "cache": ([10_000, 30_000, 100_000], [10_000]),
+    "pregenerate": ([200, 1_000], [200]),
+    "postprocess": ([200, 1_000], [200]),
+    "quiz": ([100, 500], [100]),
+}
+
+
+def get_git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_result_key(result: Dict[str, Any]) -> str:
+    return f"{result['name']} {json.dumps(result['params'], sort_keys=True)}"
+
+
+def compare_results(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float
+) -> List[str]:
+    """
+    比较两次运行的结果并输出每项的变化
+
+    Returns:
+        中位数耗时比基准慢 threshold（如 0.2 为 20%）以上的测试项
+    """
+    baseline_results = {get_result_key(r): r for r in baseline["results"]}
+    regressions = list()
+    print(f"\n与 {baseline.get('git_commit') or '基准'} 比较（中位数耗时）")
+    for result in current["results"]:
+        key = get_result_key(result)
+        old = baseline_results.get(key)
+        if old is None or not old["median_seconds"]:
+            continue
+        ratio = result["median_seconds"] / old["median_seconds"]
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  <-- 变慢"
+            regressions.append(key)
+        print(f"  {ratio:6.2f}x  {key}{mark}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="性能基准测试")
+    parser.add_argument(
+        "--only",
+        action="append",
+        help=f"只运行名称以此开头的测试（{', '.join(BENCHMARKS)}），可以重复指定",
+    )
+    parser.add_argument("--quick", action="store_true", help="用较小的规模运行")
+    parser.add_argument("--repeats", type=int, default=5, help="每项重复次数，默认为 5")
+    parser.add_argument(
+        "--output", type=Path, help="结果文件路径，默认写入 benchmark_results/"
+    )
+    parser.add_argument("--compare", type=Path, help="与之前的结果文件比较")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="比较时耗时增加超过该比例视为变慢，默认为 0.2",
+    )
+    args = parser.parse_args()
+
+    selected = [
+        name
+        for name in BENCHMARKS
+        if not args.only or any(name.startswith(prefix) for prefix in args.only)
+    ]
+    if not selected:
+        print(f"没有匹配的测试，可选: {', '.join(BENCHMARKS)}")
+        return
+
+    results = list()
+    for name in selected:
+        scales = SCALES[name][1 if args.quick else 0]
+        print(f"运行 {name}（规模 {scales}）...")
+        for result in BENCHMARKS[name](scales, args.repeats):
+            results.append(result)
+            rate = result["items_per_second"]
+            print(
+                f"  {result['name']:32} {json.dumps(result['params']):60} "
+                f"{result['median_seconds'] * 1000:10.2f} ms"
+                + (f" {rate:12.0f} 条/秒" if rate else "")
+            )
+
+    current = {
+        "version": RESULTS_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": get_git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "results": results,
+    }
+    output = args.output or (
+        RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {output}")
+
+    if args.compare is not None:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, current, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} 项变慢超过 {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
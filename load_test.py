@@ -0,0 +1,343 @@
+"""
+多人学习压力测试
+
+    python load_test.py --learners 40                        40 个模拟学习者同时练习同一批单元
+    python load_test.py --learners 40 --mode dictation --pause-scale 0.1
+    python load_test.py --learners 10 --spread --accuracy 0.7 --think-time 1 --typing-delay 0.1
+
+每个模拟学习者是一个独立的进程（与机房里每台机器各运行一个 main.py 相同），用 ScriptedIO 自动作答、
+用不出声的音频引擎播放，所有进程共用同一个语音缓存目录。结束后输出每个学习者的用时、
+整体的吞吐量（每秒完成的题数）、缓存命中和重复合成的次数，可以用 --output 保存为 JSON。
+
+默认使用离线合成后端和单独的缓存目录 .cache/load_test_voice_cache，不会把测试音频写进 voice_cache；
+需要测试真实的合成服务时指定 --backend edge。
+
+指定 --server 时每个模拟学习者作为瘦客户端连接语音服务器（见 voice_server.py），
+单元内容和语音都从服务器读取，结束后输出服务器语音缓存增加的条数，即整个机房合成的次数。
+"""
+
+import argparse
+import json
+import random
+import shutil
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from metrics import configure_metrics
+from py_handle_profiles.handle_word_books import parse_all_word_books
+from py_handle_profiles.word_search import iter_units_with_path
+from session_io import NullAudioEngine, ScriptedIO
+from voice_client import RemoteVoicePlayer, RemoteWordBookNode, VoiceServerClient
+from voice_player_with_cache import (
+    get_playback_speed,
+    voice_player_options_from_settings,
+)
+from word_learner import WordLearner
+
+BASE_DIR = Path(__file__).absolute().parent
+DEFAULT_CACHE_DIR = ".cache/load_test_voice_cache"
+MODES = ("practice", "learn", "dictation", "browse")
+
+
+def load_settings() -> dict:
+    with open(BASE_DIR / "settings.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def choose_units(
+    learners: int, units_per_learner: int, spread: bool, seed: int
+) -> List[List[Tuple[str, ...]]]:
+    """
+    为每个学习者选出要学习的单元
+
+    Args:
+        spread: 为 False 时所有人学习同一批单元（同一节课），为 True 时每人各自随机选
+    """
+    paths = [
+        path
+        for path, unit_data in iter_units_with_path(parse_all_word_books())
+        if unit_data["words"] or unit_data["phrases"]
+    ]
+    if not paths:
+        raise ValueError("没有可用的单元，请检查 profiles 目录")
+    rng = random.Random(seed)
+    count = min(units_per_learner, len(paths))
+    if not spread:
+        return [rng.sample(paths, count)] * learners
+    return [rng.sample(paths, count) for _ in range(learners)]
+
+
+def get_unit_data(word_books: dict, path: Tuple[str, ...]) -> dict:
+    node = word_books
+    for key in path:
+        node = node[key]
+    # 听写会打乱列表，每个学习者使用自己的副本
+    return {"words": list(node["words"]), "phrases": list(node["phrases"])}
+
+
+def run_learner(options: Dict[str, Any]) -> Dict[str, Any]:
+    """在子进程中运行一个模拟学习者，返回统计结果"""
+    registry = configure_metrics(enabled=True)
+    settings = load_settings()
+    default_en_voice = settings["voice"][settings["voice"]["english_pronunciation"]]
+    if options["server"] is None:
+        word_books = parse_all_word_books()
+        voice_player = None
+    else:
+        client = VoiceServerClient(options["server"])
+        word_books = RemoteWordBookNode(client)
+        voice_player = RemoteVoicePlayer(
+            client,
+            default_voice=default_en_voice,
+            audio_engine=NullAudioEngine(),
+            playback_speed=get_playback_speed(settings),
+        )
+    units = [get_unit_data(word_books, tuple(path)) for path in options["units"]]
+    items = [item for unit in units for item in unit["words"] + unit["phrases"]]
+
+    io = ScriptedIO(
+        items,
+        accuracy=options["accuracy"],
+        think_time=options["think_time"],
+        typing_delay=options["typing_delay"],
+        pause_scale=options["pause_scale"],
+        seed=options["seed"],
+        keep_output=False,
+    )
+    learner = WordLearner(
+        default_zh_cn_voice=settings["voice"]["zh-CN"],
+        default_en_voice=default_en_voice,
+        voice_player_options={
+            **voice_player_options_from_settings(settings),
+            "cache_dir": options["cache_dir"],
+            "backend": options["backend"],
+            "backend_options": options["backend_options"],
+            "audio_engine": NullAudioEngine(),
+        },
+        prefetch_lookahead=options["prefetch_lookahead"],
+        io=io,
+        voice_player=voice_player,
+    )
+
+    start_time = time.monotonic()
+    for unit in units:
+        if options["mode"] == "practice":
+            learner.fast_view(unit, learning=False)
+        elif options["mode"] == "learn":
+            learner.fast_view(unit, learning=True)
+        elif options["mode"] == "dictation":
+            learner.dictation(
+                unit,
+                delay=settings["dictation_delay"],
+                use_dictation_start_sound=settings["use_dictation_start_sound"],
+            )
+        else:
+            learner.words_browse(unit)
+    learner.audio_engine.wait_until_idle()
+    elapsed = time.monotonic() - start_time
+    if voice_player is None:
+        learner.voice_player.manifest.save()
+
+    metrics = registry.to_json()
+    return {
+        "learner": options["learner"],
+        "items": len(items),
+        "answered": io.answered,
+        "correct": io.correct,
+        "elapsed": elapsed,
+        "counters": metrics["counters"],
+        "histograms": {
+            name: {"count": value["count"], "sum": value["sum"]}
+            for name, value in metrics["histograms"].items()
+        },
+    }
+
+
+def summarize(results: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+    def total_counter(name: str) -> float:
+        return sum(result["counters"].get(name, 0) for result in results)
+
+    def mean_histogram(name: str) -> float | None:
+        count = sum(r["histograms"].get(name, {}).get("count", 0) for r in results)
+        total = sum(r["histograms"].get(name, {}).get("sum", 0) for r in results)
+        return total / count if count else None
+
+    elapsed = sorted(result["elapsed"] for result in results)
+    items = sum(result["items"] for result in results)
+    return {
+        "learners": len(results),
+        "wall_seconds": wall_time,
+        "items": items,
+        "items_per_second": items / wall_time if wall_time > 0 else None,
+        "session_seconds": {
+            "p50": statistics.median(elapsed),
+            "p90": elapsed[min(len(elapsed) - 1, int(len(elapsed) * 0.9))],
+            "max": elapsed[-1],
+        },
+        "answers": sum(result["answered"] for result in results),
+        "correct": sum(result["correct"] for result in results),
+        "cache_hits": total_counter("voice_cache_hits_total"),
+        "cache_misses": total_counter("voice_cache_misses_total"),
+        "synthesis_requests": sum(
+            r["histograms"].get("voice_synthesis_seconds", {}).get("count", 0)
+            for r in results
+        ),
+        "synthesis_retries": total_counter("voice_synthesis_retries_total"),
+        "mean_synthesis_seconds": mean_histogram("voice_synthesis_seconds"),
+        "mean_cache_write_seconds": mean_histogram("voice_cache_write_seconds"),
+        "mean_playback_start_seconds": mean_histogram("voice_playback_start_seconds"),
+        "mean_server_fetch_seconds": mean_histogram("voice_server_fetch_seconds"),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="多人学习压力测试")
+    parser.add_argument("--learners", type=int, default=10, help="模拟学习者数量")
+    parser.add_argument("--mode", choices=MODES, default="practice", help="学习方式")
+    parser.add_argument("--units", type=int, default=1, help="每人学习的单元数")
+    parser.add_argument(
+        "--spread",
+        action="store_true",
+        help="每人随机选择不同的单元，默认所有人学习同一批",
+    )
+    parser.add_argument("--accuracy", type=float, default=0.85, help="答对的概率")
+    parser.add_argument(
+        "--think-time", type=float, default=0.0, help="每次输入前的等待（秒）"
+    )
+    parser.add_argument(
+        "--typing-delay", type=float, default=0.0, help="每输入一个字符的等待（秒）"
+    )
+    parser.add_argument(
+        "--pause-scale",
+        type=float,
+        default=0.0,
+        help="程序主动等待的时间（如听写间隔）乘以该比例，默认为 0 即不等待",
+    )
+    parser.add_argument(
+        "--backend", default="offline", help="语音合成后端，默认为离线后端"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.3, help="离线后端每次合成的延迟（秒）"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"共用的语音缓存目录（相对于程序目录），默认为 {DEFAULT_CACHE_DIR}",
+    )
+    parser.add_argument(
+        "--clear-cache", action="store_true", help="开始前清空该缓存目录，测量冷启动"
+    )
+    parser.add_argument(
+        "--server",
+        help="作为瘦客户端连接语音服务器，例如 http://127.0.0.1:8765（此时 --backend 等缓存参数不起作用）",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    parser.add_argument("--output", type=Path, help="把结果保存为 JSON 文件")
+    args = parser.parse_args()
+
+    settings = load_settings()
+    prefetch_settings = settings.get("prefetch", dict())
+    prefetch_lookahead = (
+        prefetch_settings.get("lookahead", 5)
+        if prefetch_settings.get("enabled", False)
+        else 0
+    )
+
+    cache_dir = BASE_DIR / args.cache_dir
+    if args.clear_cache and cache_dir.exists():
+        if cache_dir.resolve() == (BASE_DIR / "voice_cache").resolve():
+            raise ValueError("不能用 --clear-cache 清空正式的语音缓存目录 voice_cache")
+        shutil.rmtree(cache_dir)
+
+    units = choose_units(args.learners, args.units, args.spread, args.seed)
+    options = [
+        {
+            "learner": index,
+            "units": units[index],
+            "mode": args.mode,
+            "accuracy": args.accuracy,
+            "think_time": args.think_time,
+            "typing_delay": args.typing_delay,
+            "pause_scale": args.pause_scale,
+            "seed": args.seed + index,
+            "cache_dir": str(cache_dir),
+            "backend": args.backend,
+            "backend_options": (
+                {"latency": args.latency, "seed": args.seed + index}
+                if args.backend == "offline"
+                else {}
+            ),
+            "prefetch_lookahead": prefetch_lookahead,
+            "server": args.server,
+        }
+        for index in range(args.learners)
+    ]
+
+    print(
+        f"{args.learners} 个学习者，模式 {args.mode}，"
+        f"单元: {' | '.join(' -> '.join(path) for path in units[0])}"
+        + (" 等" if args.spread else "")
+    )
+    client = VoiceServerClient(args.server) if args.server else None
+    server_status = client.get_status() if client is not None else None
+    start_time = time.monotonic()
+    with ProcessPoolExecutor(max_workers=args.learners) as executor:
+        results = list(executor.map(run_learner, options))
+    wall_time = time.monotonic() - start_time
+
+    summary = summarize(results, wall_time)
+    if client is not None:
+        summary["server_synthesized"] = (
+            client.get_status()["cache_entries"] - server_status["cache_entries"]
+        )
+    for result in results:
+        print(
+            f"  学习者 {result['learner']:3}: {result['items']} 题 "
+            f"{result['elapsed']:.2f} 秒，答对 {result['correct']}/{result['answered']}"
+        )
+    print(
+        f"\n总用时 {wall_time:.2f} 秒，共 {summary['items']} 题，"
+        f"{summary['items_per_second']:.1f} 题/秒"
+    )
+    print(
+        f"学习者用时 P50 {summary['session_seconds']['p50']:.2f} 秒，"
+        f"P90 {summary['session_seconds']['p90']:.2f} 秒，"
+        f"最长 {summary['session_seconds']['max']:.2f} 秒"
+    )
+    print(
+        f"缓存命中 {summary['cache_hits']:.0f}，未命中 {summary['cache_misses']:.0f}，"
+        f"合成请求 {summary['synthesis_requests']}，重试 {summary['synthesis_retries']:.0f}"
+    )
+    for key, label in (
+        ("mean_synthesis_seconds", "平均合成耗时"),
+        ("mean_cache_write_seconds", "平均缓存写入耗时"),
+        ("mean_playback_start_seconds", "平均开始播放延迟"),
+        ("mean_server_fetch_seconds", "平均从服务器下载语音耗时"),
+    ):
+        if summary[key] is not None:
+            print(f"{label} {summary[key] * 1000:.1f} 毫秒")
+    if "server_synthesized" in summary:
+        print(
+            f"服务器语音缓存新增 {summary['server_synthesized']} 条（整个机房的合成次数）"
+        )
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "args": vars(args) | {"output": str(args.output)},
+                    "summary": summary,
+                    "learners": results,
+                },
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        print(f"\n结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,45 @@
 import colorama
 from time import sleep
 from word_learner import WordLearner
-from py_handle_profiles.handle_word_books import parse_all_word_books
+from voice_player_with_cache import (
+    PLAYBACK_SPEED_MODES,
+    get_playback_speed,
+    voice_player_options_from_settings,
+)
+from audio_postprocess import postprocess_available
+from py_handle_profiles.handle_word_books import build_lazy_word_books
+from py_handle_profiles.word_search import WordSearchIndex, build_word_search_index
+from session_log import SessionEventLog
+from spaced_repetition import ReviewScheduler
+from metrics import configure_metrics
+from startup_report import StartupTimer, print_startup_report
+from voice_client import RemoteVoicePlayer, RemoteWordBookNode, VoiceServerClient
 from colorama import Fore
+from collections.abc import Mapping
+from pathlib import Path
+import argparse
+import getpass
 import json
 import os
 
+PLAYBACK_SPEED_NAMES = {"normal": "正常", "slow": "慢速", "fast": "快速"}
+
 
 class WordLearningApp:
     """以page_path为准，current_content有滞后性"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        startup_timer: StartupTimer | None = None,
+        server_url: str | None = None,
+    ):
+        """
+        Args:
+            startup_timer: 记录初始化各阶段耗时（见 --startup-report），默认不输出
+            server_url: 语音服务器地址（见 voice_server.py），默认使用 settings.json 中 server 的 url，
+                都没有设置时在本机解析单词本和合成语音
+        """
+        self.startup_timer = startup_timer or StartupTimer()
 
         self.settings_path = os.path.join(
             os.path.dirname(os.path.abspath(__file__)), "settings.json"
@@ -18,6 +47,10 @@ class WordLearningApp:
         with open(self.settings_path, "r", encoding="utf-8") as f:
             self.settings = json.load(f)
         self.voice_settings = self.settings["voice"]
+        self.configure_metrics()
+        server_url = server_url or self.settings.get("server", dict()).get("url")
+        self.server = VoiceServerClient(server_url) if server_url else None
+        self.startup_timer.mark("读取设置")
 
         self.page_path = list()
         self.learner: WordLearner = WordLearner(
@@ -25,18 +58,97 @@ class WordLearningApp:
             default_en_voice=self.voice_settings[
                 self.voice_settings["english_pronunciation"]
             ],
+            voice_player_options=voice_player_options_from_settings(self.settings),
+            prefetch_lookahead=self.get_prefetch_lookahead(),
+            sound_cache_max_bytes=self.settings.get("sound_cache_max_bytes"),
+            review_scheduler=ReviewScheduler(
+                Path(os.path.dirname(os.path.abspath(__file__)))
+                / self.settings.get("review", dict()).get(
+                    "state_file", "learning_data/review_state.json"
+                )
+            ),
+            event_log=self.create_event_log(),
+            voice_player=self.create_remote_voice_player(),
         )
         self.speak = self.learner.speak
         self.clear = self.learner.clear
         self.unbuffered_input = self.learner.unbuffered_input
         self.clear_voice_cache = self.learner.voice_player.clear_cache
+        self.startup_timer.mark("初始化学习器（语音缓存、复习记录、事件日志）")
 
-        self.word_books_words_map = parse_all_word_books()
+        # 单词本按需解析，打开到哪一级才解析哪一级；连接服务器时按需从服务器读取
+        self.word_books_words_map = (
+            build_lazy_word_books()
+            if self.server is None
+            else RemoteWordBookNode(self.server)
+        )
         self.current_content = self.word_books_words_map
+        # 当前固定了语音缓存的单词本
+        self.pinned_book = None
+        # 查找索引在第一次查找时建立
+        self.search_index: WordSearchIndex | None = None
 
         colorama.init()
+        self.startup_timer.mark("读取单词本目录")
+
+    def get_prefetch_lookahead(self) -> int:
+        """边学边生成语音时提前生成的条数，未开启时为0"""
+        prefetch_settings = self.settings.get("prefetch", dict())
+        if not prefetch_settings.get("enabled", False):
+            return 0
+        return prefetch_settings.get("lookahead", 5)
+
+    def create_remote_voice_player(self) -> RemoteVoicePlayer | None:
+        """连接服务器时从服务器取语音，否则返回None（学习器在本机合成和缓存）"""
+        if self.server is None:
+            return None
+        return RemoteVoicePlayer(
+            self.server,
+            default_voice=self.voice_settings[
+                self.voice_settings["english_pronunciation"]
+            ],
+            playback_speed=get_playback_speed(self.settings),
+        )
+
+    def configure_metrics(self) -> None:
+        """按设置开启运行指标（需要在创建学习器之前）"""
+        metrics_settings = self.settings.get("metrics", dict())
+        if not metrics_settings.get("enabled", False):
+            return
+        configure_metrics(
+            enabled=True,
+            path=Path(os.path.dirname(os.path.abspath(__file__)))
+            / metrics_settings.get("path", "learning_data/metrics.prom"),
+            format=metrics_settings.get("format", "prometheus"),
+            export_interval=metrics_settings.get("export_interval", 30),
+        )
+
+    def create_event_log(self) -> SessionEventLog | None:
+        """按设置创建作答事件日志，未开启时返回None"""
+        event_log_settings = self.settings.get("event_log", dict())
+        if not event_log_settings.get("enabled", False):
+            return None
+        return SessionEventLog(
+            Path(os.path.dirname(os.path.abspath(__file__)))
+            / event_log_settings.get("directory", "learning_data/events"),
+            event_log_settings.get("learner") or getpass.getuser(),
+        )
+
+    def get_review_limit(self) -> int | None:
+        """每次复习最多练习的条数，None为不限制"""
+        return self.settings.get("review", dict()).get("max_items_per_session")
+
+    def update_pinned_voice_cache(self) -> None:
+        """离开单词本时取消固定，打开单元时固定该单元的语音缓存"""
+        book_name = self.page_path[0] if self.page_path else None
+        if book_name != self.pinned_book:
+            self.learner.voice_player.unpin_all()
+            self.pinned_book = book_name
 
-    def get_current_content(self) -> dict | list:
+        if self.current_content.get("words") is not None:
+            self.learner.pin_unit(self.current_content)
+
+    def get_current_content(self) -> Mapping | list:
         data = self.word_books_words_map
         target = data
         for key in self.page_path:
@@ -52,7 +164,10 @@ class WordLearningApp:
 
         if self.page_path:
             print("a. 返回上一页, b. 回到首页, ", end="")
-        print("c. 改变英语发音(英音/美音), d. 清空语音缓存")
+        print(
+            "c. 改变英语发音(英音/美音), d. 清空语音缓存, e. 改变语速(正常/慢速/快速), "
+            "r. 复习到期内容, s. 查找单词"
+        )
 
         selected_option = None
         while True:
@@ -81,6 +196,18 @@ class WordLearningApp:
                     self.clear_voice_cache()
                     return
 
+                if choice.strip().lower() == "e":
+                    self.change_playback_speed()
+                    return
+
+                if choice.strip().lower() == "r":
+                    self.learner.review(limit=self.get_review_limit())
+                    return
+
+                if choice.strip().lower() == "s":
+                    self.search_words()
+                    return
+
                 choice_index = int(choice) - 1
 
                 if 0 <= choice_index < len(options):
@@ -95,10 +222,14 @@ class WordLearningApp:
 
     def _make_user_choice_learning_options(self):
 
-        print("1. 快速查看\n2. 练习\n3. 听写\n4. 学习")
+        print("1. 快速查看\n2. 练习\n3. 听写\n4. 学习\n5. 复习(本单元到期内容)")
 
-        print("a. 返回上一页, b. 回到首页, c. 改变英语发音(英音/美音), d. 清空语音缓存")
+        print(
+            "a. 返回上一页, b. 回到首页, c. 改变英语发音(英音/美音), d. 清空语音缓存, "
+            "e. 改变语速(正常/慢速/快速)"
+        )
         exercise_content = self.current_content
+        other_args = {"unit_name": " -> ".join(str(key) for key in self.page_path)}
         try:
             choice = self.unbuffered_input(
                 f"请输入要执行的操作序号{Fore.RED}(输入q退出){Fore.RESET}: "
@@ -117,12 +248,17 @@ class WordLearningApp:
             if choice.strip().lower() == "d":
                 self.clear_voice_cache()
                 return
+            if choice.strip().lower() == "e":
+                self.change_playback_speed()
+                return
 
             choice = int(choice)
             if choice == 1:
                 self.learner.words_browse(exercise_content)
             elif choice == 2:
-                self.learner.fast_view(exercise_content, learning=False)
+                self.learner.fast_view(
+                    exercise_content, learning=False, other_args=other_args
+                )
             elif choice == 3:
                 self.learner.dictation(
                     exercise_content,
@@ -132,7 +268,15 @@ class WordLearningApp:
                     ],
                 )
             elif choice == 4:
-                self.learner.fast_view(exercise_content, learning=True)
+                self.learner.fast_view(
+                    exercise_content, learning=True, other_args=other_args
+                )
+            elif choice == 5:
+                self.learner.review(
+                    exercise_content,
+                    limit=self.get_review_limit(),
+                    other_args=other_args,
+                )
             else:
                 print("序号无效，请重新输入")
                 sleep(2)
@@ -147,6 +291,7 @@ class WordLearningApp:
             self.clear()
 
             self.current_content = self.get_current_content()
+            self.update_pinned_voice_cache()
 
             # 显示当前路径
             print(
@@ -159,7 +304,8 @@ class WordLearningApp:
             )
             print(f"  当前发音: {self.learner.default_en_voice
                 .replace("en-US", "美音")
-                .replace("en-GB", "英音")}({self.learner.default_en_voice})")
+                .replace("en-GB", "英音")}({self.learner.default_en_voice})", end="")
+            print(f"  当前语速: {self.get_playback_speed_name()}")
             print()
 
             if self.current_content.get("words") is None:
@@ -167,7 +313,47 @@ class WordLearningApp:
             else:
                 self._make_user_choice_learning_options()
 
+    def find_words(self, query: str) -> list[list[str]]:
+        """查找单词和短语，返回表格的各行 [单词/短语, 释义, 所在单元]"""
+        if self.server is not None:
+            return [
+                [
+                    result["headword"],
+                    result["meaning"],
+                    "\n".join(" -> ".join(path) for path in result["locations"]),
+                ]
+                for result in self.server.search(query)
+            ]
+
+        if self.search_index is None:
+            self.search_index = build_word_search_index()
+        return [
+            [
+                self.search_index.get_headword(self.search_index.entries[i]),
+                self.search_index.entries[i].get("meaning", ""),
+                "\n".join(" -> ".join(path) for path in self.search_index.locations[i]),
+            ]
+            for i in self.search_index.search(query)
+        ]
+
+    def search_words(self):
+        """按英文前缀或中文释义查找所有单词本中的单词和短语，并显示所在单元"""
+        from tabulate import tabulate
+
+        while True:
+            query = self.unbuffered_input(
+                f"输入英文开头或中文释义查找{Fore.RED}(直接回车返回){Fore.RESET}: "
+            ).strip()
+            if not query:
+                return
+
             self.clear()
+            rows = self.find_words(query)
+            if rows:
+                print(tabulate(rows, headers=["单词/短语", "释义", "所在单元"]))
+            else:
+                print(f"没有找到 {query}")
+            print()
 
     def change_english_pronunciation(self):
         self.voice_settings["english_pronunciation"] = (
@@ -177,13 +363,62 @@ class WordLearningApp:
         )
 
         self.settings["voice"] = self.voice_settings
-        with open(self.settings_path, "w", encoding="utf-8") as f:
-            json.dump(self.settings, f, ensure_ascii=False, indent=4)
+        self.save_settings()
         self.learner.default_en_voice = self.voice_settings[
             self.voice_settings["english_pronunciation"]
         ]
 
+    def get_playback_speed_name(self) -> str:
+        mode = self.settings.get("playback_speed", dict()).get("mode", "normal")
+        speed = get_playback_speed(self.settings)
+        return f"{PLAYBACK_SPEED_NAMES.get(mode, mode)}({speed:g}x)"
+
+    def change_playback_speed(self):
+        """在正常、慢速、快速之间切换，变速的语音由缓存的语音在本机（或服务器上）生成，不重新合成"""
+        if self.server is None and not postprocess_available():
+            print("变速播放需要 numpy，请先安装: python -m pip install numpy")
+            sleep(2)
+            return
+
+        speed_settings = self.settings.setdefault("playback_speed", dict())
+        mode = speed_settings.get("mode", "normal")
+        index = PLAYBACK_SPEED_MODES.index(mode) if mode in PLAYBACK_SPEED_MODES else -1
+        speed_settings["mode"] = PLAYBACK_SPEED_MODES[
+            (index + 1) % len(PLAYBACK_SPEED_MODES)
+        ]
+        try:
+            speed = get_playback_speed(self.settings)
+        except ValueError as e:
+            # 设置有误时保持原来的语速，不保存
+            speed_settings["mode"] = mode
+            print(e)
+            sleep(2)
+            return
+        self.save_settings()
+        self.learner.voice_player.playback_speed = speed
+        # 新速度的变速语音文件名不同，立即固定当前单元的变速语音，不等到下次打开单元
+        self.update_pinned_voice_cache()
+
+    def save_settings(self):
+        with open(self.settings_path, "w", encoding="utf-8") as f:
+            json.dump(self.settings, f, ensure_ascii=False, indent=4)
+
 
 if __name__ == "__main__":
-    app = WordLearningApp()
-    app.main()
+    parser = argparse.ArgumentParser(description="命令行背单词程序")
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="输出模块导入和初始化各阶段的耗时后退出",
+    )
+    parser.add_argument(
+        "--server",
+        help="连接语音服务器（见 voice_server.py），例如 http://192.168.1.10:8765",
+    )
+    args = parser.parse_args()
+
+    if args.startup_report:
+        print_startup_report(WordLearningApp)
+    else:
+        app = WordLearningApp(server_url=args.server)
+        app.main()
@@ -0,0 +1,64 @@
+"""
+语音缓存管理命令
+
+    python manage_voice_cache.py stats     查看缓存数量和占用空间
+    python manage_voice_cache.py compact   整理包文件存储，回收已删除语音占用的空间
+
+compact 会重写所有分段文件，还有其他程序（背单词程序、语音服务器、预热命令）打开着缓存时不会整理。
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+from voice_cache_store import create_voice_store
+from voice_player_with_cache import VoiceCacheManifest
+
+
+def load_settings() -> dict:
+    settings_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "settings.json"
+    )
+    with open(settings_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="语音缓存管理")
+    parser.add_argument("command", choices=["stats", "compact"], help="要执行的操作")
+    parser.add_argument(
+        "--cache-dir",
+        default="voice_cache",
+        help="缓存目录（相对于程序目录），默认为 voice_cache",
+    )
+    args = parser.parse_args()
+
+    backend = load_settings().get("voice_cache", dict()).get("backend", "files")
+    cache_dir = Path(__file__).absolute().parent / args.cache_dir
+    cache_dir.mkdir(exist_ok=True)
+    store = create_voice_store(backend, cache_dir)
+
+    try:
+        if args.command == "stats":
+            manifest = VoiceCacheManifest(cache_dir, store)
+            total_size = manifest.total_size()
+            print(f"存储方式: {backend}")
+            print(f"缓存数量: {len(manifest.entries)}")
+            print(f"占用空间: {total_size / 1024 / 1024:.1f} MB")
+        elif args.command == "compact":
+            try:
+                size_before, size_after = store.compact()
+            except RuntimeError as e:
+                print(f"没有整理: {e}")
+                return
+            print(
+                f"整理完成: {size_before / 1024 / 1024:.1f} MB -> "
+                f"{size_after / 1024 / 1024:.1f} MB"
+            )
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+运行指标
+
+记录语音缓存命中、语音合成耗时和重试、播放延迟、每道题用时等计数器和直方图，
+定期写入本地文件（Prometheus 文本格式或 JSON），用于确定并发数、发现慢盘。
+
+在 settings.json 的 metrics 中开启：
+
+    "metrics": {"enabled": true, "path": "learning_data/metrics.prom",
+                "format": "prometheus", "export_interval": 30}
+
+未开启时各模块拿到的是什么都不做的指标对象，记录一次只是一次空方法调用。
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Union
+
+# 直方图默认的桶上界（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+EXPORT_FORMATS = ("prometheus", "json")
+
+
+class Counter:
+    """只增不减的计数器"""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """按固定的桶统计观测值的分布，同时记录总数和总和"""
+
+    def __init__(
+        self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # 最后一个桶为 +Inf
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> tuple[list[int], int, float]:
+        """返回 (累计的各桶计数, 总数, 总和)"""
+        with self._lock:
+            counts, count, total = list(self.bucket_counts), self.count, self.sum
+        cumulative = list()
+        running = 0
+        for bucket_count in counts:
+            running += bucket_count
+            cumulative.append(running)
+        return cumulative, count, total
+
+
+class _NullMetric:
+    """未开启指标时使用，什么都不记录"""
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def observe(self, value: float) -> None:
+        pass
+
+
+_NULL_METRIC = _NullMetric()
+Metric = Union[Counter, Histogram, _NullMetric]
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class MetricsRegistry:
+    """进程内所有指标的集合"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._metrics: Dict[str, Union[Counter, Histogram]] = dict()
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str) -> Metric:
+        """返回名为 name 的计数器（同名的共用一个），未开启时返回空指标"""
+        if not self.enabled:
+            return _NULL_METRIC
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Counter(name, help)
+        return metric
+
+    def histogram(
+        self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Metric:
+        """返回名为 name 的直方图（同名的共用一个），未开启时返回空指标"""
+        if not self.enabled:
+            return _NULL_METRIC
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Histogram(name, help, buckets)
+        return metric
+
+    def to_json(self) -> Dict[str, Any]:
+        counters = dict()
+        histograms = dict()
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            if isinstance(metric, Counter):
+                counters[metric.name] = metric.value
+            else:
+                cumulative, count, total = metric.snapshot()
+                histograms[metric.name] = {
+                    "buckets": dict(
+                        zip([str(b) for b in metric.buckets] + ["+Inf"], cumulative)
+                    ),
+                    "count": count,
+                    "sum": total,
+                }
+        return {"time": time.time(), "counters": counters, "histograms": histograms}
+
+    def to_prometheus(self) -> str:
+        lines = list()
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            if isinstance(metric, Counter):
+                lines.append(f"# TYPE {metric.name} counter")
+                lines.append(f"{metric.name} {_format_number(metric.value)}")
+                continue
+            lines.append(f"# TYPE {metric.name} histogram")
+            cumulative, count, total = metric.snapshot()
+            bounds = [_format_number(b) for b in metric.buckets] + ["+Inf"]
+            for bound, bucket_count in zip(bounds, cumulative):
+                lines.append(f'{metric.name}_bucket{{le="{bound}"}} {bucket_count}')
+            lines.append(f"{metric.name}_sum {_format_number(total)}")
+            lines.append(f"{metric.name}_count {count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: Path, format: str = "prometheus") -> None:
+        """把当前的指标整体写入文件（先写临时文件再替换）"""
+        if format == "json":
+            content = json.dumps(self.to_json(), ensure_ascii=False)
+        else:
+            content = self.to_prometheus()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+
+class MetricsExporter:
+    """后台线程每隔 interval 秒导出一次指标，程序退出时再导出一次"""
+
+    def __init__(
+        self, registry: MetricsRegistry, path: Path, format: str, interval: float
+    ):
+        self.registry = registry
+        self.path = path
+        self.format = format
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="metrics-exporter", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.export()
+
+    def export(self) -> None:
+        try:
+            self.registry.export(self.path, self.format)
+        except OSError:
+            # 指标只是辅助信息，写不进去不影响学习
+            pass
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.export()
+
+
+_registry = MetricsRegistry()
+_exporter: Optional[MetricsExporter] = None
+
+
+def configure_metrics(
+    enabled: bool = False,
+    path: Optional[Union[str, Path]] = None,
+    format: str = "prometheus",
+    export_interval: float = 30,
+) -> MetricsRegistry:
+    """
+    开启或关闭进程内共用的指标，需要在创建 VoicePlayerWithCache 和 WordLearner 之前调用
+
+    Args:
+        enabled: 是否记录指标
+        path: 导出文件路径，None 为只在内存中记录（可以通过 get_metrics() 读取）
+        format: 导出格式，"prometheus" 或 "json"
+        export_interval: 导出间隔（秒）
+    """
+    global _exporter
+    if format not in EXPORT_FORMATS:
+        raise ValueError(
+            f"指标导出格式 {format} 不存在，可选: {', '.join(EXPORT_FORMATS)}"
+        )
+
+    _registry.enabled = enabled
+    if _exporter is not None:
+        _exporter.stop()
+        _exporter = None
+    if enabled and path is not None:
+        _exporter = MetricsExporter(_registry, Path(path), format, export_interval)
+    return _registry
+
+
+def get_metrics() -> MetricsRegistry:
+    """返回进程内共用的指标集合"""
+    return _registry
@@ -0,0 +1,239 @@
+"""
+批量预热语音缓存
+
+    python prewarm_voice_cache.py                 预热所有单词本的英音、美音和听写提示
+    python prewarm_voice_cache.py --restart       忽略上次的进度，从头检查一遍
+    python prewarm_voice_cache.py --voices en-US  只预热美音
+
+遍历 parse_all_word_books() 中的所有单元，把单词和短语按设置中的 en-US、en-GB 语音，
+听写提示（与 dictation 朗读的内容相同）按 zh-CN 语音生成到缓存。不同单词本中重复的文本只生成一次。
+
+每完成一批都会把进度写入 .cache/prewarm_checkpoint.json，中断后再次运行会跳过已完成的批次；
+单词本、语音设置或影响缓存文件名的设置（语速、音量、后处理、合成后端）变化后进度自动作废，
+已完成的批次也会按缓存清单再确认一遍。适合在夜间运行，让学习时不用等待合成。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+from py_handle_profiles.handle_word_books import (
+    get_library_fingerprint,
+    parse_all_word_books,
+)
+from voice_player_with_cache import (
+    VoicePlayerWithCache,
+    voice_player_options_from_settings,
+)
+from word_learner import build_dictation_read_list
+
+BASE_DIR = Path(__file__).absolute().parent
+CHECKPOINT_PATH = BASE_DIR / ".cache" / "prewarm_checkpoint.json"
+CHECKPOINT_VERSION = 1
+
+
+def load_settings() -> dict:
+    with open(BASE_DIR / "settings.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def iter_units(node: Any) -> Iterator[Dict[str, List[Dict[str, Any]]]]:
+    """深度优先遍历单词本目录树，返回所有单元（包含 'words' 和 'phrases' 的字典）"""
+    if not isinstance(node, dict):
+        return
+    if node.get("words") is not None:
+        yield node
+        return
+    for child in node.values():
+        yield from iter_units(child)
+
+
+def collect_texts(
+    word_books: dict, voice_settings: Dict[str, str], voice_keys: List[str]
+) -> List[Tuple[str, List[str]]]:
+    """
+    收集需要预热的文本，按语音模型分组并去重，保持单词本中的先后顺序
+
+    Args:
+        word_books: parse_all_word_books() 的结果
+        voice_settings: 设置中的 voice 部分
+        voice_keys: 要预热的语音，可选 en-US、en-GB、zh-CN
+
+    Returns:
+        (语音模型, 文本列表) 列表
+    """
+    english_texts: Dict[str, None] = dict()
+    prompt_texts: Dict[str, None] = dict()
+    for unit_data in iter_units(word_books):
+        for word in unit_data["words"]:
+            english_texts[word["word"]] = None
+        for phrase in unit_data["phrases"]:
+            english_texts[phrase["phrase"]] = None
+        for prompt in build_dictation_read_list(unit_data):
+            prompt_texts[prompt] = None
+
+    groups = list()
+    for voice_key in voice_keys:
+        texts = prompt_texts if voice_key == "zh-CN" else english_texts
+        groups.append(
+            (voice_settings[voice_key], [text for text in texts if text.strip()])
+        )
+    return groups
+
+
+def load_checkpoint(run_key: str) -> set:
+    """读取已完成的批次，进度对应的单词本或语音不同时返回空集合"""
+    try:
+        with open(CHECKPOINT_PATH, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    if (
+        checkpoint.get("version") != CHECKPOINT_VERSION
+        or checkpoint.get("run_key") != run_key
+    ):
+        return set()
+    return set(checkpoint.get("completed_batches", []))
+
+
+def save_checkpoint(run_key: str, completed_batches: set) -> None:
+    CHECKPOINT_PATH.parent.mkdir(exist_ok=True)
+    temp_path = CHECKPOINT_PATH.with_name(f"{CHECKPOINT_PATH.name}.{os.getpid()}.tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "version": CHECKPOINT_VERSION,
+                "run_key": run_key,
+                "completed_batches": sorted(completed_batches),
+            },
+            f,
+            ensure_ascii=False,
+        )
+    os.replace(temp_path, CHECKPOINT_PATH)
+
+
+def format_rate(count: int, size: int, elapsed: float) -> str:
+    elapsed = max(elapsed, 1e-6)
+    return (
+        f"{count / elapsed:.1f} 条/秒, "
+        f"{size / 1024 / 1024 / elapsed:.2f} MB/秒, "
+        f"共 {size / 1024 / 1024:.1f} MB"
+    )
+
+
+async def prewarm(
+    voice_player: VoicePlayerWithCache,
+    groups: List[Tuple[str, List[str]]],
+    run_key: str,
+    batch_size: int,
+    restart: bool,
+) -> None:
+    completed_batches = set() if restart else load_checkpoint(run_key)
+    # 所有批次共用一个限流器，并发数不用每批从头调整
+    limiter = voice_player.create_limiter()
+
+    total_generated = 0
+    total_failed = 0
+    total_skipped = 0
+    start_time = time.monotonic()
+    start_size = voice_player.manifest.total_size()
+
+    for voice, texts in groups:
+        batch_count = (len(texts) + batch_size - 1) // batch_size
+        print(f"{voice}: {len(texts)} 条，{batch_count} 批")
+        for batch_index in range(batch_count):
+            batch_id = f"{voice}:{batch_index}"
+            batch = texts[batch_index * batch_size : (batch_index + 1) * batch_size]
+            # 已完成的批次也按清单确认一遍（只查内存），期间被淘汰或删除的语音重新生成
+            if batch_id in completed_batches and not voice_player.get_uncached(
+                batch, voice
+            ):
+                total_skipped += 1
+                continue
+            size_before = voice_player.manifest.total_size()
+            report = await voice_player.pregenerate_voices(
+                batch, voice=voice, show_progress_bar=False, limiter=limiter
+            )
+            size = voice_player.manifest.total_size() - size_before
+
+            total_generated += report.generated
+            total_failed += len(report.failed)
+            # 有失败的批次不记为完成，下次运行时重试
+            if not report.failed:
+                completed_batches.add(batch_id)
+                save_checkpoint(run_key, completed_batches)
+
+            print(
+                f"  [{batch_index + 1}/{batch_count}] 新生成 {report.generated}, "
+                f"已缓存 {report.cached}, 失败 {len(report.failed)}, "
+                f"并发 {report.final_concurrency}, "
+                f"{format_rate(report.generated, max(size, 0), report.elapsed)}"
+            )
+            if report.failed:
+                print(report.summary())
+
+    elapsed = time.monotonic() - start_time
+    size = max(voice_player.manifest.total_size() - start_size, 0)
+    print(
+        f"完成: 新生成 {total_generated}, 失败 {total_failed}, "
+        f"跳过已完成批次 {total_skipped}, 用时 {elapsed:.1f} 秒"
+    )
+    print(f"吞吐量: {format_rate(total_generated, size, elapsed)}")
+    if total_failed:
+        print("有语音生成失败，再次运行会重试失败的批次")
+
+    cache_max_bytes = voice_player.cache_max_bytes
+    if cache_max_bytes is not None and (
+        voice_player.manifest.total_size() >= cache_max_bytes
+    ):
+        print(
+            "缓存已达到 voice_cache.max_bytes 上限，较早的语音可能已被淘汰，"
+            "如需完整预热请调大该设置"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量预热语音缓存")
+    parser.add_argument(
+        "--voices",
+        nargs="+",
+        choices=["en-US", "en-GB", "zh-CN"],
+        default=["en-US", "en-GB", "zh-CN"],
+        help="要预热的语音，默认全部",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=200, help="每批的条数，默认为 200"
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="忽略上次的进度，从头检查所有批次"
+    )
+    args = parser.parse_args()
+    if args.batch_size <= 0:
+        parser.error("--batch-size 必须大于 0")
+
+    settings = load_settings()
+    groups = collect_texts(parse_all_word_books(), settings["voice"], args.voices)
+    voice_player = VoicePlayerWithCache(**voice_player_options_from_settings(settings))
+    # 单词本或语音模型变化后，批次划分也会变化；语速、音量、后处理和合成后端变化后缓存文件名也会变化，
+    # 旧的进度都不能再用
+    run_key = json.dumps(
+        [
+            get_library_fingerprint(),
+            [voice for voice, _ in groups],
+            args.batch_size,
+            voice_player.rate,
+            voice_player.volume,
+            voice_player.postprocessor is not None,
+            type(voice_player.backend).__name__,
+            voice_player.backend.audio_suffix,
+        ]
+    )
+    asyncio.run(prewarm(voice_player, groups, run_key, args.batch_size, args.restart))
+
+
+if __name__ == "__main__":
+    main()
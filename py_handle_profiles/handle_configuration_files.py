@@ -1,42 +1,219 @@
+from py_handle_profiles.word_entry import intern_data_file_content
+
 import json
+import mmap
 import os
-from typing import Dict, List, Union
+import re
+from typing import Dict, Iterator, List, Tuple, Union
 
+DATA_DIR = os.path.join(os.path.dirname(__file__), "../data")
+DATA_FILE_INDEX_DIR = os.path.join(
+    os.path.dirname(__file__), "../.cache", "data_file_index"
+)
+DATA_FILE_INDEX_VERSION = 1
+# 超过这个大小的数据文件按单元读取，不再整体解析
+LARGE_DATA_FILE_BYTES = 1024 * 1024
 
-def parse_data_file_units(
-    dict_with_data_file_name_and_units: Dict[str, Union[str, List[str]]],
-) -> Dict[str, List[Dict]] | None:  # 更精确的返回类型注解
+# 数据文件缓存：绝对路径 -> ((修改时间, 文件大小), 文件内容)
+_data_file_cache: Dict[str, Tuple[Tuple[int, int], dict]] = dict()
+# 大数据文件的单元位置：绝对路径 -> ((修改时间, 文件大小), {单元名: (起始字节, 结束字节)})
+_data_file_index_cache: Dict[
+    str, Tuple[Tuple[int, int], Dict[str, Tuple[int, int]]]
+] = dict()
+# 大数据文件中已读取的单元：(绝对路径, 单元名) -> ((修改时间, 文件大小), 单元内容)
+_data_unit_cache: Dict[Tuple[str, str], Tuple[Tuple[int, int], dict]] = dict()
 
-    data_abspath: str
+# 跳过普通字符和整个字符串（字符串中的括号不算），匹配到下一个括号为止
+_JSON_BRACKET_PATTERN = re.compile(
+    rb'(?:[^"{}\[\]]++|"(?:[^"\\]++|\\.)*+")*+([{}\[\]])', re.DOTALL
+)
+# 括号前最后一个后面跟着冒号的字符串，即该值对应的键
+_JSON_KEY_PATTERN = re.compile(rb'"((?:[^"\\]|\\.)*)"\s*:\s*$', re.DOTALL)
 
-    data_file_name: str = dict_with_data_file_name_and_units["data_file_name"]
 
-    data_abspath = os.path.join(
-        os.path.dirname(__file__), "../data", data_file_name
-    )  # 改用跨平台路径
+def get_file_signature(file_path: str) -> Tuple[int, int]:
+    """返回文件的(修改时间ns, 大小)，用于判断文件是否变化"""
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
 
-    if isinstance((unit_keys := dict_with_data_file_name_and_units["unit_keys"]), str):
-        unit_keys = [unit_keys]
+
+def load_data_file(data_file_name: str) -> dict:
+    """
+    读取 data 目录下的数据文件，同一进程内每个文件只解析一次
+
+    单词和短语转换为共用的 WordEntry，引用同一单元的单词本拿到的是同一批词条。
+    文件的修改时间或大小变化后会自动重新读取。返回的内容在调用方之间共享，不要修改。
+    """
+    data_abspath = os.path.abspath(os.path.join(DATA_DIR, data_file_name))
+
+    try:
+        signature = get_file_signature(data_abspath)
+    except FileNotFoundError:
+        raise ValueError(f"数据文件 {data_file_name} 不存在于 data 目录")
+
+    cached = _data_file_cache.get(data_abspath)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
 
     try:
         with open(data_abspath, encoding="UTF-8") as f:
-            data_file_content = json.load(f)
+            data_file_content = intern_data_file_content(json.load(f))
+    except FileNotFoundError:
+        raise ValueError(f"数据文件 {data_file_name} 不存在于 data 目录")
+    except json.JSONDecodeError:
+        raise ValueError(f"数据文件 {data_file_name} 格式错误")
+
+    _data_file_cache[data_abspath] = (signature, data_file_content)
+    return data_file_content
+
+
+def scan_data_file_units(data) -> Dict[str, Tuple[int, int]]:
+    """
+    扫描数据文件的原始字节，找出最外层每个单元的值所在的字节范围，不解析单元内容
+
+    Args:
+        data: 文件内容（bytes 或 mmap）
+
+    Returns:
+        {单元名: (起始字节, 结束字节)}
+    """
+    units = dict()
+    depth = 0
+    unit_key = None
+    value_start = None
+    # 只在括号处停下，循环次数与括号数量成正比，字符串由正则整体跳过
+    for match in _JSON_BRACKET_PATTERN.finditer(data):
+        bracket = match.group(1)
+        if bracket in b"{[":
+            if depth == 1:
+                key_match = _JSON_KEY_PATTERN.search(match.group(0)[:-1])
+                if key_match is not None:
+                    unit_key = json.loads(b'"' + key_match.group(1) + b'"')
+                    value_start = match.start(1)
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 1 and value_start is not None:
+                units[unit_key] = (value_start, match.end(1))
+                unit_key = value_start = None
+    return units
+
+
+def _get_data_file_index_path(data_abspath: str) -> str:
+    return os.path.join(
+        DATA_FILE_INDEX_DIR, os.path.basename(data_abspath) + ".index.json"
+    )
+
+
+def load_data_file_index(
+    data_abspath: str, signature: Tuple[int, int]
+) -> Dict[str, Tuple[int, int]]:
+    """
+    返回大数据文件的单元位置索引
+
+    第一次读取时扫描整个文件，结果保存到 .cache/data_file_index 下的索引文件，
+    文件没有变化时之后直接读取索引文件。
+    """
+    cached = _data_file_index_cache.get(data_abspath)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    index_path = _get_data_file_index_path(data_abspath)
+    units = None
+    try:
+        with open(index_path, encoding="utf-8") as f:
+            index_content = json.load(f)
+        if (
+            index_content.get("version") == DATA_FILE_INDEX_VERSION
+            and index_content.get("path") == data_abspath
+            and tuple(index_content.get("signature", ())) == signature
+        ):
+            units = {key: tuple(span) for key, span in index_content["units"].items()}
+    except (OSError, ValueError):
+        pass
+
+    if units is None:
+        with open(data_abspath, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                units = scan_data_file_units(data)
+
+        temp_path = f"{index_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(DATA_FILE_INDEX_DIR, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "version": DATA_FILE_INDEX_VERSION,
+                        "path": data_abspath,
+                        "signature": signature,
+                        "units": units,
+                    },
+                    f,
+                    ensure_ascii=False,
+                )
+            os.replace(temp_path, index_path)
+        except OSError:
+            # 索引文件只是加速手段，写不进去下次重新扫描即可
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    _data_file_index_cache[data_abspath] = (signature, units)
+    return units
+
+
+def load_data_unit(data_file_name: str, unit_key: str) -> dict:
+    """
+    读取数据文件中的一个单元
+
+    小文件整体读取并缓存（见 load_data_file）；大文件通过单元位置索引只读取并解析该单元的字节范围，
+    耗时与单元大小成正比，与文件大小无关。返回的内容在调用方之间共享，不要修改。
+    """
+    data_abspath = os.path.abspath(os.path.join(DATA_DIR, data_file_name))
+    try:
+        signature = get_file_signature(data_abspath)
     except FileNotFoundError:
         raise ValueError(f"数据文件 {data_file_name} 不存在于 data 目录")
+
+    if signature[1] < LARGE_DATA_FILE_BYTES:
+        data_file_content = load_data_file(data_file_name)
+        if unit_key not in data_file_content:
+            raise ValueError(f"数据文件 {data_file_name} 中没有单元 {unit_key}")
+        return data_file_content[unit_key]
+
+    cached = _data_unit_cache.get((data_abspath, unit_key))
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    units = load_data_file_index(data_abspath, signature)
+    if unit_key not in units:
+        raise ValueError(f"数据文件 {data_file_name} 中没有单元 {unit_key}")
+    start, end = units[unit_key]
+    try:
+        with open(data_abspath, "rb") as f:
+            f.seek(start)
+            unit = json.loads(f.read(end - start))
     except json.JSONDecodeError:
         raise ValueError(f"数据文件 {data_file_name} 格式错误")
 
+    unit = intern_data_file_content({unit_key: unit})[unit_key]
+    _data_unit_cache[(data_abspath, unit_key)] = (signature, unit)
+    return unit
+
+
+def parse_data_file_units(
+    dict_with_data_file_name_and_units: Dict[str, Union[str, List[str]]],
+) -> Dict[str, List[Dict]] | None:  # 更精确的返回类型注解
+
+    data_file_name: str = dict_with_data_file_name_and_units["data_file_name"]
+
+    if isinstance((unit_keys := dict_with_data_file_name_and_units["unit_keys"]), str):
+        unit_keys = [unit_keys]
+
+    units = [load_data_unit(data_file_name, unit_key) for unit_key in unit_keys]
+
     return {
-        "words": [
-            word
-            for unit_key in unit_keys
-            for word in data_file_content[unit_key].get("words", [])
-        ],
-        "phrases": [
-            phrase
-            for unit_key in unit_keys
-            for phrase in data_file_content[unit_key].get("phrases", [])
-        ],
+        "words": [word for unit in units for word in unit.get("words", [])],
+        "phrases": [phrase for unit in units for phrase in unit.get("phrases", [])],
     }
 
 
@@ -54,28 +231,20 @@ def parse_config_words_phrases(
     return words_list
 
 
-def parse_manual_configuration_file_words_and_phrase_data(
+def iter_manual_configuration_units(
     content: List[Dict] | Dict,
-) -> Dict[str, Dict[str, List[Dict]]]:
-
-    name_and_content_dict = dict()
-
+) -> Iterator[Tuple[str, Dict]]:
+    """逐个返回 manual 组中每个元素的 (名称, 数据来源配置)，不读取数据文件"""
     if isinstance(content, dict):
         content = [content]
     for configuration in content:
-        name_and_content_dict[configuration.get("name", "未命名")] = (
-            parse_data_file_units(configuration["content"])
-        )
-
-    return name_and_content_dict
+        yield configuration.get("name", "未命名"), configuration["content"]
 
 
-def parse_auto_configuration_file_words_and_phrase_data(
+def iter_auto_configuration_units(
     content: dict,
-) -> Dict[str, Dict[str, List[Dict]]]:
-
-    name_and_content_dict = dict()
-
+) -> Iterator[Tuple[str, Dict]]:
+    """逐个返回 auto 组中每个元素的 (名称, 数据来源配置)，不读取数据文件"""
     connection = f' {content.get("connection", "and")} '
     data_file_name = content["data_file_name"]
     unit_keys = content["unit_keys"]
@@ -86,8 +255,31 @@ def parse_auto_configuration_file_words_and_phrase_data(
         if isinstance(unit, str):
             unit = [unit]
 
-        name_and_content_dict[connection.join(unit)] = parse_data_file_units(
-            {"data_file_name": data_file_name, "unit_keys": unit}
-        )
+        yield connection.join(unit), {
+            "data_file_name": data_file_name,
+            "unit_keys": unit,
+        }
+
+
+def parse_manual_configuration_file_words_and_phrase_data(
+    content: List[Dict] | Dict,
+) -> Dict[str, Dict[str, List[Dict]]]:
+
+    name_and_content_dict = dict()
+
+    for name, configuration in iter_manual_configuration_units(content):
+        name_and_content_dict[name] = parse_data_file_units(configuration)
+
+    return name_and_content_dict
+
+
+def parse_auto_configuration_file_words_and_phrase_data(
+    content: dict,
+) -> Dict[str, Dict[str, List[Dict]]]:
+
+    name_and_content_dict = dict()
+
+    for name, configuration in iter_auto_configuration_units(content):
+        name_and_content_dict[name] = parse_data_file_units(configuration)
 
     return name_and_content_dict
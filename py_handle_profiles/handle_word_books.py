@@ -1,11 +1,28 @@
 from py_handle_profiles.handle_configuration_files import (
+    DATA_DIR,
+    get_file_signature,
+    iter_auto_configuration_units,
+    iter_manual_configuration_units,
     parse_config_words_phrases,
+    parse_data_file_units,
     parse_manual_configuration_file_words_and_phrase_data,
     parse_auto_configuration_file_words_and_phrase_data,
 )
 
+from collections.abc import Mapping
+from functools import partial
+from typing import Any, Callable, Dict, Iterator
+import glob
+import hashlib
 import os
 import json
+import pickle
+
+PROFILES_DIR = os.path.join(os.path.dirname(__file__), "../profiles")
+SNAPSHOT_PATH = os.path.join(
+    os.path.dirname(__file__), "../.cache", "word_books_snapshot.pickle"
+)
+SNAPSHOT_VERSION = 2
 
 
 def process_non_direct_part(part_text: dict):
@@ -61,13 +78,10 @@ def parse_word_book(whole_word_book: dict) -> tuple[str, dict]:
 
 def get_word_books_content_list() -> list[dict]:
     """获取所有单词本的内容列表"""
-    import glob
-
-    profiles_dir = os.path.join(os.path.dirname(__file__), "../profiles")
     word_books = []
 
     # 查找profiles目录下所有json文件
-    for file_path in glob.glob(os.path.join(profiles_dir, "*.json")):
+    for file_path in glob.glob(os.path.join(PROFILES_DIR, "*.json")):
         try:
             with open(file_path, encoding="utf-8") as f:
                 content = json.load(f)
@@ -78,7 +92,65 @@ def get_word_books_content_list() -> list[dict]:
     return word_books
 
 
-def parse_all_word_books() -> dict:
+def get_library_fingerprint() -> str:
+    """根据 profiles 和 data 目录下所有json文件的修改时间和大小计算指纹"""
+    md5 = hashlib.md5()
+    for directory in (PROFILES_DIR, DATA_DIR):
+        for file_path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            mtime_ns, size = get_file_signature(file_path)
+            md5.update(f"{file_path}|{mtime_ns}|{size}\n".encode("utf-8"))
+    return md5.hexdigest()
+
+
+def load_word_books_snapshot(fingerprint: str) -> dict | None:
+    """读取已编译的单词本快照，快照不存在或已过期时返回None"""
+    try:
+        with open(SNAPSHOT_PATH, "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+
+    if (
+        not isinstance(snapshot, dict)
+        or snapshot.get("version") != SNAPSHOT_VERSION
+        or snapshot.get("fingerprint") != fingerprint
+    ):
+        return None
+    return snapshot["word_books"]
+
+
+def save_word_books_snapshot(fingerprint: str, word_books: dict) -> None:
+    """将解析结果写入快照文件（先写临时文件再替换，避免写入一半的快照）"""
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "fingerprint": fingerprint,
+        "word_books": word_books,
+    }
+    temp_path = f"{SNAPSHOT_PATH}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(SNAPSHOT_PATH), exist_ok=True)
+        with open(temp_path, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, SNAPSHOT_PATH)
+    except OSError:
+        # 快照只是加速手段，写不进去也不影响正常使用
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def parse_all_word_books(use_snapshot: bool = True) -> dict:
+    """
+    解析所有单词本
+
+    Args:
+        use_snapshot: 是否使用快照。profiles 或 data 目录下的文件没有变化时直接读取快照，
+            否则重新解析并更新快照
+    """
+    fingerprint = get_library_fingerprint() if use_snapshot else None
+    if fingerprint is not None:
+        word_books = load_word_books_snapshot(fingerprint)
+        if word_books is not None:
+            return word_books
 
     hole_word_books = get_word_books_content_list()
 
@@ -87,8 +159,95 @@ def parse_all_word_books() -> dict:
     for word_book in hole_word_books:
         book_name, parts_content_map = parse_word_book(word_book)
         parsed_words_dict[book_name] = parts_content_map
+
+    if fingerprint is not None:
+        save_word_books_snapshot(fingerprint, parsed_words_dict)
     return parsed_words_dict
 
 
+class LazyWordBookNode(Mapping):
+    """
+    按需解析的单词本目录节点
+
+    只保存子节点名称和对应的解析函数，子节点在第一次被访问时才解析，
+    解析结果会缓存下来，之后的访问直接返回同一个对象。
+    """
+
+    def __init__(self, loaders: Dict[str, Callable[[], Any]]):
+        self._loaders = loaders
+        self._resolved: Dict[str, Any] = dict()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._resolved:
+            self._resolved[key] = self._loaders[key]()
+        return self._resolved[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._loaders)
+
+    def __len__(self) -> int:
+        return len(self._loaders)
+
+
+def build_lazy_part(part_text: dict) -> LazyWordBookNode:
+    """为带分组的配置（manual/auto）生成按需解析的节点"""
+    if part_text["generate_method"] == "manual":
+        units = iter_manual_configuration_units(part_text["content"])
+    elif part_text["generate_method"] == "auto":
+        units = iter_auto_configuration_units(part_text["content"])
+    else:
+        raise ValueError(f"生成方法 {part_text['generate_method']} 不存在")
+
+    return LazyWordBookNode(
+        {
+            name: partial(parse_data_file_units, configuration)
+            for name, configuration in units
+        }
+    )
+
+
+def build_lazy_word_book(file_path: str) -> LazyWordBookNode:
+    """读取单个 profile 文件，生成按需解析的单词本节点（此时不读取任何数据文件）"""
+    try:
+        with open(file_path, encoding="utf-8") as f:
+            whole_word_book = json.load(f)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise ValueError(f"文件 {file_path} 不是有效的JSON文件")
+
+    loaders = dict()
+    for part in whole_word_book["content"]:
+        if part.get("name") is not None:
+            loaders[part["name"]] = partial(build_lazy_part, part)
+        else:
+            for element in (
+                part["content"]
+                if isinstance(part["content"], list)
+                else [part["content"]]
+            ):
+                loaders[element.get("name", "未命名")] = partial(
+                    parse_config_words_phrases, element["content"]
+                )
+
+    return LazyWordBookNode(loaders)
+
+
+def build_lazy_word_books() -> LazyWordBookNode:
+    """
+    生成按需解析的单词本根节点
+
+    根节点只读取各 profile 文件的 book_name，单词本、分组和单元都在第一次打开时才解析
+    """
+    loaders = dict()
+    for file_path in glob.glob(os.path.join(PROFILES_DIR, "*.json")):
+        try:
+            with open(file_path, encoding="utf-8") as f:
+                book_name = json.load(f).get("book_name", "未命名")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise ValueError(f"文件 {file_path} 不是有效的JSON文件")
+        loaders[book_name] = partial(build_lazy_word_book, file_path)
+
+    return LazyWordBookNode(loaders)
+
+
 if __name__ == "__main__":
     print(parse_all_word_books())
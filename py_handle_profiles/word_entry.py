@@ -0,0 +1,71 @@
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Tuple
+import sys
+
+# 字段名元组 -> {字段名: 下标}，字段相同的词条共用同一个布局
+_layouts: Dict[Tuple[str, ...], Dict[str, int]] = dict()
+
+
+def _get_layout(fields: Tuple[str, ...]) -> Dict[str, int]:
+    layout = _layouts.get(fields)
+    if layout is None:
+        layout = {sys.intern(field): index for index, field in enumerate(fields)}
+        _layouts[fields] = layout
+    return layout
+
+
+def _intern_value(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class WordEntry(Mapping):
+    """
+    只读的单词/短语词条
+
+    用法与字典相同（entry["word"]、entry.get("meaning")、"phrase" in entry、dict(entry)），
+    但不为每个词条保存一份字典：字段名由字段相同的词条共用，字段值保存在元组中，
+    字符串都经过 sys.intern，不同文件中相同的释义、词性只保存一份。
+    """
+
+    __slots__ = ("_layout", "_values")
+
+    def __init__(self, fields: Tuple[str, ...], values: Tuple[Any, ...]):
+        self._layout = _get_layout(fields)
+        self._values = tuple(_intern_value(value) for value in values)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WordEntry":
+        return cls(tuple(data), tuple(data.values()))
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[self._layout[key]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._layout)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        return f"WordEntry({dict(self)!r})"
+
+    def __reduce__(self):
+        # 从快照读取时重新共用字段布局并 intern 字符串
+        return WordEntry, (tuple(self._layout), self._values)
+
+
+def intern_data_file_content(data_file_content: dict) -> dict:
+    """
+    把数据文件中各单元的单词和短语转换为 WordEntry
+
+    每个（数据文件, 单元, 下标）只生成一个词条，引用同一单元的所有单词本共用这些词条。
+    """
+    for unit in data_file_content.values():
+        if not isinstance(unit, dict):
+            continue
+        for section in ("words", "phrases"):
+            items: List[Any] = unit.get(section, [])
+            for index, item in enumerate(items):
+                if isinstance(item, dict):
+                    items[index] = WordEntry.from_dict(item)
+    return data_file_content
@@ -0,0 +1,124 @@
+from py_handle_profiles.handle_word_books import parse_all_word_books
+
+from bisect import bisect_left
+from typing import Any, Dict, Iterator, List, Tuple
+import re
+
+# 含有中日韩文字的查询按释义查找，否则按英文前缀查找
+CJK_PATTERN = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]")
+
+
+def iter_units_with_path(
+    node: Any, path: Tuple[str, ...] = ()
+) -> Iterator[Tuple[Tuple[str, ...], dict]]:
+    """深度优先遍历单词本目录树，返回 (从单词本到单元的路径, 单元数据)"""
+    if not isinstance(node, dict):
+        return
+    if node.get("words") is not None:
+        yield path, node
+        return
+    for key, child in node.items():
+        yield from iter_units_with_path(child, path + (key,))
+
+
+def get_ngrams(text: str, n: int) -> set:
+    return {text[i : i + n] for i in range(len(text) - n + 1)}
+
+
+class WordSearchIndex:
+    """
+    所有单词本的查找索引
+
+    同一个单词/短语在多个单词本或单元中出现时只建一条记录，并记下所有出现的位置。
+
+    - 英文单词和短语：按小写排序的数组，用二分查找前缀
+    - 中文释义：单字和相邻两字的倒排索引，查询时取各个二元组记录的交集，再核对是否包含整个查询
+    """
+
+    def __init__(self, word_books: dict):
+        """
+        Args:
+            word_books: parse_all_word_books() 的结果
+        """
+        self.entries: List[dict] = list()
+        self.locations: List[List[Tuple[str, ...]]] = list()
+        entry_ids: Dict[Tuple[str, str], int] = dict()
+
+        for path, unit_data in iter_units_with_path(word_books):
+            for key_type, section in (("word", "words"), ("phrase", "phrases")):
+                for item in unit_data[section]:
+                    key = (key_type, item[key_type])
+                    entry_id = entry_ids.get(key)
+                    if entry_id is None:
+                        entry_id = len(self.entries)
+                        entry_ids[key] = entry_id
+                        self.entries.append(item)
+                        self.locations.append(list())
+                    if path not in self.locations[entry_id]:
+                        self.locations[entry_id].append(path)
+
+        self._headwords: List[Tuple[str, int]] = sorted(
+            (self.get_headword(entry).lower(), entry_id)
+            for entry_id, entry in enumerate(self.entries)
+        )
+
+        self._meaning_index: Dict[str, List[int]] = dict()
+        for entry_id, entry in enumerate(self.entries):
+            meaning = entry.get("meaning", "")
+            for gram in get_ngrams(meaning, 1) | get_ngrams(meaning, 2):
+                self._meaning_index.setdefault(gram, list()).append(entry_id)
+
+    @staticmethod
+    def get_headword(entry: dict) -> str:
+        return entry["word"] if "word" in entry else entry["phrase"]
+
+    def search_prefix(self, prefix: str, limit: int = 20) -> List[int]:
+        """查找以 prefix 开头的单词和短语（不区分大小写），按字母顺序返回记录序号"""
+        prefix = prefix.lower()
+        result = list()
+        position = bisect_left(self._headwords, (prefix, -1))
+        while position < len(self._headwords) and len(result) < limit:
+            headword, entry_id = self._headwords[position]
+            if not headword.startswith(prefix):
+                break
+            result.append(entry_id)
+            position += 1
+        return result
+
+    def search_meaning(self, text: str, limit: int = 20) -> List[int]:
+        """查找释义中包含 text 的单词和短语，按单词本中出现的先后返回记录序号"""
+        grams = get_ngrams(text, 2) if len(text) > 1 else {text}
+        postings = sorted(
+            (self._meaning_index.get(gram, []) for gram in grams), key=len
+        )
+        if not postings or not postings[0]:
+            return []
+
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+
+        result = list()
+        for entry_id in sorted(candidates):
+            # 二元组都出现不代表连在一起出现，需要核对
+            if text in self.entries[entry_id].get("meaning", ""):
+                result.append(entry_id)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def search(self, query: str, limit: int = 20) -> List[int]:
+        """含中文时按释义查找，否则按英文前缀查找"""
+        query = query.strip()
+        if not query:
+            return []
+        if CJK_PATTERN.search(query):
+            return self.search_meaning(query, limit)
+        return self.search_prefix(query, limit)
+
+
+def build_word_search_index() -> WordSearchIndex:
+    """解析所有单词本（有快照时直接读取快照）并建立查找索引"""
+    return WordSearchIndex(parse_all_word_books())
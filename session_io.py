@@ -0,0 +1,230 @@
+"""
+学习会话的输入输出
+
+WordLearner 通过 SessionIO 读取输入、输出文字和等待，不直接调用 input()、print() 和 sleep()：
+
+- TerminalIO：真实的终端（默认）
+- ScriptedIO：按脚本自动作答，可以设置正确率和打字速度，输出保存在内存中，
+  用于压力测试（load_test.py）和基准测试（benchmark.py）
+
+NullAudioEngine 是不出声的音频引擎，配合 ScriptedIO 可以在没有声卡的机器上跑完整的学习流程。
+"""
+
+import asyncio
+import platform
+import random
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Iterable, List, Mapping, Optional
+
+from audio_engine import AudioEngine, SoundCache
+from terminal_render import ANSI_ESCAPE_PATTERN, supports_ansi
+
+
+class SessionIO(ABC):
+    """学习会话的输入输出接口"""
+
+    # 是否有人在终端前（决定是否显示进度条等）
+    interactive: bool = True
+
+    @property
+    def use_ansi(self) -> bool:
+        """界面是否用转义序列绘制（见 TerminalRenderer）"""
+        return supports_ansi()
+
+    @abstractmethod
+    def write(self, text: str) -> None:
+        """输出文字（不自动换行）"""
+
+    @abstractmethod
+    def input(self, prompt: str = "") -> str:
+        """输出提示并读取一行输入"""
+
+    @abstractmethod
+    def pause(self, seconds: float) -> None:
+        """程序主动等待（如听写每题之间的间隔、提示信息停留的时间）"""
+
+    def print(self, *values: Any, end: str = "\n") -> None:
+        self.write(" ".join(str(value) for value in values) + end)
+
+
+class TerminalIO(SessionIO):
+    """真实的终端"""
+
+    def __init__(self) -> None:
+        self.user_system_type = platform.system()
+
+    def write(self, text: str) -> None:
+        # colorama.init() 会替换 sys.stdout，每次写入时再取
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    def clear_input_buffer(self) -> None:
+        """清除标准输入缓冲区中的残留数据"""
+        if self.user_system_type == "Windows":
+            import msvcrt
+
+            while msvcrt.kbhit():
+                msvcrt.getch()
+        else:
+            import select
+
+            while select.select([sys.stdin], [], [], 0)[0]:
+                sys.stdin.readline()
+
+    def input(self, prompt: str = "") -> str:
+        """确保用户输入前清空缓冲区，避免残留输入干扰"""
+        self.clear_input_buffer()
+        return input(prompt)
+
+    def pause(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+class ScriptedIO(SessionIO):
+    """
+    按脚本自动作答
+
+    每次需要输入时查看界面最后一行：是某个单词或短语的题目（「词性释义: 」）就作答，
+    按 accuracy 的概率答对，否则输入错误的答案；其他情况（按回车继续、按回车退出）直接回车。
+    """
+
+    interactive = False
+
+    def __init__(
+        self,
+        items: Iterable[Mapping[str, Any]],
+        accuracy: float = 1.0,
+        think_time: float = 0.0,
+        typing_delay: float = 0.0,
+        pause_scale: float = 0.0,
+        seed: Optional[int] = None,
+        keep_output: bool = True,
+    ):
+        """
+        Args:
+            items: 可能出现的单词和短语，按题目找到答案
+            accuracy: 每次作答答对的概率
+            think_time: 每次输入前的等待（秒）
+            typing_delay: 每输入一个字符的等待（秒）
+            pause_scale: 程序主动等待的时间（如听写每题之间的间隔）乘以该比例，0 为不等待
+            seed: 随机数种子
+            keep_output: 是否保存全部输出（运行很多会话时可以关闭以节省内存）
+        """
+        self.answers = dict()
+        for item in items:
+            key_type = "word" if "word" in item else "phrase"
+            prompt = f"{item.get('part_of_speech', '')}{item['meaning']}: "
+            self.answers[prompt] = item[key_type]
+        self.accuracy = accuracy
+        self.think_time = think_time
+        self.typing_delay = typing_delay
+        self.pause_scale = pause_scale
+        self.keep_output = keep_output
+        self._random = random.Random(seed)
+
+        self.output: List[str] = list()
+        # 上一次输入之后的输出，即当前的界面
+        self._screen: List[str] = list()
+        self.inputs = 0
+        self.answered = 0
+        self.correct = 0
+
+    @property
+    def use_ansi(self) -> bool:
+        return True
+
+    def write(self, text: str) -> None:
+        if self.keep_output:
+            self.output.append(text)
+        self._screen.append(text)
+
+    def _find_answer(self) -> Optional[str]:
+        """根据界面最后一行找到需要输入的内容，不是题目时返回None"""
+        screen = ANSI_ESCAPE_PATTERN.sub("\n", "".join(self._screen))
+        self._screen.clear()
+        lines = [line for line in screen.split("\n") if line]
+        if not lines:
+            return None
+        # 开启首字母提示时题目后面已经有首字母
+        last_line = lines[-1]
+        split = last_line.rfind(": ") + 2
+        answer = self.answers.get(last_line[:split])
+        typed = last_line[split:]
+        if answer is None or not answer.startswith(typed):
+            return None
+        return answer[len(typed) :]
+
+    def input(self, prompt: str = "") -> str:
+        answer = None if prompt else self._find_answer()
+        self.write(prompt)
+        self.inputs += 1
+
+        if answer is None:
+            text = ""
+        else:
+            self.answered += 1
+            if self._random.random() < self.accuracy:
+                self.correct += 1
+                text = answer
+            else:
+                text = answer + "x"
+
+        delay = self.think_time + self.typing_delay * len(text)
+        if delay > 0:
+            time.sleep(delay)
+        self.write(text + "\n")
+        return text
+
+    def pause(self, seconds: float) -> None:
+        if seconds * self.pause_scale > 0:
+            time.sleep(seconds * self.pause_scale)
+
+    def get_output(self) -> str:
+        return "".join(self.output)
+
+
+class NullAudioEngine(AudioEngine):
+    """
+    不出声的音频引擎
+
+    和 AudioEngine 一样在后台事件循环中排队、打断，但不初始化 pygame，
+    每段音频只读取一遍数据就算播放结束。
+    """
+
+    def __init__(self) -> None:
+        self.load_error = OSError
+        # 不解码，缓存始终为空；淘汰和清空缓存时语音播放器仍会调用它
+        self.sound_cache = SoundCache()
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run_loop, name="null-audio-engine", daemon=True
+        )
+        self._thread.start()
+        self.run(self._start_player())
+
+    async def _player(self) -> None:
+        while True:
+            track = await self._queue.get()
+            if not track.future.done():
+                self._current = track
+                if track.on_start is not None:
+                    track.on_start()
+                try:
+                    source = track.source() if callable(track.source) else track.source
+                    if isinstance(source, (str, Path)):
+                        with open(source, "rb") as f:
+                            f.read()
+                    else:
+                        with source:
+                            source.read()
+                except Exception as e:
+                    track.future.set_exception(e)
+                else:
+                    track.future.set_result(None)
+                finally:
+                    self._current = None
+            self._update_idle()
@@ -0,0 +1,192 @@
+"""
+学习事件日志
+
+每次作答记录为一条事件：时间、单词、单元、输入内容、模式、是否答对、用时（毫秒）。
+事件按列追加写入，每列一个定长的二进制文件（用 array 模块写入），单词、单元和输入内容
+写入字符串表，列中只保存它们在表中的序号。分析时每列可以用 numpy.fromfile 直接载入为数组。
+
+目录结构：
+
+    learning_data/events/<学习者>/session_<时间>_<进程号>/
+        strings.jsonl        字符串表，每行一个 JSON 字符串，行号即序号
+        time.bin             事件时间戳（float64）
+        word.bin ...         其余各列
+
+每次运行新建一个分段目录，只由当前进程追加，多个学习者、多个进程共用同一份程序时不需要加锁。
+写入时先写字符串表再写各列；进程中途退出导致各列长度不一致时，读取时按最短的列截断。
+"""
+
+import atexit
+import array
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# (列名, array 类型码, numpy 类型)
+COLUMNS: List[Tuple[str, str, str]] = [
+    ("time", "d", "f8"),
+    ("word", "I", "u4"),
+    ("unit", "I", "u4"),
+    ("input", "I", "u4"),
+    ("mode", "B", "u1"),
+    ("correct", "B", "u1"),
+    ("response_ms", "I", "u4"),
+]
+STRING_COLUMNS = ("word", "unit", "input")
+MODES = ("learn", "practice", "review")
+STRINGS_FILE_NAME = "strings.jsonl"
+
+
+class SessionEventLog:
+    """
+    当前会话的事件写入器
+
+    事件先缓存在内存中，每 flush_every 条或程序退出时写入一次。
+    """
+
+    def __init__(self, root: Path, learner: str, flush_every: int = 64):
+        """
+        Args:
+            root: 事件日志根目录（其下每个学习者一个目录）
+            learner: 学习者名称
+            flush_every: 缓存多少条事件后写入文件
+        """
+        self.segment_dir = root / learner / f"session_{time.time_ns()}_{os.getpid()}"
+        self.flush_every = flush_every
+
+        self._string_ids: Dict[str, int] = dict()
+        self._pending_strings: List[str] = list()
+        self._columns = {name: array.array(typecode) for name, typecode, _ in COLUMNS}
+        atexit.register(self.flush)
+
+    def _get_string_id(self, text: str) -> int:
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = len(self._string_ids)
+            self._string_ids[text] = string_id
+            self._pending_strings.append(text)
+        return string_id
+
+    def record(
+        self,
+        word: str,
+        mode: str,
+        correct: bool,
+        user_input: str,
+        response_time: float,
+        unit: str = "",
+    ) -> None:
+        """
+        记录一次作答
+
+        Args:
+            word: 单词标识（如 'word:apple'）
+            mode: 学习模式，取值见 MODES
+            correct: 是否答对
+            user_input: 用户输入的内容
+            response_time: 从显示题目到提交答案的用时（秒）
+            unit: 所在单元的路径
+        """
+        columns = self._columns
+        columns["time"].append(time.time())
+        columns["word"].append(self._get_string_id(word))
+        columns["unit"].append(self._get_string_id(unit))
+        columns["input"].append(self._get_string_id(user_input))
+        columns["mode"].append(MODES.index(mode))
+        columns["correct"].append(1 if correct else 0)
+        columns["response_ms"].append(min(int(response_time * 1000), 0xFFFFFFFF))
+        if len(columns["time"]) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """把缓存的事件追加写入文件"""
+        if not self._columns["time"]:
+            return
+        self.segment_dir.mkdir(parents=True, exist_ok=True)
+
+        # 先写字符串表，保证列中引用的序号都能找到
+        if self._pending_strings:
+            with open(self.segment_dir / STRINGS_FILE_NAME, "a", encoding="utf-8") as f:
+                f.writelines(
+                    json.dumps(text, ensure_ascii=False) + "\n"
+                    for text in self._pending_strings
+                )
+            self._pending_strings.clear()
+
+        for name, typecode, _ in COLUMNS:
+            with open(self.segment_dir / f"{name}.bin", "ab") as f:
+                self._columns[name].tofile(f)
+            self._columns[name] = array.array(typecode)
+
+
+def load_events(
+    root: Path, learners: Optional[List[str]] = None
+) -> Tuple[Dict[str, Any], List[str], List[str]]:
+    """
+    读取事件日志（需要 numpy）
+
+    各分段的字符串序号会映射为全局字符串表中的序号。
+
+    Args:
+        root: 事件日志根目录
+        learners: 只读取这些学习者的事件，None为全部
+
+    Returns:
+        (列名 -> numpy 数组, 字符串表, 学习者名称列表)。
+        除 COLUMNS 中的各列外还有 learner 列，值为学习者在名称列表中的序号
+    """
+    import numpy as np
+
+    string_ids: Dict[str, int] = dict()
+    learner_names: List[str] = list()
+    parts: Dict[str, list] = {name: list() for name, _, _ in COLUMNS}
+    parts["learner"] = list()
+
+    for learner_dir in sorted(path for path in root.glob("*") if path.is_dir()):
+        if learners is not None and learner_dir.name not in learners:
+            continue
+        learner_id = len(learner_names)
+        learner_names.append(learner_dir.name)
+
+        for segment_dir in sorted(learner_dir.glob("session_*")):
+            try:
+                with open(segment_dir / STRINGS_FILE_NAME, "r", encoding="utf-8") as f:
+                    # 写了一半的最后一行（没有换行符）对应的事件也没有写入，忽略
+                    local_strings = [
+                        json.loads(line) for line in f if line.endswith("\n")
+                    ]
+                columns = {
+                    name: np.fromfile(segment_dir / f"{name}.bin", dtype=dtype)
+                    for name, _, dtype in COLUMNS
+                }
+            except FileNotFoundError:
+                continue
+
+            length = min(len(column) for column in columns.values())
+            if length == 0:
+                continue
+
+            # 分段内的字符串序号 -> 全局序号
+            mapping = np.array(
+                [
+                    string_ids.setdefault(text, len(string_ids))
+                    for text in local_strings
+                ],
+                dtype="u4",
+            )
+            for name, _, _ in COLUMNS:
+                column = columns[name][:length]
+                parts[name].append(
+                    mapping[column] if name in STRING_COLUMNS else column
+                )
+            parts["learner"].append(np.full(length, learner_id, dtype="u2"))
+
+    dtypes = {name: dtype for name, _, dtype in COLUMNS}
+    dtypes["learner"] = "u2"
+    events = {
+        name: np.concatenate(arrays) if arrays else np.empty(0, dtype=dtypes[name])
+        for name, arrays in parts.items()
+    }
+    return events, list(string_ids), learner_names
@@ -0,0 +1,198 @@
+"""
+间隔重复复习调度
+
+按 SM-2 算法为每个单词/短语记录复习状态（难度系数、间隔天数、连续答对次数、到期时间），
+保存在一个紧凑的 JSON 文件中，跨多次运行保留。到期时间放在小根堆里，
+取出下一个到期条目为 O(log n)，复习时只取到期的内容，不需要遍历整个单词本。
+"""
+
+import heapq
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+STATE_VERSION = 1
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# 复习质量（SM-2 的 0~5 分）：一次答对记 4 分，答错记 2 分
+CORRECT_QUALITY = 4
+WRONG_QUALITY = 2
+
+
+def get_review_key(item: Dict[str, Any]) -> str:
+    """单词和短语分开记录，同一个单词在不同单词本中共用一条复习状态"""
+    if "phrase" in item:
+        return f"phrase:{item['phrase']}"
+    return f"word:{item['word']}"
+
+
+@dataclass
+class ReviewState:
+    """一个单词/短语的复习状态"""
+
+    ease: float = 2.5
+    interval: int = 0
+    repetitions: int = 0
+    lapses: int = 0
+    due: float = 0.0
+
+    def update(self, quality: int, now: float) -> None:
+        """
+        按 SM-2 算法根据本次复习质量更新状态
+
+        Args:
+            quality: 复习质量（0~5），小于3视为没有记住
+            now: 当前时间戳
+        """
+        if quality < 3:
+            self.repetitions = 0
+            self.lapses += 1
+            self.interval = 1
+        else:
+            self.repetitions += 1
+            if self.repetitions == 1:
+                self.interval = 1
+            elif self.repetitions == 2:
+                self.interval = 6
+            else:
+                self.interval = round(self.interval * self.ease)
+        self.ease = max(
+            1.3, self.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+        )
+        self.due = now + self.interval * SECONDS_PER_DAY
+
+
+class ReviewScheduler:
+    """
+    复习调度器
+
+    文件中每个条目保存为 [难度系数, 间隔天数, 连续答对次数, 忘记次数, 到期时间, 单词数据]，
+    保存单词数据是为了复习整个词库时不用解析所有单词本。
+    堆中的过期记录（条目更新后旧的到期时间）在弹出时跳过。
+    """
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: 复习状态文件路径，不存在时从空状态开始
+        """
+        self.path = path
+        self.states: Dict[str, ReviewState] = dict()
+        self.items: Dict[str, Dict[str, Any]] = dict()
+        self._heap: List[Tuple[float, str]] = list()
+        self._dirty = False
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            content = None
+
+        self.states.clear()
+        self.items.clear()
+        if content is not None and content.get("version") == STATE_VERSION:
+            for key, (ease, interval, repetitions, lapses, due, item) in content[
+                "entries"
+            ].items():
+                self.states[key] = ReviewState(ease, interval, repetitions, lapses, due)
+                self.items[key] = item
+
+        self._heap = [(state.due, key) for key, state in self.states.items()]
+        heapq.heapify(self._heap)
+        self._dirty = False
+
+    def save(self) -> None:
+        """有变化时写回文件（先写临时文件再替换）"""
+        if not self._dirty:
+            return
+        entries = {
+            key: [
+                round(state.ease, 3),
+                state.interval,
+                state.repetitions,
+                state.lapses,
+                int(state.due),
+                dict(self.items[key]),
+            ]
+            for key, state in self.states.items()
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": STATE_VERSION, "entries": entries},
+                f,
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+        os.replace(temp_path, self.path)
+        self._dirty = False
+
+    def record(
+        self, item: Dict[str, Any], correct: bool, now: Optional[float] = None
+    ) -> None:
+        """
+        记录一次复习结果，第一次出现的单词会加入调度
+
+        Args:
+            item: 单词或短语数据
+            correct: 是否一次答对
+            now: 当前时间戳，默认为 time.time()
+        """
+        now = time.time() if now is None else now
+        key = get_review_key(item)
+        state = self.states.setdefault(key, ReviewState())
+        state.update(CORRECT_QUALITY if correct else WRONG_QUALITY, now)
+        self.items[key] = item
+        heapq.heappush(self._heap, (state.due, key))
+        self._dirty = True
+
+    def record_results(
+        self, items: Iterable[Dict[str, Any]], wrong_items: Iterable[Dict[str, Any]]
+    ) -> None:
+        """记录一轮练习的结果，wrong_items 中的条目记为答错，其余记为答对"""
+        wrong_keys = {get_review_key(item) for item in wrong_items}
+        now = time.time()
+        for item in items:
+            self.record(item, get_review_key(item) not in wrong_keys, now=now)
+
+    def is_due(self, item: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """条目是否到期（还没有复习记录的条目不算到期）"""
+        state = self.states.get(get_review_key(item))
+        return state is not None and state.due <= (time.time() if now is None else now)
+
+    def pop_due(
+        self, limit: Optional[int] = None, now: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按到期时间从早到晚取出到期的条目
+
+        取出的条目需要通过 record 记录结果，之后会按新的到期时间重新加入堆中。
+
+        Args:
+            limit: 最多取出的条数，None为不限制
+            now: 当前时间戳，默认为 time.time()
+
+        Returns:
+            到期的单词/短语数据列表
+        """
+        now = time.time() if now is None else now
+        due_items = list()
+        seen_keys = set()
+        while self._heap and (limit is None or len(due_items) < limit):
+            due, key = self._heap[0]
+            if due > now:
+                break
+            heapq.heappop(self._heap)
+            state = self.states.get(key)
+            # 条目更新过到期时间，这是旧的记录
+            if state is None or state.due != due or key in seen_keys:
+                continue
+            seen_keys.add(key)
+            due_items.append(self.items[key])
+        return due_items
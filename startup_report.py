@@ -0,0 +1,95 @@
+"""
+启动耗时报告
+
+    python main.py --startup-report
+
+输出三部分后退出：
+
+- 模块导入耗时：在子进程中用 python -X importtime 导入 main，按累计耗时排序
+- 初始化各阶段耗时：创建 WordLearningApp 并准备好首页菜单
+- 较重的依赖（pygame、edge_tts 等）是否已被加载：它们应当在第一次朗读、生成语音或显示表格时才加载
+"""
+
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+BASE_DIR = Path(__file__).absolute().parent
+
+# 启动时不应加载的模块
+DEFERRED_MODULES = ("pygame", "edge_tts", "tabulate", "tqdm", "numpy")
+
+
+class StartupTimer:
+    """记录启动各阶段的耗时，每次 mark 记录距离上一次 mark 的时间"""
+
+    def __init__(self) -> None:
+        self.phases: List[Tuple[str, float]] = list()
+        self._last = time.perf_counter()
+
+    def mark(self, name: str) -> None:
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+
+def measure_imports(module: str = "main") -> List[Tuple[str, float, float]]:
+    """
+    在子进程中导入模块并读取 -X importtime 的输出
+
+    Returns:
+        [(模块名, 自身耗时秒, 累计耗时秒)]，按累计耗时从大到小排列
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    imports = list()
+    for line in result.stderr.splitlines():
+        # import time:   self [us] | cumulative | imported package
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        imports.append(
+            (
+                fields[2].strip(),
+                int(fields[0]) / 1_000_000,
+                int(fields[1]) / 1_000_000,
+            )
+        )
+    return sorted(imports, key=lambda item: item[2], reverse=True)
+
+
+def print_startup_report(app_factory: Callable, top: int = 15) -> None:
+    """
+    输出启动耗时报告
+
+    Args:
+        app_factory: 创建程序对象的函数，接受 startup_timer 参数（即 WordLearningApp）
+        top: 显示导入耗时最多的模块数
+    """
+    imports = measure_imports()
+    print("模块导入耗时（累计 / 自身，毫秒）")
+    for name, self_time, cumulative in imports[:top]:
+        print(f"  {cumulative * 1000:8.1f} {self_time * 1000:8.1f}  {name}")
+
+    timer = StartupTimer()
+    app = app_factory(startup_timer=timer)
+    list(app.get_current_content().keys())
+    timer.mark("准备首页菜单")
+
+    print("\n初始化耗时（毫秒）")
+    for name, elapsed in timer.phases:
+        print(f"  {elapsed * 1000:8.1f}  {name}")
+    print(f"  {sum(elapsed for _, elapsed in timer.phases) * 1000:8.1f}  合计")
+
+    print("\n延迟加载的模块")
+    for module in DEFERRED_MODULES:
+        state = "已加载（启动变慢了）" if module in sys.modules else "未加载"
+        print(f"  {module}: {state}")
@@ -0,0 +1,108 @@
+"""
+终端渲染
+
+用 ANSI 转义序列清屏和重绘界面，代替每次刷新都启动一个 shell 进程的 os.system("clear")。
+draw 会记住上一次画出的各行，下一次只重写内容有变化的行，刷新时几乎不闪烁。
+
+输出不是终端或 TERM=dumb 时不使用转义序列，仍然调用 cls/clear 命令清屏。
+Windows 上由 colorama.init() 负责把转义序列转换为控制台调用。
+"""
+
+import os
+import platform
+import re
+import shutil
+import sys
+import unicodedata
+from typing import Callable, List, Optional
+
+CSI = "\033["
+ANSI_ESCAPE_PATTERN = re.compile(r"\033\[[0-9;]*[A-Za-z]")
+
+
+def display_width(text: str) -> int:
+    """计算文本在终端中占的列数（不算颜色代码，中文等全角字符占两列）"""
+    text = ANSI_ESCAPE_PATTERN.sub("", text)
+    return sum(2 if unicodedata.east_asian_width(char) in "WF" else 1 for char in text)
+
+
+def supports_ansi() -> bool:
+    """标准输出是否为支持转义序列的终端"""
+    if os.environ.get("TERM") == "dumb":
+        return False
+    isatty = getattr(sys.stdout, "isatty", None)
+    return bool(isatty and isatty())
+
+
+class TerminalRenderer:
+    """
+    整屏绘制界面，只重写变化的行
+
+    每一屏从左上角开始画，最后一行通常是输入提示，画完后光标停在这一行末尾，
+    接着调用 input() 即可。两次 draw 之间除了 input 的回显不应有其他输出，
+    否则需要先调用 clear，让下一次 draw 整屏重画。
+    """
+
+    def __init__(
+        self,
+        use_ansi: Optional[bool] = None,
+        write: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        Args:
+            use_ansi: 是否使用转义序列，默认根据标准输出自动判断
+            write: 输出函数，默认写入标准输出
+        """
+        self.use_ansi = supports_ansi() if use_ansi is None else use_ansi
+        self.write = write
+        self.clear_command = "cls" if platform.system() == "Windows" else "clear"
+        # 上一次 draw 画出的各行，None 表示屏幕上的内容未知
+        self._frame: Optional[List[str]] = None
+
+    def _write(self, text: str) -> None:
+        if self.write is not None:
+            self.write(text)
+            return
+        # colorama.init() 会替换 sys.stdout，每次写入时再取
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    def clear(self) -> None:
+        """清空屏幕，光标回到左上角"""
+        self._frame = None
+        if self.use_ansi:
+            self._write(f"{CSI}H{CSI}2J")
+        else:
+            os.system(self.clear_command)
+
+    def draw(self, lines: List[str]) -> None:
+        """
+        画出一屏内容
+
+        Args:
+            lines: 每行的内容，可以包含颜色代码；包含换行符的元素（如表格）会拆成多行
+        """
+        lines = [part for line in lines for part in line.split("\n")] or [""]
+
+        columns, rows = shutil.get_terminal_size()
+        # 有行被自动折行，或者回车后屏幕会滚动时，行号对不上，只能整屏重画
+        fits = len(lines) < rows and all(
+            display_width(line) < columns for line in lines
+        )
+        if not self.use_ansi or not fits:
+            self.clear()
+            self._write("\n".join(lines))
+            return
+
+        previous = self._frame
+        output = [] if previous is not None else [f"{CSI}H{CSI}2J"]
+        for row, line in enumerate(lines):
+            # 上一屏的最后一行可能被 input 的回显改过，总是重画
+            if previous is not None and row < len(previous) - 1:
+                if previous[row] == line:
+                    continue
+            output.append(f"{CSI}{row + 1};1H{line}{CSI}K")
+        # 光标移到最后一行末尾，并清掉下面残留的内容（包括上一次输入后的换行）
+        output.append(f"{CSI}{len(lines)};{display_width(lines[-1]) + 1}H{CSI}J")
+        self._write("".join(output))
+        self._frame = lines
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 测试直接导入仓库根目录下的模块
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
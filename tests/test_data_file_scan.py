@@ -0,0 +1,73 @@
+"""scan_data_file_units 只扫描字节找单元范围，结果要和完整解析一致"""
+
+import json
+
+import pytest
+
+from py_handle_profiles import handle_configuration_files
+from py_handle_profiles.handle_configuration_files import (
+    load_data_file,
+    load_data_unit,
+    scan_data_file_units,
+)
+
+# 字符串中的括号、转义的引号和反斜杠、中文和转义的单元名、空单元、嵌套数组
+TRICKY_DATA = {
+    "unit1": {
+        "words": [
+            {"word": "brace", "meaning": "括号 { } [ ]", "example": 'say "}" \\ ok'},
+            {"word": "apple", "meaning": "苹果", "tags": [["a", "b"], []]},
+        ],
+        "phrases": [{"phrase": "a [lot] of", "meaning": "许多"}],
+    },
+    "第二单元": {"words": [{"word": "pear", "meaning": "梨"}]},
+    'quote"key': {"words": []},
+    "empty": {},
+}
+
+
+@pytest.mark.parametrize("indent", [None, 4])
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_scan_matches_full_parse(indent, ensure_ascii):
+    data = json.dumps(TRICKY_DATA, indent=indent, ensure_ascii=ensure_ascii).encode(
+        "utf-8"
+    )
+    units = scan_data_file_units(data)
+
+    assert list(units) == list(TRICKY_DATA)
+    for unit_key, (start, end) in units.items():
+        assert json.loads(data[start:end]) == TRICKY_DATA[unit_key]
+
+
+def test_load_data_unit_matches_load_data_file(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    units = {
+        f"unit{i}": {
+            "words": [
+                {"word": f"word{i}_{j}", "meaning": f"释义 {{{j}}}"} for j in range(20)
+            ],
+            "phrases": [{"phrase": f"phrase {i}", "meaning": "短语"}],
+        }
+        for i in range(10)
+    }
+    (data_dir / "big.json").write_text(
+        json.dumps(units, ensure_ascii=False, indent=4), encoding="utf-8"
+    )
+    monkeypatch.setattr(handle_configuration_files, "DATA_DIR", str(data_dir))
+    monkeypatch.setattr(
+        handle_configuration_files, "DATA_FILE_INDEX_DIR", str(tmp_path / "index")
+    )
+
+    full = load_data_file("big.json")
+    # 所有文件都按大文件处理，通过单元位置索引读取
+    monkeypatch.setattr(handle_configuration_files, "LARGE_DATA_FILE_BYTES", 0)
+    for unit_key in units:
+        unit = load_data_unit("big.json", unit_key)
+        for key in ("words", "phrases"):
+            assert [dict(item) for item in unit[key]] == [
+                dict(item) for item in full[unit_key][key]
+            ]
+
+    with pytest.raises(ValueError):
+        load_data_unit("big.json", "missing")
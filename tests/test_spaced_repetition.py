@@ -0,0 +1,53 @@
+"""复习调度器按到期时间取出条目"""
+
+from spaced_repetition import SECONDS_PER_DAY, ReviewScheduler
+
+NOW = 1_700_000_000.0
+
+
+def word(name: str) -> dict:
+    return {"word": name, "meaning": "释义"}
+
+
+def test_pop_due_in_due_order_with_limit(tmp_path):
+    scheduler = ReviewScheduler(tmp_path / "review.json")
+    # 答错的一天后到期，答对两次的六天后到期
+    scheduler.record(word("late"), True, now=NOW - 3 * SECONDS_PER_DAY)
+    scheduler.record(word("late"), True, now=NOW - 2 * SECONDS_PER_DAY)
+    scheduler.record(word("early"), False, now=NOW - 5 * SECONDS_PER_DAY)
+    scheduler.record(word("middle"), False, now=NOW - 4 * SECONDS_PER_DAY)
+    scheduler.record(word("future"), False, now=NOW)
+
+    assert [item["word"] for item in scheduler.pop_due(limit=2, now=NOW)] == [
+        "early",
+        "middle",
+    ]
+    # late 六天后才到期
+    assert scheduler.pop_due(now=NOW) == []
+    assert [
+        item["word"] for item in scheduler.pop_due(now=NOW + 5 * SECONDS_PER_DAY)
+    ] == ["future", "late"]
+
+
+def test_pop_due_skips_stale_heap_records(tmp_path):
+    scheduler = ReviewScheduler(tmp_path / "review.json")
+    scheduler.record(word("apple"), False, now=NOW - 2 * SECONDS_PER_DAY)
+    # 重新记录后旧的到期时间留在堆中，弹出时要跳过，同一条目只取出一次
+    scheduler.record(word("apple"), False, now=NOW - 1.5 * SECONDS_PER_DAY)
+    assert [item["word"] for item in scheduler.pop_due(now=NOW)] == ["apple"]
+
+    scheduler.record(word("pear"), False, now=NOW - 2 * SECONDS_PER_DAY)
+    scheduler.record(word("pear"), True, now=NOW)
+    assert scheduler.pop_due(now=NOW) == []
+
+
+def test_pop_due_after_reload(tmp_path):
+    path = tmp_path / "review.json"
+    scheduler = ReviewScheduler(path)
+    scheduler.record(word("apple"), False, now=NOW - 2 * SECONDS_PER_DAY)
+    scheduler.record({"phrase": "a lot of", "meaning": "许多"}, True, now=NOW)
+    scheduler.save()
+
+    reloaded = ReviewScheduler(path)
+    assert reloaded.is_due(word("apple"), now=NOW)
+    assert reloaded.pop_due(now=NOW) == [word("apple")]
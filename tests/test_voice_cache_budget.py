@@ -0,0 +1,75 @@
+"""按最近播放时间淘汰缓存时跳过固定的语音"""
+
+import asyncio
+
+import pytest
+
+from voice_player_with_cache import VoicePlayerWithCache
+
+VOICE = "en-US-AvaNeural"
+TEXTS = [f"word{i}" for i in range(5)]
+
+
+@pytest.fixture(params=["files", "pack"])
+def voice_player(request, tmp_path):
+    voice_player = VoicePlayerWithCache(
+        cache_dir=str(tmp_path),
+        default_voice=VOICE,
+        backend="offline",
+        backend_options={"latency": 0},
+        cache_backend=request.param,
+    )
+    report = asyncio.run(
+        voice_player.pregenerate_voices(TEXTS, show_progress_bar=False)
+    )
+    assert report.generated == len(TEXTS)
+    # 按 TEXTS 的顺序播放一遍，word0 最久没有播放
+    for text in TEXTS:
+        voice_player.manifest.touch(voice_player.get_file_name(text, VOICE))
+    yield voice_player
+    voice_player.store.close()
+
+
+def cached_texts(voice_player: VoicePlayerWithCache) -> list:
+    return [text for text in TEXTS if not voice_player.get_uncached([text])]
+
+
+def test_evicts_least_recently_played(voice_player):
+    voice_player.cache_max_entries = 3
+
+    assert voice_player.enforce_cache_budget() == 2
+    assert cached_texts(voice_player) == TEXTS[2:]
+    for text in TEXTS[:2]:
+        assert not voice_player.store.exists(voice_player.get_file_name(text, VOICE))
+
+
+def test_skips_pinned(voice_player):
+    voice_player.pin(TEXTS[:2])
+    voice_player.cache_max_entries = 2
+
+    assert voice_player.enforce_cache_budget() == 3
+    assert cached_texts(voice_player) == TEXTS[:2]
+
+    # 固定的语音超出上限时也不淘汰
+    voice_player.cache_max_entries = 1
+    assert voice_player.enforce_cache_budget() == 0
+    assert cached_texts(voice_player) == TEXTS[:2]
+
+    voice_player.unpin_all()
+    assert voice_player.enforce_cache_budget() == 1
+    assert cached_texts(voice_player) == TEXTS[1:2]
+
+
+def test_byte_budget(voice_player):
+    sizes = {
+        text: voice_player.manifest.entries[voice_player.get_file_name(text, VOICE)][
+            "size"
+        ]
+        for text in TEXTS
+    }
+    voice_player.pin([TEXTS[0]])
+    voice_player.cache_max_bytes = sizes[TEXTS[0]] + sizes[TEXTS[4]]
+
+    assert voice_player.enforce_cache_budget() == 3
+    assert cached_texts(voice_player) == [TEXTS[0], TEXTS[4]]
+    assert voice_player.manifest.total_size() == voice_player.cache_max_bytes
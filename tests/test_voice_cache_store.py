@@ -0,0 +1,93 @@
+"""包文件存储的写入、删除、整理和重新打开"""
+
+import pytest
+
+from voice_cache_store import PackVoiceStore
+
+
+def audio(i: int, size: int = 1000) -> bytes:
+    return bytes([i % 256]) * size
+
+
+def test_write_read_delete(tmp_path):
+    store = PackVoiceStore(tmp_path)
+    try:
+        for i in range(10):
+            store.write(f"voice{i}.mp3", audio(i))
+        store.delete("voice3.mp3")
+
+        assert not store.exists("voice3.mp3")
+        with pytest.raises(FileNotFoundError):
+            store.read("voice3.mp3")
+        for i in range(10):
+            if i != 3:
+                assert store.read(f"voice{i}.mp3") == audio(i)
+        assert store.live_bytes == 9 * 1000
+        assert sorted(name for name, _, _ in store.scan()) == sorted(
+            f"voice{i}.mp3" for i in range(10) if i != 3
+        )
+    finally:
+        store.close()
+
+
+def test_compact_reclaims_deleted_space(tmp_path):
+    store = PackVoiceStore(tmp_path, segment_max_bytes=4000)
+    try:
+        for i in range(20):
+            store.write(f"voice{i}.mp3", audio(i))
+        for i in range(0, 20, 2):
+            store.delete(f"voice{i}.mp3")
+
+        size_before, size_after = store.compact()
+        assert size_before == 20 * 1000
+        assert size_after == 10 * 1000
+        assert store.live_bytes == 10 * 1000
+        for i in range(1, 20, 2):
+            assert store.read(f"voice{i}.mp3") == audio(i)
+        # 整理后还能继续写入
+        store.write("new.mp3", audio(99))
+        assert store.read("new.mp3") == audio(99)
+    finally:
+        store.close()
+
+    # 重新打开时从重写后的索引读取
+    reopened = PackVoiceStore(tmp_path)
+    try:
+        assert sorted(reopened.index) == sorted(
+            [f"voice{i}.mp3" for i in range(1, 20, 2)] + ["new.mp3"]
+        )
+        for i in range(1, 20, 2):
+            assert reopened.read(f"voice{i}.mp3") == audio(i)
+        assert reopened.read("new.mp3") == audio(99)
+    finally:
+        reopened.close()
+
+
+def test_compact_refused_while_other_store_open(tmp_path):
+    store = PackVoiceStore(tmp_path)
+    other = PackVoiceStore(tmp_path)
+    try:
+        store.write("voice.mp3", audio(1))
+        with pytest.raises(RuntimeError):
+            store.compact()
+        # 其他存储写入的语音在查不到时从索引增量读取
+        assert other.read("voice.mp3") == audio(1)
+    finally:
+        other.close()
+        store.close()
+
+
+def test_compact_if_wasteful(tmp_path):
+    store = PackVoiceStore(tmp_path)
+    try:
+        for i in range(10):
+            store.write(f"voice{i}.mp3", audio(i))
+        store.delete("voice0.mp3")
+        # 已删除的空间不到 25%，不整理
+        assert store.compact_if_wasteful(min_dead_bytes=0) is None
+
+        for i in range(1, 5):
+            store.delete(f"voice{i}.mp3")
+        assert store.compact_if_wasteful(min_dead_bytes=0) == (10 * 1000, 5 * 1000)
+    finally:
+        store.close()
@@ -0,0 +1,192 @@
+"""
+语音合成后端
+
+- EdgeTTSBackend：调用 edge-tts 在线合成（默认）
+- OfflineBackend：不联网，生成确定性的测试音频，可配置延迟和失败率，
+  用于在没有网络的机器上测试和调优缓存、并发和预取
+"""
+
+import array
+import asyncio
+import hashlib
+import io
+import math
+import random
+import wave
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple, Union
+
+
+class SynthesisBackend(ABC):
+    """语音合成后端的接口"""
+
+    # 合成结果的格式，作为缓存文件名的后缀
+    audio_suffix = ".mp3"
+
+    @abstractmethod
+    async def synthesize(self, text: str, voice: str, rate: str, volume: str) -> bytes:
+        """
+        合成一条语音
+
+        Args:
+            text: 要合成的文本
+            voice: 语音模型
+            rate: 语速，例如 "+10%"
+            volume: 音量，例如 "+0%"
+
+        Returns:
+            音频文件的完整内容
+        """
+
+    async def synthesize_batch(
+        self, items: List[Tuple[str, str]], rate: str, volume: str
+    ) -> List[Union[bytes, Exception]]:
+        """
+        批量合成语音，结果顺序与items一致，失败的条目返回异常对象而不是抛出
+
+        默认同时发起每一条的 synthesize，支持批量接口的后端可以覆盖为一次请求。
+
+        Args:
+            items: (文本, 语音模型) 列表
+            rate: 语速
+            volume: 音量
+        """
+        return await asyncio.gather(
+            *(self.synthesize(text, voice, rate, volume) for text, voice in items),
+            return_exceptions=True,
+        )
+
+    @abstractmethod
+    async def list_voices(self) -> List[str]:
+        """返回可用的语音模型名称"""
+
+
+class EdgeTTSBackend(SynthesisBackend):
+    """edge-tts 在线合成，输出 mp3"""
+
+    async def synthesize(self, text: str, voice: str, rate: str, volume: str) -> bytes:
+        import edge_tts
+
+        communicate = edge_tts.Communicate(
+            text=text, voice=voice, rate=rate, volume=volume
+        )
+        audio = bytearray()
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                audio.extend(chunk["data"])
+        if not audio:
+            raise RuntimeError("没有收到音频数据")
+        return bytes(audio)
+
+    async def list_voices(self) -> List[str]:
+        import edge_tts
+
+        return [voice["ShortName"] for voice in await edge_tts.list_voices()]
+
+
+class OfflineBackend(SynthesisBackend):
+    """
+    离线合成后端，输出 WAV
+
+    同样的「语音模型+文本」总是生成同样的音频：音高由语音模型的哈希决定，时长随文本长度增加。
+    每个语音模型的正弦波只计算一次，之后按时长截取，生成一条音频几乎不占用事件循环，
+    测出的延迟和并发只反映设置的 latency，不受生成音频的耗时影响。
+    延迟和失败由固定种子的随机数决定，便于重复测试。
+    """
+
+    DEFAULT_VOICES = ["en-US-AriaNeural", "en-GB-RyanNeural", "zh-CN-XiaoxiaoNeural"]
+    audio_suffix = ".wav"
+    # 音频的最长时长（秒）
+    MAX_DURATION = 3.0
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        latency_jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+        sample_rate: int = 24000,
+        voices: Optional[List[str]] = None,
+        silence: float = 0.0,
+    ):
+        """
+        Args:
+            latency: 每次合成的基础延迟（秒）
+            latency_jitter: 延迟的随机波动范围（秒），实际延迟在 latency 到 latency + latency_jitter 之间
+            failure_rate: 每次合成失败的概率（0~1）
+            seed: 随机数种子
+            sample_rate: 生成音频的采样率
+            voices: list_voices 返回的语音模型
+            silence: 音频首尾各加上多长的静音（秒），模拟在线合成结果中的静音
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.failure_rate = failure_rate
+        self.sample_rate = sample_rate
+        self.voices = voices or self.DEFAULT_VOICES
+        self.silence = silence
+        self._random = random.Random(seed)
+        # 语音模型 -> 最长时长的正弦波
+        self._tones: Dict[str, array.array] = dict()
+
+    def _get_tone(self, voice: str) -> array.array:
+        tone = self._tones.get(voice)
+        if tone is None:
+            digest = hashlib.md5(voice.encode("utf-8")).digest()
+            frequency = 200 + int.from_bytes(digest[:2], "big") % 600
+            tone = array.array(
+                "h",
+                (
+                    int(
+                        12000 * math.sin(2 * math.pi * frequency * i / self.sample_rate)
+                    )
+                    for i in range(int(self.MAX_DURATION * self.sample_rate))
+                ),
+            )
+            self._tones[voice] = tone
+        return tone
+
+    def render(self, text: str, voice: str) -> bytes:
+        """生成确定性的音频（带淡入淡出的正弦波）"""
+        duration = min(0.15 + 0.06 * len(text), self.MAX_DURATION)
+        frame_count = int(duration * self.sample_rate)
+        fade_frames = max(1, min(int(0.01 * self.sample_rate), frame_count // 2))
+
+        tone = self._get_tone(voice)[:frame_count]
+        # 只有两端的淡入淡出需要逐个采样计算
+        for i in range(fade_frames):
+            tone[i] = int(tone[i] * i / fade_frames)
+            tone[frame_count - 1 - i] = int(
+                tone[frame_count - 1 - i] * (i + 1) / fade_frames
+            )
+
+        silence_frames = array.array(
+            "h", bytes(2 * int(self.silence * self.sample_rate))
+        )
+        samples = silence_frames + tone + silence_frames
+
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(samples.tobytes())
+        return buffer.getvalue()
+
+    async def synthesize(self, text: str, voice: str, rate: str, volume: str) -> bytes:
+        await asyncio.sleep(self.latency + self._random.random() * self.latency_jitter)
+        if self._random.random() < self.failure_rate:
+            raise ConnectionError("离线后端模拟的合成失败")
+        return self.render(text, voice)
+
+    async def list_voices(self) -> List[str]:
+        return list(self.voices)
+
+
+def create_synthesis_backend(name: str, **options) -> SynthesisBackend:
+    """根据设置中的 backend 名称创建合成后端"""
+    if name == "edge":
+        return EdgeTTSBackend(**options)
+    if name == "offline":
+        return OfflineBackend(**options)
+    raise ValueError(f"语音合成后端 {name} 不存在，可选值为 edge 或 offline")
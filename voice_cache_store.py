@@ -0,0 +1,418 @@
+"""
+语音缓存的存储后端
+
+- FileVoiceStore：每条语音一个 mp3 或 WAV 文件，放在缓存目录下（默认，兼容旧版本的缓存目录）
+- PackVoiceStore：把语音追加写入少量大的分段文件，另用一个追加写入的索引记录每条语音的
+  (分段, 偏移量, 长度)，读取时通过 mmap 直接切片，不需要为每条语音打开一个文件
+"""
+
+import io
+import json
+import mmap
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple, Union
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+
+def try_lock_file(f: BinaryIO) -> bool:
+    """对文件加排他锁（进程退出时由系统释放），已被锁住时立即返回 False"""
+    try:
+        if sys.platform == "win32":
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def lock_file(f: BinaryIO) -> None:
+    """对文件加排他锁，已被锁住时等待"""
+    while not try_lock_file(f):
+        time.sleep(0.05)
+
+
+def unlock_file(f: BinaryIO) -> None:
+    if sys.platform == "win32":
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class FileVoiceStore:
+    """每条语音一个文件的存储后端"""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+
+    def write(self, name: str, data: bytes) -> None:
+        """写入一条语音（先写临时文件再替换，避免留下写了一半的文件）"""
+        temp_path = self.cache_dir / f"{name}.{os.getpid()}.tmp"
+        temp_path.write_bytes(data)
+        os.replace(temp_path, self.cache_dir / name)
+
+    def exists(self, name: str) -> bool:
+        return (self.cache_dir / name).exists()
+
+    def read(self, name: str) -> bytes:
+        return (self.cache_dir / name).read_bytes()
+
+    def open_for_playback(self, name: str) -> Union[str, BinaryIO]:
+        """返回可以直接交给 pygame 加载的文件路径"""
+        return str(self.cache_dir / name)
+
+    def delete(self, name: str) -> None:
+        (self.cache_dir / name).unlink(missing_ok=True)
+
+    def scan(self) -> Iterator[Tuple[str, int, float]]:
+        """遍历所有缓存，返回 (名称, 大小, 修改时间)"""
+        with os.scandir(self.cache_dir) as it:
+            for dir_entry in it:
+                if dir_entry.is_file() and dir_entry.name.endswith((".mp3", ".wav")):
+                    stat = dir_entry.stat()
+                    yield dir_entry.name, stat.st_size, stat.st_mtime
+
+    def compact(self) -> Tuple[int, int]:
+        """单文件存储没有可回收的空间，返回 (整理前字节数, 整理后字节数)"""
+        total_size = sum(size for _, size, _ in self.scan())
+        return total_size, total_size
+
+    def compact_if_wasteful(self) -> Optional[Tuple[int, int]]:
+        """删除文件时空间已经释放，不需要整理"""
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+class PackVoiceStore:
+    """
+    分段包文件存储后端
+
+    每个进程只向自己创建的分段追加数据，多个进程共用同一个缓存目录时不会互相覆盖；
+    索引文件每行一条 JSON 记录（put/del），其他进程写入的新记录在查不到时增量读取。
+    删除只追加 del 记录，占用的空间在 compact 时回收，淘汰缓存后由 compact_if_wasteful 在
+    已删除的语音占用较多空间时自动整理。
+
+    compact 会重写所有分段和索引，只能在没有其他进程打开缓存时进行：每个打开缓存的存储在 clients 目录下
+    持有一个加了锁的登记文件，compact 在 compact.lock 的锁内确认其他登记文件都没有被锁住（进程已退出）才整理，
+    新打开缓存的进程也要先取得 compact.lock 才能登记，整理期间会等待整理完成。
+    """
+
+    PACK_DIR_NAME = "packs"
+    INDEX_FILE_NAME = "index.log"
+    CLIENTS_DIR_NAME = "clients"
+    COMPACT_LOCK_NAME = "compact.lock"
+
+    def __init__(self, cache_dir: Path, segment_max_bytes: int = 64 * 1024 * 1024):
+        self.pack_dir = cache_dir / self.PACK_DIR_NAME
+        self.pack_dir.mkdir(exist_ok=True)
+        self.index_path = self.pack_dir / self.INDEX_FILE_NAME
+        self.segment_max_bytes = segment_max_bytes
+
+        # 名称 -> (分段文件名, 偏移量, 长度)
+        self.index: Dict[str, Tuple[str, int, int]] = dict()
+        self._index_position = 0
+        # 索引中仍然有效的语音的总字节数，分段总大小减去它就是已删除的语音占用的空间
+        self.live_bytes = 0
+
+        self._maps: Dict[str, mmap.mmap] = dict()
+        self._active_segment: Optional[str] = None
+        self._active_file: Optional[BinaryIO] = None
+        self._active_size = 0
+
+        self.clients_dir = self.pack_dir / self.CLIENTS_DIR_NAME
+        self.clients_dir.mkdir(exist_ok=True)
+        self._client_file: Optional[BinaryIO] = None
+        with self._compact_lock():
+            self._register_client()
+            self._refresh_index()
+
+    @contextmanager
+    def _compact_lock(self) -> Iterator[None]:
+        """跨进程的 compact.lock，整理缓存和登记新的进程时持有"""
+        with open(self.pack_dir / self.COMPACT_LOCK_NAME, "a+b") as f:
+            lock_file(f)
+            try:
+                yield
+            finally:
+                unlock_file(f)
+
+    def _register_client(self) -> None:
+        """登记本存储正在使用缓存，登记文件的锁在 close 或进程退出时释放"""
+        client_path = self.clients_dir / f"{os.getpid()}_{time.time_ns()}.lock"
+        self._client_file = open(client_path, "a+b")
+        lock_file(self._client_file)
+
+    def _other_clients_active(self) -> bool:
+        """其他存储是否正在使用缓存，已退出的进程留下的登记文件顺便删除（需持有 compact.lock）"""
+        own_name = Path(self._client_file.name).name if self._client_file else None
+        active = False
+        for client_path in self.clients_dir.glob("*.lock"):
+            if client_path.name == own_name:
+                continue
+            try:
+                f = open(client_path, "a+b")
+            except OSError:
+                # Windows 下被其他进程打开的文件可能无法再打开
+                active = True
+                continue
+            with f:
+                locked = try_lock_file(f)
+                if locked:
+                    unlock_file(f)
+            if locked:
+                client_path.unlink(missing_ok=True)
+            else:
+                active = True
+        return active
+
+    def _refresh_index(self) -> None:
+        """读取索引文件中上次读取之后新增的记录"""
+        try:
+            if self.index_path.stat().st_size < self._index_position:
+                # 索引被 compact 重写过，整体重新读取
+                self.index.clear()
+                self.live_bytes = 0
+                self._index_position = 0
+            with open(self.index_path, "rb") as f:
+                f.seek(self._index_position)
+                content = f.read()
+        except FileNotFoundError:
+            return
+
+        # 只处理完整的行，另一个进程写了一半的行留到下次
+        complete_length = content.rfind(b"\n") + 1
+        for line in content[:complete_length].splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record["op"] == "put":
+                self._set_location(
+                    record["name"],
+                    record["segment"],
+                    record["offset"],
+                    record["length"],
+                )
+            elif record["op"] == "del":
+                self._forget(record["name"])
+        self._index_position += complete_length
+
+    def _set_location(self, name: str, segment: str, offset: int, length: int) -> None:
+        self._forget(name)
+        self.index[name] = (segment, offset, length)
+        self.live_bytes += length
+
+    def _forget(self, name: str) -> None:
+        location = self.index.pop(name, None)
+        if location is not None:
+            self.live_bytes -= location[2]
+
+    def _append_index(self, record: dict) -> None:
+        # 先读入其他进程追加的记录，保证记下的读取位置不会跳过别人的记录
+        self._refresh_index()
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(self.index_path, "ab") as f:
+            f.write(line)
+        self._index_position += len(line)
+
+    def _open_new_segment(self) -> None:
+        if self._active_file is not None:
+            self._active_file.close()
+        self._active_segment = f"segment_{time.time_ns()}_{os.getpid()}.pack"
+        self._active_file = open(self.pack_dir / self._active_segment, "ab")
+        self._active_size = 0
+
+    def write(self, name: str, data: bytes) -> None:
+        if (
+            self._active_file is None
+            or self._active_size + len(data) > self.segment_max_bytes
+        ):
+            self._open_new_segment()
+
+        offset = self._active_size
+        self._active_file.write(data)
+        self._active_file.flush()
+        self._active_size += len(data)
+
+        self._append_index(
+            {
+                "op": "put",
+                "name": name,
+                "segment": self._active_segment,
+                "offset": offset,
+                "length": len(data),
+            }
+        )
+        self._set_location(name, self._active_segment, offset, len(data))
+
+    def exists(self, name: str) -> bool:
+        if name not in self.index:
+            self._refresh_index()
+        return name in self.index
+
+    def _get_map(self, segment: str, needed_size: int) -> mmap.mmap:
+        segment_map = self._maps.get(segment)
+        if segment_map is None or len(segment_map) < needed_size:
+            # 分段还在增长时，已有映射可能不够长，需要重新映射
+            if segment_map is not None:
+                segment_map.close()
+            with open(self.pack_dir / segment, "rb") as f:
+                segment_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = segment_map
+        return segment_map
+
+    def read(self, name: str) -> bytes:
+        if not self.exists(name):
+            raise FileNotFoundError(f"缓存中没有 {name}")
+        segment, offset, length = self.index[name]
+        return self._get_map(segment, offset + length)[offset : offset + length]
+
+    def open_for_playback(self, name: str) -> Union[str, BinaryIO]:
+        """返回内存中的文件对象，pygame 加载时需要指定格式"""
+        return io.BytesIO(self.read(name))
+
+    def delete(self, name: str) -> None:
+        if self.exists(name):
+            self._append_index({"op": "del", "name": name})
+            self._forget(name)
+
+    def scan(self) -> Iterator[Tuple[str, int, float]]:
+        self._refresh_index()
+        segment_mtimes: Dict[str, float] = dict()
+        for name, (segment, _, length) in list(self.index.items()):
+            if segment not in segment_mtimes:
+                try:
+                    segment_mtimes[segment] = (self.pack_dir / segment).stat().st_mtime
+                except FileNotFoundError:
+                    segment_mtimes[segment] = 0.0
+            yield name, length, segment_mtimes[segment]
+
+    def _segment_files(self) -> list[Path]:
+        return sorted(self.pack_dir.glob("segment_*.pack"))
+
+    def compact_if_wasteful(
+        self, max_dead_ratio: float = 0.25, min_dead_bytes: int = 16 * 1024 * 1024
+    ) -> Optional[Tuple[int, int]]:
+        """
+        已删除的语音占用的空间超过分段总大小的 max_dead_ratio 且不少于 min_dead_bytes 时整理
+
+        Returns:
+            compact 的结果，不需要整理或其他进程正在使用缓存时为 None
+        """
+        segment_bytes = sum(path.stat().st_size for path in self._segment_files())
+        dead_bytes = segment_bytes - self.live_bytes
+        if dead_bytes < min_dead_bytes or dead_bytes < segment_bytes * max_dead_ratio:
+            return None
+        try:
+            return self.compact()
+        except RuntimeError:
+            return None
+
+    def compact(self) -> Tuple[int, int]:
+        """
+        把仍然有效的语音重新写入新的分段，删除旧分段并重写索引
+
+        其他进程正在使用缓存时不整理，抛出 RuntimeError。
+
+        Returns:
+            (整理前分段总字节数, 整理后分段总字节数)
+        """
+        with self._compact_lock():
+            if self._other_clients_active():
+                raise RuntimeError("其他进程正在使用语音缓存，请关闭后再整理")
+            return self._compact()
+
+    def _compact(self) -> Tuple[int, int]:
+        self._refresh_index()
+        old_segments = self._segment_files()
+        size_before = sum(path.stat().st_size for path in old_segments)
+
+        new_index: Dict[str, Tuple[str, int, int]] = dict()
+        new_segments: list[str] = list()
+        segment_file: Optional[BinaryIO] = None
+        segment_size = 0
+        try:
+            # 逐条从旧分段的映射中复制，不把整个缓存读进内存
+            for name in list(self.index):
+                data = self.read(name)
+                if segment_file is None or segment_size + len(data) > (
+                    self.segment_max_bytes
+                ):
+                    if segment_file is not None:
+                        segment_file.close()
+                    new_segments.append(f"segment_{time.time_ns()}_{os.getpid()}.pack")
+                    segment_file = open(self.pack_dir / new_segments[-1], "wb")
+                    segment_size = 0
+                segment_file.write(data)
+                new_index[name] = (new_segments[-1], segment_size, len(data))
+                segment_size += len(data)
+        finally:
+            if segment_file is not None:
+                segment_file.close()
+        self._close_segments()
+
+        temp_index_path = self.index_path.with_name(
+            f"{self.INDEX_FILE_NAME}.{os.getpid()}.tmp"
+        )
+        with open(temp_index_path, "wb") as f:
+            for name, (segment, offset, length) in new_index.items():
+                record = {
+                    "op": "put",
+                    "name": name,
+                    "segment": segment,
+                    "offset": offset,
+                    "length": length,
+                }
+                f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        os.replace(temp_index_path, self.index_path)
+
+        for path in old_segments:
+            path.unlink(missing_ok=True)
+
+        self.index = new_index
+        self.live_bytes = sum(length for _, _, length in new_index.values())
+        self._index_position = self.index_path.stat().st_size
+        size_after = sum(
+            (self.pack_dir / segment).stat().st_size for segment in new_segments
+        )
+        return size_before, size_after
+
+    def _close_segments(self) -> None:
+        for segment_map in self._maps.values():
+            segment_map.close()
+        self._maps.clear()
+        if self._active_file is not None:
+            self._active_file.close()
+            self._active_file = None
+            self._active_segment = None
+
+    def close(self) -> None:
+        self._close_segments()
+        if self._client_file is not None:
+            client_path = Path(self._client_file.name)
+            unlock_file(self._client_file)
+            self._client_file.close()
+            self._client_file = None
+            client_path.unlink(missing_ok=True)
+
+
+def create_voice_store(
+    backend: str, cache_dir: Path
+) -> Union[FileVoiceStore, PackVoiceStore]:
+    """根据设置中的 backend 名称创建存储后端"""
+    if backend == "files":
+        return FileVoiceStore(cache_dir)
+    if backend == "pack":
+        return PackVoiceStore(cache_dir)
+    raise ValueError(f"语音缓存后端 {backend} 不存在，可选值为 files 或 pack")
@@ -0,0 +1,326 @@
+"""
+连接语音服务器（voice_server.py）的瘦客户端
+
+    python main.py --server http://192.168.1.10:8765
+
+连接服务器后，本机不解析单词本、不合成语音、不保存语音缓存：单词本目录、单元内容和查找结果从服务器读取，
+朗读时从服务器下载音频直接播放。浏览、练习、听写、学习、复习的流程仍在本机运行，
+复习记录和作答事件日志也保存在本机。
+
+- VoiceServerClient：HTTP 客户端，每个线程保持一个长连接
+- RemoteWordBookNode：服务器上的单词本目录节点，用法与 LazyWordBookNode 相同
+- RemoteVoicePlayer：从服务器取音频播放，可以代替 VoicePlayerWithCache 传给 WordLearner
+"""
+
+import asyncio
+import http.client
+import io
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from functools import partial
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from audio_engine import AudioEngine, get_audio_engine
+from metrics import get_metrics
+from voice_player_with_cache import (
+    PregenerateReport,
+    VoicePrefetcher,
+    get_cache_file_name,
+)
+
+
+class VoiceServerClient:
+    """语音服务器的 HTTP 客户端"""
+
+    def __init__(self, url: str, timeout: float = 60):
+        """
+        Args:
+            url: 服务器地址，例如 http://192.168.1.10:8765
+            timeout: 每个请求的超时时间（秒），批量预生成可能需要等待较长时间
+        """
+        parts = urlsplit(url if "://" in url else f"http://{url}")
+        if parts.scheme != "http" or not parts.hostname:
+            raise ValueError(f"服务器地址 {url} 无效，应为 http://主机:端口")
+        self.url = f"http://{parts.netloc}"
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        # http.client 的连接不能跨线程共用，界面线程和音频引擎的线程各用一个
+        self._local = threading.local()
+
+    def _get_connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+            self._local.connection = connection
+        return connection
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        body: Optional[Any] = None,
+    ) -> Tuple[str, bytes]:
+        """
+        发送请求
+
+        Args:
+            params: 查询参数，值为列表时重复该参数
+            body: 以 JSON 发送的请求内容
+
+        Returns:
+            (Content-Type, 响应内容)
+        """
+        query = urlencode(params or dict(), doseq=True)
+        target = f"{path}?{query}" if query else path
+        payload = None
+        headers = dict()
+        if body is not None:
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        for attempt in range(2):
+            connection = self._get_connection()
+            try:
+                connection.request(method, target, body=payload, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError) as e:
+                # 长连接可能已被服务器关闭，重新连接再试一次
+                connection.close()
+                self._local.connection = None
+                if attempt == 1:
+                    raise RuntimeError(f"无法连接语音服务器 {self.url}: {e}") from e
+
+        if response.status != 200:
+            try:
+                message = json.loads(data)["error"]
+            except (ValueError, KeyError, TypeError):
+                message = data.decode("utf-8", "replace")
+            raise RuntimeError(f"语音服务器返回错误 {response.status}: {message}")
+        return response.getheader("Content-Type", ""), data
+
+    def get_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        return json.loads(self.request("GET", path, params)[1])
+
+    def get_node(self, path: Tuple[str, ...] = ()) -> Dict[str, Any]:
+        """目录节点返回 {"children": [...]}，单元返回 {"words": [...], "phrases": [...]}"""
+        return self.get_json("/api/node", {"path": list(path)})
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """返回 [{"headword", "meaning", "locations"}]"""
+        return self.get_json("/api/search", {"q": query, "limit": limit})
+
+    def get_audio(self, text: str, voice: str, speed: float = 1.0) -> bytes:
+        """取一条语音，speed 不为 1 时由服务器变速（变速结果也缓存在服务器上）"""
+        params = {"voice": voice, "text": text}
+        if speed != 1:
+            params["speed"] = f"{speed:g}"
+        return self.request("GET", "/api/audio", params)[1]
+
+    def pregenerate(self, texts: List[str], voice: str) -> Dict[str, Any]:
+        """让服务器批量预生成语音，返回 PregenerateReport 的各字段"""
+        return json.loads(
+            self.request(
+                "POST", "/api/pregenerate", body={"voice": voice, "texts": texts}
+            )[1]
+        )
+
+    def get_status(self) -> Dict[str, Any]:
+        return self.get_json("/api/status")
+
+
+class RemoteWordBookNode(Mapping):
+    """
+    服务器上的单词本目录节点
+
+    子节点名称在第一次用到时才向服务器请求，打开过的子节点和单元会缓存下来。
+    """
+
+    def __init__(
+        self,
+        client: VoiceServerClient,
+        path: Tuple[str, ...] = (),
+        children: Optional[List[str]] = None,
+    ):
+        self.client = client
+        self.path = path
+        self._children = children
+        self._resolved: Dict[str, Any] = dict()
+
+    @property
+    def children(self) -> List[str]:
+        if self._children is None:
+            self._children = self.client.get_node(self.path)["children"]
+        return self._children
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._resolved:
+            if key not in self.children:
+                raise KeyError(key)
+            path = self.path + (key,)
+            node = self.client.get_node(path)
+            if "children" in node:
+                self._resolved[key] = RemoteWordBookNode(
+                    self.client, path, node["children"]
+                )
+            else:
+                self._resolved[key] = {
+                    "words": node["words"],
+                    "phrases": node["phrases"],
+                }
+        return self._resolved[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.children)
+
+    def __len__(self) -> int:
+        return len(self.children)
+
+
+class RemoteVoicePlayer:
+    """
+    从语音服务器取音频播放
+
+    提供 WordLearner 用到的 VoicePlayerWithCache 接口。合成和缓存都在服务器上完成，
+    本机只在内存中保留最近下载的音频（按字节数限制），解码后的音频由音频引擎缓存。
+    """
+
+    def __init__(
+        self,
+        client: VoiceServerClient,
+        default_voice: str = "zh-CN-XiaoxiaoNeural",
+        audio_engine: Optional[AudioEngine] = None,
+        memory_max_bytes: int = 32 * 1024 * 1024,
+        playback_speed: float = 1.0,
+    ):
+        """
+        Args:
+            client: 语音服务器客户端
+            default_voice: 默认语音模型
+            audio_engine: 负责播放的音频引擎，默认使用进程内共用的引擎
+            memory_max_bytes: 内存中保留的已下载音频的总大小上限（字节）
+            playback_speed: 播放速度，不为 1 时取服务器变速后的语音
+        """
+        self.client = client
+        self.default_voice = default_voice
+        self.playback_speed = playback_speed
+        self.memory_max_bytes = memory_max_bytes
+        self._audio_engine = audio_engine
+        self._audio: OrderedDict[str, bytes] = OrderedDict()
+        self._audio_bytes = 0
+
+        metrics = get_metrics()
+        self._fetch_seconds = metrics.histogram(
+            "voice_server_fetch_seconds", "从语音服务器下载一条语音的耗时"
+        )
+        self._playback_start_seconds = metrics.histogram(
+            "voice_playback_start_seconds",
+            "从调用朗读到开始播放的耗时（包括查找缓存、合成和解码）",
+        )
+
+    @property
+    def audio_engine(self) -> AudioEngine:
+        if self._audio_engine is None:
+            self._audio_engine = get_audio_engine()
+        return self._audio_engine
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if key in self._audio:
+            self._audio_bytes -= len(self._audio.pop(key))
+        self._audio[key] = data
+        self._audio_bytes += len(data)
+        while self._audio_bytes > self.memory_max_bytes and len(self._audio) > 1:
+            _, evicted = self._audio.popitem(last=False)
+            self._audio_bytes -= len(evicted)
+
+    async def _fetch(
+        self, text: str, voice: str, speed: Optional[float] = None
+    ) -> Tuple[str, bytes]:
+        """返回 (缓存键, 音频)，内存中没有时从服务器下载"""
+        speed = self.playback_speed if speed is None else speed
+        key = get_cache_file_name(voice, text, speed=speed)
+        data = self._audio.get(key)
+        if data is not None:
+            self._audio.move_to_end(key)
+            return key, data
+
+        start_time = time.monotonic()
+        data = await asyncio.to_thread(self.client.get_audio, text, voice, speed)
+        self._fetch_seconds.observe(time.monotonic() - start_time)
+        self._remember(key, data)
+        return key, data
+
+    async def ensure_cached(
+        self, text: str, voice: Optional[str] = None, speed: Optional[float] = None
+    ) -> str:
+        """确保音频已下载到内存中（服务器没有缓存时由服务器合成），返回缓存键"""
+        key, _ = await self._fetch(text, voice or self.default_voice, speed)
+        return key
+
+    def prefetch(
+        self, texts: List[str], voice: Optional[str] = None, lookahead: int = 5
+    ) -> VoicePrefetcher:
+        """按给定顺序在后台提前下载语音，见 VoicePrefetcher"""
+        return VoicePrefetcher(self, texts, voice or self.default_voice, lookahead)
+
+    async def speak(self, text: str, voice: Optional[str] = None) -> None:
+        """朗读文本，播放结束或被新的播放打断后返回"""
+        if not text.strip():
+            return
+
+        voice = voice or self.default_voice
+        requested_time = time.monotonic()
+
+        def on_start() -> None:
+            self._playback_start_seconds.observe(time.monotonic() - requested_time)
+
+        key, data = await self._fetch(text, voice)
+        try:
+            await self.audio_engine.play_async(
+                partial(io.BytesIO, data), cache_key=key, on_start=on_start
+            )
+        except Exception as e:
+            raise RuntimeError(f"播放失败（{voice}: {text}）：{str(e)}") from e
+
+    async def pregenerate_voices(
+        self,
+        word_list: List[str],
+        voice: Optional[str] = None,
+        show_progress_bar: bool = True,
+        limiter: Any = None,
+    ) -> PregenerateReport:
+        """
+        让服务器批量预生成语音（写入服务器上的共用缓存，不下载到本机）
+
+        服务器上所有客户端的批量预生成共用一个限流器，show_progress_bar 和 limiter 只是为了与
+        VoicePlayerWithCache 的接口一致，没有作用。
+        """
+        texts = [word for word in word_list if word.strip()]
+        if not texts:
+            return PregenerateReport()
+        result = await asyncio.to_thread(
+            self.client.pregenerate, texts, voice or self.default_voice
+        )
+        return PregenerateReport(**result)
+
+    def pin(self, texts: List[str], voice: Optional[str] = None) -> None:
+        """共用缓存的淘汰由服务器决定，客户端不固定缓存"""
+
+    def unpin_all(self) -> None:
+        pass
+
+    def clear_cache(self) -> None:
+        """清空本机内存中的音频（服务器上的共用缓存需要在服务器上用 manage_voice_cache.py 管理）"""
+        self._audio.clear()
+        self._audio_bytes = 0
+        if self._audio_engine is not None:
+            self._audio_engine.sound_cache.clear()
@@ -1,11 +1,385 @@
 from asyncio import sleep
-import edge_tts
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+import atexit
 import asyncio
+import concurrent.futures
 from pathlib import Path
 import hashlib
-from typing import Optional, List
-from tqdm import tqdm
-import pygame
+import io
+import json
+import os
+import random
+import time
+import wave
+from typing import (
+    Awaitable,
+    Callable,
+    Optional,
+    List,
+    Dict,
+    Any,
+    Iterable,
+    Tuple,
+    Union,
+)
+from audio_engine import AudioEngine, get_audio_engine
+from audio_postprocess import (
+    MAX_PLAYBACK_SPEED,
+    MIN_PLAYBACK_SPEED,
+    AudioPostprocessor,
+    check_playback_speed,
+)
+from metrics import get_metrics
+from tts_backends import SynthesisBackend, create_synthesis_backend
+from voice_cache_store import FileVoiceStore, PackVoiceStore, create_voice_store
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    根据错误率和延迟自动调整并发数的限流器
+
+    采用加性增、乘性减的策略：连续成功的请求数达到当前并发上限时上限加一；
+    请求失败时上限减半，平均延迟明显高于历史最好水平时上限降为四分之三。
+    每次降低后要等一个平均延迟的时间（至少 min_cooldown 秒，还没有成功的请求、不知道延迟时也按
+    min_cooldown）才会再次降低，避免同一批并发失败把上限一路降到底。
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        latency_tolerance: float = 2.0,
+        min_cooldown: float = 1.0,
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(max(initial_limit, self.min_limit), self.max_limit)
+        self.latency_tolerance = latency_tolerance
+        self.min_cooldown = min_cooldown
+
+        self._in_flight = 0
+        self._successes = 0
+        self._average_latency: Optional[float] = None
+        self._best_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+
+    async def acquire_many(self, count: int) -> int:
+        """
+        一次取得多个并发名额，返回实际取得的数量（不超过当前上限）
+
+        批量合成整批一起取，不会出现几批各占一部分名额、互相等待的情况。
+        """
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self._in_flight + min(count, self.limit) <= self.limit
+            )
+            granted = min(count, self.limit)
+            self._in_flight += granted
+            return granted
+
+    async def release_unused(self, count: int) -> None:
+        """归还取得后没有使用的名额，不影响并发上限的调整"""
+        async with self._condition:
+            self._in_flight -= count
+            self._condition.notify_all()
+
+    async def release(self, success: bool, latency: float) -> None:
+        async with self._condition:
+            self._in_flight -= 1
+            if success:
+                self._observe_success(latency)
+            else:
+                self._decrease(0.5)
+            self._condition.notify_all()
+
+    def _observe_success(self, latency: float) -> None:
+        if self._average_latency is None:
+            self._average_latency = latency
+        else:
+            self._average_latency = 0.8 * self._average_latency + 0.2 * latency
+        if self._best_latency is None or self._average_latency < self._best_latency:
+            self._best_latency = self._average_latency
+
+        if self._average_latency > self._best_latency * self.latency_tolerance:
+            self._decrease(0.75)
+            return
+
+        self._successes += 1
+        if self._successes >= self.limit:
+            self.limit = min(self.limit + 1, self.max_limit)
+            self._successes = 0
+
+    def _decrease(self, factor: float) -> None:
+        now = time.monotonic()
+        cooldown = max(self._average_latency or 0, self.min_cooldown)
+        if now - self._last_decrease < cooldown:
+            return
+        self.limit = max(int(self.limit * factor), self.min_limit)
+        self._successes = 0
+        self._last_decrease = now
+
+
+@dataclass
+class PregenerateReport:
+    """一次批量预生成的结果统计"""
+
+    total: int = 0
+    cached: int = 0
+    generated: int = 0
+    failed: Dict[str, str] = field(default_factory=dict)
+    elapsed: float = 0.0
+    final_concurrency: int = 0
+
+    def summary(self) -> str:
+        lines = [
+            f"共 {self.total} 条，已缓存 {self.cached} 条，新生成 {self.generated} 条，"
+            f"失败 {len(self.failed)} 条，用时 {self.elapsed:.1f} 秒，"
+            f"最终并发数 {self.final_concurrency}"
+        ]
+        for text, error in self.failed.items():
+            lines.append(f"  {text}: {error}")
+        return "\n".join(lines)
+
+
+# edge-tts 默认输出 audio-24khz-48kbitrate-mono-mp3，用于根据文件大小估算时长
+EDGE_TTS_BITRATE = 48000
+# 后处理和变速输出 24kHz 16 位单声道 WAV
+WAV_BITRATE = 24000 * 16
+
+
+def get_audio_duration(data: bytes) -> float:
+    """返回音频时长（秒）：WAV 读取文件头，mp3 按 edge-tts 的码率估算"""
+    if data[:4] == b"RIFF":
+        try:
+            with wave.open(io.BytesIO(data)) as wav_file:
+                return wav_file.getnframes() / wav_file.getframerate()
+        except wave.Error:
+            pass
+    return len(data) * 8 / EDGE_TTS_BITRATE
+
+
+@lru_cache(maxsize=65536)
+def get_cache_file_name(
+    voice: str,
+    text: str,
+    rate: str = "+0%",
+    volume: str = "+0%",
+    speed: float = 1.0,
+    suffix: str = ".mp3",
+) -> str:
+    """
+    根据「语音模型+文本」生成缓存文件名，结果会被缓存，避免反复计算哈希
+
+    合成的语速、音量和变速播放的速度不是默认值时也计入哈希，默认值不计入，与旧版本的缓存文件名一致；
+    suffix 为缓存中保存的音频格式（.mp3 或 .wav）
+    """
+    # 核心：将「语音模型+文本」组合计算哈希
+    # 1. 组合内容（用特殊符号分隔，避免不同文本哈希冲突）
+    content = f"{voice}||{text}"  # 双竖线分隔更安全
+    if rate != "+0%" or volume != "+0%":
+        content += f"||{rate}||{volume}"
+    if speed != 1:
+        content += f"||x{speed:g}"
+    # 2. 计算MD5哈希（32位纯字母数字，无特殊字符）
+    hash_str = hashlib.md5(content.encode("utf-8")).hexdigest()  # 结果如：a1b2c3d4...
+
+    # 生成文件名：语音模型_哈希值.mp3
+    return f"{voice}_{hash_str}{suffix}"
+
+
+class VoiceCacheManifest:
+    """
+    语音缓存清单，保存在缓存目录下的 manifest.json 中
+
+    记录每个缓存文件对应的语音模型、文本、大小、时长和最近播放时间，判断是否命中缓存时只查内存，
+    不再逐个访问文件系统。写入时会先合并磁盘上其他进程的改动，再整体替换文件。
+    整体重写的开销随缓存数量增长，改动先记在内存中，由 save_if_stale 定期、批量预生成结束时和退出时写入。
+
+    entries 按最近播放时间从早到晚排列（播放时移到末尾），并随增删维护总大小，
+    淘汰时从头部取最久没有播放的条目，不需要每次遍历、排序整个清单。
+    """
+
+    FILE_NAME = "manifest.json"
+    VERSION = 1
+
+    def __init__(self, cache_dir: Path, store: Union[FileVoiceStore, PackVoiceStore]):
+        self.cache_dir = cache_dir
+        self.store = store
+        self.path = cache_dir / self.FILE_NAME
+        self.entries: Dict[str, Dict[str, Any]] = dict()
+        self.total_bytes = 0
+
+        # 尚未写入磁盘的改动
+        self._added: Dict[str, Dict[str, Any]] = dict()
+        self._removed: set[str] = set()
+        self._touched: Dict[str, float] = dict()
+        self.last_saved = time.monotonic()
+
+        disk_entries = self._read_disk_entries()
+        if disk_entries is None:
+            # 没有清单（旧版本的缓存目录），扫描一次存储重建
+            self._set_entries(self._scan_store())
+            self._added = dict(self.entries)
+            self.save()
+        else:
+            self._set_entries(disk_entries)
+
+    def _set_entries(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        """按最近播放时间排列并重新计算总大小"""
+        self.entries = dict(
+            sorted(entries.items(), key=lambda item: item[1].get("last_played", 0))
+        )
+        self.total_bytes = sum(entry["size"] for entry in self.entries.values())
+
+    def _read_disk_entries(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if not isinstance(manifest, dict) or manifest.get("version") != self.VERSION:
+            return None
+        return manifest["entries"]
+
+    def _scan_store(self) -> Dict[str, Dict[str, Any]]:
+        entries = dict()
+        for name, size, mtime in self.store.scan():
+            bitrate = WAV_BITRATE if name.endswith(".wav") else EDGE_TTS_BITRATE
+            entries[name] = {
+                "voice": name.rsplit("_", 1)[0],
+                "text": None,  # 旧缓存无法从哈希还原文本
+                "size": size,
+                "duration": size * 8 / bitrate,
+                "last_played": mtime,
+            }
+        return entries
+
+    def __contains__(self, file_name: str) -> bool:
+        return file_name in self.entries
+
+    def add(
+        self, file_name: str, voice: str, text: str, size: int, duration: float
+    ) -> None:
+        entry = {
+            "voice": voice,
+            "text": text,
+            "size": size,
+            "duration": duration,
+            "last_played": time.time(),
+        }
+        old_entry = self.entries.pop(file_name, None)
+        if old_entry is not None:
+            self.total_bytes -= old_entry["size"]
+        self.entries[file_name] = entry
+        self.total_bytes += size
+        self._added[file_name] = entry
+        self._removed.discard(file_name)
+
+    def remove(self, file_name: str) -> None:
+        entry = self.entries.pop(file_name, None)
+        if entry is not None:
+            self.total_bytes -= entry["size"]
+        self._added.pop(file_name, None)
+        self._touched.pop(file_name, None)
+        self._removed.add(file_name)
+
+    def touch(self, file_name: str) -> None:
+        """记录一次播放，用于按最近播放时间淘汰"""
+        entry = self.entries.pop(file_name, None)
+        if entry is not None:
+            now = time.time()
+            entry["last_played"] = now
+            self.entries[file_name] = entry
+            self._touched[file_name] = now
+
+    def total_size(self) -> int:
+        return self.total_bytes
+
+    def missing(self, file_names: Iterable[str]) -> set[str]:
+        """返回不在缓存中的文件名集合"""
+        return set(file_names) - self.entries.keys()
+
+    def save(self) -> None:
+        """把改动合并进磁盘上的清单并原子地写回"""
+        if not self._added and not self._removed and not self._touched:
+            return
+
+        entries = self._read_disk_entries() or dict()
+        entries.update(self._added)
+        for file_name in self._removed:
+            entries.pop(file_name, None)
+        for file_name, last_played in self._touched.items():
+            if file_name in entries:
+                entries[file_name]["last_played"] = max(
+                    entries[file_name].get("last_played", 0), last_played
+                )
+
+        temp_path = self.path.with_name(f"{self.FILE_NAME}.{os.getpid()}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": self.VERSION, "entries": entries}, f, ensure_ascii=False
+            )
+        os.replace(temp_path, self.path)
+
+        self._set_entries(entries)
+        self._added.clear()
+        self._removed.clear()
+        self._touched.clear()
+        self.last_saved = time.monotonic()
+
+    def save_if_stale(self, interval: float = 30) -> None:
+        """距离上次写入超过interval秒才写入，避免每次播放或生成都重写整个清单"""
+        if time.monotonic() - self.last_saved >= interval:
+            self.save()
+
+
+def voice_player_options_from_settings(settings: dict) -> Dict[str, Any]:
+    """从 settings.json 的内容中整理出传给 VoicePlayerWithCache 的参数"""
+    voice_cache_settings = settings.get("voice_cache", dict())
+    return {
+        **settings.get("synthesis", dict()),
+        "cache_max_bytes": voice_cache_settings.get("max_bytes"),
+        "cache_max_entries": voice_cache_settings.get("max_entries"),
+        "cache_backend": voice_cache_settings.get("backend", "files"),
+        "postprocess": settings.get("postprocess"),
+        "playback_speed": get_playback_speed(settings),
+    }
+
+
+# 变速播放的模式，依次切换
+PLAYBACK_SPEED_MODES = ("normal", "slow", "fast")
+
+
+def get_playback_speed(settings: dict) -> float:
+    """
+    settings.json 中 playback_speed 当前模式对应的播放速度，正常为 1
+
+    Raises:
+        ValueError: 当前模式的速度不是数字或超出 MIN_PLAYBACK_SPEED 到 MAX_PLAYBACK_SPEED 的范围
+    """
+    speed_settings = settings.get("playback_speed", dict())
+    mode = speed_settings.get("mode", "normal")
+    if mode == "normal":
+        return 1.0
+    speed = speed_settings.get(mode, 1.0)
+    if (
+        isinstance(speed, bool)
+        or not isinstance(speed, (int, float))
+        or not MIN_PLAYBACK_SPEED <= speed <= MAX_PLAYBACK_SPEED
+    ):
+        raise ValueError(
+            f"settings.json 中 playback_speed.{mode} 应为 {MIN_PLAYBACK_SPEED} 到 "
+            f"{MAX_PLAYBACK_SPEED} 之间的数字，当前为 {speed!r}"
+        )
+    return float(speed)
 
 
 class VoicePlayerWithCache:
@@ -19,6 +393,18 @@ class VoicePlayerWithCache:
         rate: str = "+0%",
         volume: str = "+0%",
         max_retries: int = 3,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        retry_base_delay: float = 0.5,
+        retry_max_delay: float = 8.0,
+        cache_max_bytes: Optional[int] = None,
+        cache_max_entries: Optional[int] = None,
+        cache_backend: str = "files",
+        audio_engine: Optional[AudioEngine] = None,
+        backend: Union[str, SynthesisBackend] = "edge",
+        backend_options: Optional[Dict[str, Any]] = None,
+        postprocess: Optional[Dict[str, Any]] = None,
+        playback_speed: float = 1.0,
     ):
         """
         初始化语音播放器
@@ -29,152 +415,781 @@ class VoicePlayerWithCache:
             rate: 语速，例如 "+10%" 或 "-20%"
             volume: 音量，例如 "+0%" 或 "+20%"
             max_retries: 最大重试次数
+            max_concurrency: 批量预生成时的最大并发数（实际并发数会根据错误率和延迟自动调整）
+            min_concurrency: 批量预生成时的最小并发数
+            retry_base_delay: 重试的基础等待时间（秒），每次重试翻倍并加随机抖动
+            retry_max_delay: 重试的最长等待时间（秒）
+            cache_max_bytes: 缓存总大小上限（字节），超出后淘汰最久没有播放的文件，None为不限制
+            cache_max_entries: 缓存文件数量上限，None为不限制
+            cache_backend: 缓存存储方式，"files" 为每条语音一个 mp3 文件，
+                "pack" 为追加写入的分段包文件（文件数量少，便于复制）
+            audio_engine: 负责播放的音频引擎，默认使用进程内共用的引擎
+            backend: 语音合成后端，"edge" 为 edge-tts 在线合成，"offline" 为离线测试后端，
+                也可以直接传入 SynthesisBackend 实例
+            backend_options: 按名称创建合成后端时传入的参数（如离线后端的延迟和失败率）
+            postprocess: 合成后的处理（去掉首尾静音、统一响度），enabled 为 True 时开启，
+                其余为 AudioPostprocessor 的参数，见 audio_postprocess.py
+            playback_speed: 播放速度，不为 1 时把缓存的语音在本机变速（不变调）后播放，
+                变速结果也写入缓存，不重新合成
         """
         self.cache_dir = Path(__file__).absolute().parent / cache_dir
         self.default_voice = default_voice
         self.rate = rate
         self.volume = volume
         self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        # 上一次批量预生成结束时调整到的并发数，下一次从这里开始
+        self._learned_concurrency: Optional[int] = None
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_max_entries = cache_max_entries
+        self.backend: SynthesisBackend = (
+            create_synthesis_backend(backend, **(backend_options or dict()))
+            if isinstance(backend, str)
+            else backend
+        )
+
+        postprocess = dict(postprocess or dict())
+        self.postprocessor: Optional[AudioPostprocessor] = (
+            AudioPostprocessor(**postprocess)
+            if postprocess.pop("enabled", False)
+            else None
+        )
+        check_playback_speed(playback_speed)
+        self.playback_speed = playback_speed
+        # 没有开启后处理时，变速用的进程池在第一次变速时创建
+        self._stretcher: Optional[AudioPostprocessor] = None
 
-        pygame.mixer.init()
+        # 当前打开的单词本用到的缓存文件，淘汰时跳过
+        self.pinned: set[str] = set()
+        # 正在生成的语音（缓存文件名 -> 生成任务），同一条语音同时只合成一次
+        self._in_flight: Dict[str, asyncio.Task] = dict()
+
+        # 音频引擎在第一次播放时才创建，只生成语音（如批量预热缓存）时不需要初始化音频设备
+        self._audio_engine = audio_engine
 
         # 确保缓存目录存在
         self.cache_dir.mkdir(exist_ok=True)
+        self.store = create_voice_store(cache_backend, self.cache_dir)
+        self.manifest = VoiceCacheManifest(self.cache_dir, self.store)
+        atexit.register(self.manifest.save)
+        self.enforce_cache_budget()
+        self.manifest.save()
+
+        # 运行指标（见 metrics.py），未开启时记录操作什么都不做
+        metrics = get_metrics()
+        self._cache_hits = metrics.counter(
+            "voice_cache_hits_total", "朗读或预取时命中语音缓存的次数"
+        )
+        self._cache_misses = metrics.counter(
+            "voice_cache_misses_total", "朗读或预取时没有缓存、需要合成的次数"
+        )
+        self._cache_write_seconds = metrics.histogram(
+            "voice_cache_write_seconds", "合成结果写入缓存的耗时"
+        )
+        self._synthesis_seconds = metrics.histogram(
+            "voice_synthesis_seconds", "成功的合成请求的耗时"
+        )
+        self._synthesis_retries = metrics.counter(
+            "voice_synthesis_retries_total", "合成失败后重试的次数"
+        )
+        self._synthesis_failures = metrics.counter(
+            "voice_synthesis_failures_total", "重试次数用完仍然合成失败的次数"
+        )
+        self._synthesis_coalesced = metrics.counter(
+            "voice_synthesis_coalesced_total",
+            "同一条语音正在生成（合成或变速）、直接等待其结果而没有再次生成的次数",
+        )
+        self._playback_start_seconds = metrics.histogram(
+            "voice_playback_start_seconds",
+            "从调用朗读到开始播放的耗时（包括查找缓存、合成和解码）",
+        )
+        self._playback_seconds = metrics.histogram(
+            "voice_playback_seconds", "从开始播放到播放结束或被打断的时长"
+        )
+        self._postprocess_seconds = metrics.histogram(
+            "voice_postprocess_seconds", "合成结果后处理（去静音、统一响度）的耗时"
+        )
+        self._trimmed_seconds = metrics.counter(
+            "voice_trimmed_silence_seconds_total", "后处理去掉的首尾静音总时长"
+        )
+        self._postprocess_failures = metrics.counter(
+            "voice_postprocess_failures_total", "后处理失败、保留原始音频的次数"
+        )
+        self._stretch_seconds = metrics.histogram(
+            "voice_stretch_seconds", "由缓存的语音生成变速语音的耗时"
+        )
+        self._stretch_failures = metrics.counter(
+            "voice_stretch_failures_total", "变速失败、按原速播放的次数"
+        )
+
+    @property
+    def audio_engine(self) -> AudioEngine:
+        if self._audio_engine is None:
+            self._audio_engine = get_audio_engine()
+        return self._audio_engine
+
+    def get_file_name(self, text: str, voice: str, speed: float = 1.0) -> str:
+        """
+        按当前的语速和音量生成缓存文件名，speed 不为 1 时为变速后的语音
+
+        后缀与保存的格式一致：后处理和变速的结果为 .wav，否则为合成后端输出的格式
+        """
+        suffix = (
+            ".wav"
+            if self.postprocessor is not None or speed != 1
+            else self.backend.audio_suffix
+        )
+        return get_cache_file_name(voice, text, self.rate, self.volume, speed, suffix)
+
+    def _get_raw_file_name(self, text: str, voice: str) -> str:
+        """没有后处理的原始合成结果的缓存文件名"""
+        return get_cache_file_name(
+            voice, text, self.rate, self.volume, suffix=self.backend.audio_suffix
+        )
 
     def _get_cache_file_path(self, text: str, voice: Optional[str] = None) -> Path:
         """生成缓存文件路径（用哈希值替代原文本）"""
-        voice_name = voice or self.default_voice
+        return self.cache_dir / self.get_file_name(text, voice or self.default_voice)
+
+    def is_cached(self, text: str, voice: Optional[str] = None) -> bool:
+        """根据缓存清单判断是否已有缓存（不访问文件系统）"""
+        return self.get_file_name(text, voice or self.default_voice) in self.manifest
+
+    def get_uncached(
+        self, texts: Iterable[str], voice: Optional[str] = None
+    ) -> List[str]:
+        """返回没有缓存的文本（保持原顺序），整批只做一次集合运算"""
+        voice = voice or self.default_voice
+        names = {text: self.get_file_name(text, voice) for text in texts}
+        missing = self.manifest.missing(names.values())
+        return [text for text, name in names.items() if name in missing]
+
+    def _adopt_from_store(self, file_name: str, text: str, voice: str) -> bool:
+        """
+        清单中没有时再查一次存储，存储中已有就登记到清单并返回 True
+
+        多个进程共用缓存目录时，其他进程新生成的语音要等它们写入清单、本进程写入清单时合并才会出现在
+        本进程的清单中，合成前先查存储可以直接使用，不再重新合成。只在清单未命中时访问存储。
+        """
+        if not self.store.exists(file_name):
+            return False
+        try:
+            audio = self.store.read(file_name)
+        except FileNotFoundError:
+            return False
+        self._record_cache_file(file_name, text, voice, audio)
+        return True
+
+    def pin(self, texts: Iterable[str], voice: Optional[str] = None) -> None:
+        """固定这些文本的缓存（变速播放时也包括当前速度的变速语音），淘汰时不会删除"""
+        voice = voice or self.default_voice
+        for text in texts:
+            self.pinned.add(self.get_file_name(text, voice))
+            if self.playback_speed != 1:
+                self.pinned.add(self.get_file_name(text, voice, self.playback_speed))
+
+    def unpin_all(self) -> None:
+        self.pinned.clear()
+
+    def enforce_cache_budget(self) -> int:
+        """
+        按最近播放时间淘汰缓存，直到满足大小和数量上限
+
+        包文件存储删除后，已删除的语音占用的空间较多时会整理分段回收空间（其他进程正在使用缓存时跳过）。
+
+        Returns:
+            被删除的文件数量
+        """
+        entries = self.manifest.entries
+        total_size = self.manifest.total_size()
+        entry_count = len(entries)
+
+        def over_budget() -> bool:
+            return (
+                self.cache_max_bytes is not None and total_size > self.cache_max_bytes
+            ) or (
+                self.cache_max_entries is not None
+                and entry_count > self.cache_max_entries
+            )
+
+        if not over_budget():
+            return 0
+
+        # 清单按最近播放时间排列，从头部开始只取需要淘汰的条目
+        candidates = list()
+        for file_name, entry in entries.items():
+            if not over_budget():
+                break
+            if file_name not in self.pinned:
+                candidates.append(file_name)
+                total_size -= entry["size"]
+                entry_count -= 1
 
-        # 核心：将「语音模型+文本」组合计算哈希
-        # 1. 组合内容（用特殊符号分隔，避免不同文本哈希冲突）
-        content = f"{voice_name}||{text}".encode("utf-8")  # 双竖线分隔更安全
-        # 2. 计算MD5哈希（32位纯字母数字，无特殊字符）
-        hash_str = hashlib.md5(content).hexdigest()  # 结果如：a1b2c3d4...
+        evicted = 0
+        for file_name in candidates:
+            try:
+                self.store.delete(file_name)
+            except PermissionError:
+                # 文件正在被播放，留到下次再删
+                continue
+            if self._audio_engine is not None:
+                self._audio_engine.sound_cache.discard(file_name)
+            self.manifest.remove(file_name)
+            evicted += 1
+
+        if evicted:
+            self.store.compact_if_wasteful()
+        return evicted
+
+    def _record_cache_file(
+        self, file_name: str, text: str, voice: str, audio: bytes
+    ) -> None:
+        """把新生成的文件登记到缓存清单"""
+        self.manifest.add(file_name, voice, text, len(audio), get_audio_duration(audio))
+
+    def create_limiter(self) -> AdaptiveConcurrencyLimiter:
+        """
+        按设置的并发上下限创建限流器
 
-        # 生成文件名：语音模型_哈希值.mp3
-        return self.cache_dir / f"{voice_name}_{hash_str}.mp3"
+        初始并发数沿用上一次批量预生成最终调整到的值，第一次为上限的一半，
+        只有一个单元的短批次不必从最小并发数慢慢加上去。两次降低并发数之间至少间隔一次重试的基础等待时间。
+        """
+        initial_limit = self._learned_concurrency or max(
+            self.min_concurrency, self.max_concurrency // 2
+        )
+        return AdaptiveConcurrencyLimiter(
+            initial_limit=initial_limit,
+            min_limit=self.min_concurrency,
+            max_limit=self.max_concurrency,
+            min_cooldown=self.retry_base_delay,
+        )
+
+    def _get_retry_delay(self, attempt: int) -> float:
+        """指数退避加随机抖动，避免失败的请求同时重试"""
+        delay = min(self.retry_base_delay * 2**attempt, self.retry_max_delay)
+        return random.uniform(delay / 2, delay)
+
+    async def _generate_voice(
+        self,
+        text: str,
+        voice: Optional[str] = None,
+        limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+    ) -> str:
+        """
+        生成语音并写入缓存，返回缓存文件名，传入limiter时每次请求都要先取得并发名额
 
-    async def _generate_voice(self, text: str, voice: Optional[str] = None) -> Path:
-        """生成语音文件并返回路径"""
+        同一条语音（语音模型+文本）已经在生成时不再发起新的请求，而是等待同一个生成任务，
+        批量预生成、边学边预取和朗读同时需要同一条语音时只合成、写入一次。
+        """
         voice = voice or self.default_voice
-        output_file = self._get_cache_file_path(text, voice)
+        file_name = self.get_file_name(text, voice)
+        return await self._run_once(
+            file_name,
+            partial(self._synthesize_to_cache, text, voice, file_name, limiter),
+        )
+
+    async def _run_once(
+        self, file_name: str, create: Callable[[], Awaitable[str]]
+    ) -> str:
+        """file_name 正在生成时等待同一个任务，否则用 create() 开始生成"""
+        task = self._get_in_flight(file_name)
+        if task is not None:
+            self._synthesis_coalesced.inc()
+        else:
+            task = self._start_in_flight(file_name, create())
+        # 某个等待者被取消（如预取器关闭）时不取消生成任务，其他等待者仍然需要结果
+        return await asyncio.shield(task)
+
+    def _get_in_flight(self, file_name: str) -> Optional[asyncio.Task]:
+        """返回 file_name 正在进行的生成任务"""
+        task = self._in_flight.get(file_name)
+        # 任务属于其他事件循环（如先后用 asyncio.run 预热）时不能等待，重新生成
+        if (
+            task is not None
+            and not task.done()
+            and task.get_loop() is asyncio.get_running_loop()
+        ):
+            return task
+        return None
+
+    def _start_in_flight(
+        self, file_name: str, coroutine: Awaitable[str]
+    ) -> asyncio.Task:
+        task = asyncio.ensure_future(coroutine)
+        self._in_flight[file_name] = task
+        task.add_done_callback(partial(self._finish_in_flight, file_name))
+        return task
+
+    def _finish_in_flight(self, file_name: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(file_name) is task:
+            del self._in_flight[file_name]
+        if not task.cancelled():
+            # 所有等待者都已取消时也取出异常，避免 asyncio 报告异常未被处理
+            task.exception()
+
+    async def _synthesize_to_cache(
+        self,
+        text: str,
+        voice: str,
+        file_name: str,
+        limiter: Optional[AdaptiveConcurrencyLimiter],
+        start_attempt: int = 0,
+    ) -> str:
+        """
+        合成（失败时按指数退避重试）、后处理并写入缓存
+
+        Args:
+            start_attempt: 已经失败过的次数（批量合成失败后改为单条重试时不为 0）
+        """
+        raw_name = self._find_raw_cache(text, voice, file_name)
+        if raw_name is not None:
+            # 开启后处理之前缓存的原始语音，直接处理后替换，不重新合成
+            audio = await self._postprocess(self.store.read(raw_name))
+            self._write_cache(file_name, text, voice, audio)
+            if raw_name not in self.pinned:
+                self.store.delete(raw_name)
+                self.manifest.remove(raw_name)
+            return file_name
 
-        for attempt in range(self.max_retries):
+        for attempt in range(start_attempt, self.max_retries):
+            if limiter is not None:
+                await limiter.acquire()
+            start_time = time.monotonic()
             try:
-                # 创建 Edge TTS 通信对象并生成语音
-                communicate = edge_tts.Communicate(
-                    text=text, voice=voice, rate=self.rate, volume=self.volume
+                audio = await self.backend.synthesize(
+                    text, voice, self.rate, self.volume
                 )
-                await communicate.save(str(output_file))
-                return output_file
             except Exception as e:
+                if limiter is not None:
+                    await limiter.release(False, time.monotonic() - start_time)
                 if attempt == self.max_retries - 1:
-                    if output_file.exists():
-                        output_file.unlink()
+                    self._synthesis_failures.inc()
                     raise RuntimeError(f"语音生成失败: {str(e)}") from e
+                self._synthesis_retries.inc()
+                await sleep(self._get_retry_delay(attempt))
+            else:
+                latency = time.monotonic() - start_time
+                self._synthesis_seconds.observe(latency)
+                if limiter is not None:
+                    await limiter.release(True, latency)
+                if self.postprocessor is not None:
+                    audio = await self._postprocess(audio)
+                self._write_cache(file_name, text, voice, audio)
+                return file_name
 
-        return output_file
+        return file_name
 
-    async def speak(self, text: str, voice: Optional[str] = None) -> None:
-        if not text.strip():
-            return
+    def _find_raw_cache(self, text: str, voice: str, file_name: str) -> Optional[str]:
+        """开启后处理时，返回开启前缓存的、还没有处理的原始语音的文件名"""
+        if self.postprocessor is None:
+            return None
+        raw_name = self._get_raw_file_name(text, voice)
+        if (
+            raw_name != file_name
+            and raw_name in self.manifest
+            and self.store.exists(raw_name)
+        ):
+            return raw_name
+        return None
+
+    async def _synthesize_batch(
+        self, items: List[Tuple[str, str]]
+    ) -> Tuple[List[Union[bytes, BaseException]], float]:
+        """调用后端的批量合成，返回 (每条的结果或异常, 耗时)"""
+        start_time = time.monotonic()
+        try:
+            results = await self.backend.synthesize_batch(items, self.rate, self.volume)
+        except Exception as e:
+            results = [e] * len(items)
+        return results, time.monotonic() - start_time
+
+    async def _cache_batch_item(
+        self,
+        text: str,
+        voice: str,
+        file_name: str,
+        batch: Awaitable[Tuple[List[Union[bytes, BaseException]], float]],
+        index: int,
+        limiter: AdaptiveConcurrencyLimiter,
+    ) -> str:
+        """取出批量合成中第 index 条的结果写入缓存，失败时改为单条合成继续重试"""
+        results, latency = await batch
+        audio = results[index]
+        if isinstance(audio, BaseException):
+            await limiter.release(False, latency)
+            if self.max_retries <= 1:
+                self._synthesis_failures.inc()
+                raise RuntimeError(f"语音生成失败: {str(audio)}") from audio
+            self._synthesis_retries.inc()
+            await sleep(self._get_retry_delay(0))
+            return await self._synthesize_to_cache(
+                text, voice, file_name, limiter, start_attempt=1
+            )
+
+        self._synthesis_seconds.observe(latency)
+        await limiter.release(True, latency)
+        if self.postprocessor is not None:
+            audio = await self._postprocess(audio)
+        self._write_cache(file_name, text, voice, audio)
+        return file_name
+
+    async def _start_batch(
+        self, texts: List[str], voice: str, limiter: AdaptiveConcurrencyLimiter
+    ) -> List[asyncio.Task]:
+        """
+        为已经取得并发名额的 texts 发起一次批量合成，返回每条写入缓存的任务（顺序与 texts 一致）
+
+        已经在生成的语音（朗读、预取或其他批次）等待原来的任务，它们的名额立即归还。
+        """
+        file_names = [self.get_file_name(text, voice) for text in texts]
+        tasks = [self._get_in_flight(file_name) for file_name in file_names]
+        new_indexes = [i for i, task in enumerate(tasks) if task is None]
+        self._synthesis_coalesced.inc(len(texts) - len(new_indexes))
 
+        if new_indexes:
+            batch = asyncio.ensure_future(
+                self._synthesize_batch([(texts[i], voice) for i in new_indexes])
+            )
+            for position, i in enumerate(new_indexes):
+                tasks[i] = self._start_in_flight(
+                    file_names[i],
+                    self._cache_batch_item(
+                        texts[i], voice, file_names[i], batch, position, limiter
+                    ),
+                )
+        await limiter.release_unused(len(texts) - len(new_indexes))
+        return tasks
+
+    def _write_cache(self, file_name: str, text: str, voice: str, audio: bytes) -> None:
+        write_start = time.monotonic()
+        self.store.write(file_name, audio)
+        self._cache_write_seconds.observe(time.monotonic() - write_start)
+        self._record_cache_file(file_name, text, voice, audio)
+
+    async def _postprocess(self, audio: bytes) -> bytes:
+        """在进程池中去掉首尾静音并统一响度，失败时返回原始音频"""
+        start_time = time.monotonic()
+        try:
+            processed, trimmed = await self.postprocessor.process(audio)
+        except Exception:
+            self._postprocess_failures.inc()
+            return audio
+        self._postprocess_seconds.observe(time.monotonic() - start_time)
+        self._trimmed_seconds.inc(trimmed)
+        return processed
+
+    async def list_voices(self) -> List[str]:
+        """返回合成后端可用的语音模型"""
+        return await self.backend.list_voices()
+
+    async def _stretch_to_cache(
+        self, text: str, voice: str, source_name: str, file_name: str, speed: float
+    ) -> str:
+        """由缓存中原速的语音生成变速语音并写入缓存，失败时（如没有安装 numpy）返回原速语音的文件名"""
+        start_time = time.monotonic()
+        try:
+            if self.postprocessor is None and self._stretcher is None:
+                self._stretcher = AudioPostprocessor()
+            audio = await (self.postprocessor or self._stretcher).stretch(
+                self.store.read(source_name), speed
+            )
+        except Exception:
+            self._stretch_failures.inc()
+            return source_name
+        self._stretch_seconds.observe(time.monotonic() - start_time)
+        self.store.write(file_name, audio)
+        self._record_cache_file(file_name, text, voice, audio)
+        return file_name
+
+    async def ensure_cached(
+        self, text: str, voice: Optional[str] = None, speed: Optional[float] = None
+    ) -> str:
+        """
+        确保文本已有缓存（没有就生成），返回缓存文件名
+
+        Args:
+            speed: 播放速度，默认为 playback_speed；不为 1 时返回变速后的语音，
+                变速语音由缓存中原速的语音生成，不重新合成
+        """
         voice = voice or self.default_voice
-        cache_file = self._get_cache_file_path(text, voice)
+        speed = self.playback_speed if speed is None else speed
+        file_name = self.get_file_name(text, voice)
 
-        if not cache_file.exists():
+        if self.is_cached(text, voice):
+            self._cache_hits.inc()
+            self.manifest.touch(file_name)
+        elif self._adopt_from_store(file_name, text, voice):
+            self._cache_hits.inc()
+            self.enforce_cache_budget()
+        else:
+            self._cache_misses.inc()
             await self._generate_voice(text, voice)
+            self.enforce_cache_budget()
+        # 清单在这里运行在音频引擎或语音服务器的事件循环中，不每次都重写
+        self.manifest.save_if_stale()
+        if speed == 1:
+            return file_name
 
-        if not cache_file.exists():
-            raise RuntimeError(f"音频文件未生成: {cache_file}")
+        check_playback_speed(speed)
+        stretched_name = self.get_file_name(text, voice, speed)
+        if stretched_name in self.manifest:
+            self.manifest.touch(stretched_name)
+            return stretched_name
+        if self._adopt_from_store(stretched_name, text, voice):
+            self.enforce_cache_budget()
+            return stretched_name
+        stretched_name = await self._run_once(
+            stretched_name,
+            partial(
+                self._stretch_to_cache, text, voice, file_name, stretched_name, speed
+            ),
+        )
+        self.enforce_cache_budget()
+        self.manifest.save_if_stale()
+        return stretched_name
 
+    async def read_audio(
+        self, text: str, voice: Optional[str] = None, speed: Optional[float] = None
+    ) -> bytes:
+        """返回文本的语音数据（没有缓存时先生成），供语音服务器发送给客户端"""
+        voice = voice or self.default_voice
+        file_name = await self.ensure_cached(text, voice, speed)
         try:
+            return self.store.read(file_name)
+        except FileNotFoundError:
+            # 清单里有但缓存已被外部删除，重新生成一次
+            self.manifest.remove(file_name)
+            return self.store.read(await self.ensure_cached(text, voice, speed))
+
+    def prefetch(
+        self, texts: List[str], voice: Optional[str] = None, lookahead: int = 5
+    ) -> "VoicePrefetcher":
+        """按给定顺序在后台提前生成语音，见 VoicePrefetcher"""
+        return VoicePrefetcher(self, texts, voice or self.default_voice, lookahead)
+
+    async def _play_cached(
+        self, file_name: str, on_start: Optional[Callable[[], None]] = None
+    ) -> None:
+        """播放缓存中的语音，解码结果按文件名缓存在音频引擎中"""
+        await self.audio_engine.play_async(
+            partial(self.store.open_for_playback, file_name),
+            cache_key=file_name,
+            on_start=on_start,
+        )
+
+    async def speak(self, text: str, voice: Optional[str] = None) -> None:
+        """朗读文本（没有缓存时先生成），播放结束或被新的播放打断后返回"""
+        if not text.strip():
+            return
+
+        voice = voice or self.default_voice
+        requested_time = time.monotonic()
+        started_time: List[float] = list()
 
-            # 停止当前可能正在播放的音频
-            if pygame.mixer.music.get_busy():
-                pygame.mixer.music.stop()
+        def on_start() -> None:
+            started_time.append(time.monotonic())
+            self._playback_start_seconds.observe(started_time[0] - requested_time)
 
-            # 加载并播放 MP3
-            pygame.mixer.music.load(str(cache_file))
-            pygame.mixer.music.play()
+        file_name = await self.ensure_cached(text, voice)
 
-            # 等待播放完成
-            while pygame.mixer.music.get_busy():
-                await sleep(0.1)
+        try:
+            try:
+                await self._play_cached(file_name, on_start)
+            except (self.audio_engine.load_error, FileNotFoundError):
+                if self.store.exists(file_name):
+                    raise
+                # 清单里有但缓存已被外部删除，重新生成一次
+                self.manifest.remove(file_name)
+                file_name = await self.ensure_cached(text, voice)
+                await self._play_cached(file_name, on_start)
 
         except Exception as e:
-            raise RuntimeError(f"播放失败（文件：{cache_file.name}）：{str(e)}") from e
+            raise RuntimeError(f"播放失败（文件：{file_name}）：{str(e)}") from e
+
+        if started_time:
+            self._playback_seconds.observe(time.monotonic() - started_time[0])
 
     async def pregenerate_voices(
         self,
         word_list: List[str],
         voice: Optional[str] = None,
         show_progress_bar: bool = True,
-    ) -> None:
+        limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+    ) -> PregenerateReport:
         """
         批量预生成语音文件，带进度条显示
 
+        每次按 AdaptiveConcurrencyLimiter 当前的并发上限取一批单词，调用合成后端的 synthesize_batch，
+        一批完成的名额归还后再发起下一批；批量合成中失败的单词改为单条合成重试，
+        单个单词生成失败不会中断其他单词，失败的单词记录在返回的统计结果中。
+
         Args:
             word_list: 单词列表
             voice: 语音模型，默认为初始化时设置的语音
             show_progress_bar: 是否显示进度条
+            limiter: 并发限流器，多次调用共用一个时并发数不必每次从头调整，默认每次新建
+
+        Returns:
+            本次预生成的统计结果
         """
         voice = voice or self.default_voice
+        start_time = time.monotonic()
 
-        # 过滤空单词
-        filtered_words = [word for word in word_list if word.strip()]
+        # 过滤空单词，重复的单词只算一次（合并的单元、听写提示中可能重复出现）
+        filtered_words = list(dict.fromkeys(word for word in word_list if word.strip()))
+        report = PregenerateReport(total=len(filtered_words))
         if not filtered_words:
-            return
+            return report
+
+        # 找出还没有缓存的单词（清单中没有的再查一次存储，可能已由共用缓存目录的其他进程生成）
+        missing_words = [
+            word
+            for word in self.get_uncached(filtered_words, voice)
+            if not self._adopt_from_store(self.get_file_name(word, voice), word, voice)
+        ]
+        report.cached = len(filtered_words) - len(missing_words)
 
-        # 统计已存在的缓存数量
-        existing_count = 0
-        for word in filtered_words:
-            if self._get_cache_file_path(word, voice).exists():
-                existing_count += 1
+        limiter = limiter or self.create_limiter()
+
+        # 创建进度条（tqdm 只在预生成时用到，用到时才导入）
+        from tqdm import tqdm
 
-        # 创建进度条
         with tqdm(
             total=len(filtered_words),
             desc=f"预生成语音 ({voice})",
             unit="单词",
             bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}]",
+            disable=not show_progress_bar,
         ) as pbar:
 
-            tasks = []
-
-            if not show_progress_bar:
-                pbar.disable()
-
             # 更新已存在的缓存数量
-            pbar.update(existing_count)
+            pbar.update(report.cached)
 
-            # 生成不存在的语音
-            for word in filtered_words:
-                cache_file = self._get_cache_file_path(word, voice)
-
-                # 检查缓存是否存在
-                if cache_file.exists():
-                    continue
-
-                # 缓存不存在，添加到任务队列
+            async def track(word: str, waiter: Awaitable[str]) -> None:
+                try:
+                    await waiter
+                    report.generated += 1
+                except Exception as e:
+                    report.failed[word] = str(e)
+                finally:
+                    pbar.update(1)
 
-                tasks.append(asyncio.create_task(self._generate_voice(word, voice)))
+            # 开启后处理前已有原始缓存的单词只需处理，不参与批量合成
+            batch_words = list()
+            trackers = list()
+            for word in missing_words:
+                if self._find_raw_cache(word, voice, self.get_file_name(word, voice)):
+                    trackers.append(
+                        asyncio.ensure_future(
+                            track(word, self._generate_voice(word, voice, limiter))
+                        )
+                    )
+                else:
+                    batch_words.append(word)
 
-            for task in tasks:
-                task.add_done_callback(lambda t: pbar.update(1))
+            try:
+                while batch_words:
+                    granted = await limiter.acquire_many(len(batch_words))
+                    batch, batch_words = batch_words[:granted], batch_words[granted:]
+                    tasks = await self._start_batch(batch, voice, limiter)
+                    trackers.extend(
+                        asyncio.ensure_future(track(word, asyncio.shield(task)))
+                        for word, task in zip(batch, tasks)
+                    )
+                await asyncio.gather(*trackers)
+            finally:
+                for tracker in trackers:
+                    tracker.cancel()
+                self.enforce_cache_budget()
+                self.manifest.save()
 
-            await asyncio.gather(*tasks)
+        report.elapsed = time.monotonic() - start_time
+        report.final_concurrency = limiter.limit
+        self._learned_concurrency = limiter.limit
+        return report
 
     def clear_cache(self) -> None:
         """清空所有语音缓存文件"""
         try:
             # 尝试删除文件，跳过正在使用的文件
-            for file in self.cache_dir.glob("*.mp3"):
+            for file_name, _, _ in list(self.store.scan()):
                 try:
-                    file.unlink()
+                    self.store.delete(file_name)
+                    self.manifest.remove(file_name)
                 except PermissionError:
                     raise RuntimeError(
-                        f"警告: 无法删除文件 {file}，可能仍在使用中，你不是不小心开了多个背单词小程序？"
+                        f"警告: 无法删除文件 {file_name}，可能仍在使用中，你不是不小心开了多个背单词小程序？"
                     )
+            # 包文件存储删除只是做标记，整理后才真正释放空间；
+            # 其他进程（如共用缓存目录的语音服务器）还在使用缓存时不能整理，留给 manage_voice_cache.py compact
+            try:
+                self.store.compact()
+            except RuntimeError:
+                pass
+            if self._audio_engine is not None:
+                self._audio_engine.sound_cache.clear()
         except Exception as e:
             raise RuntimeError(f"清空缓存失败: {str(e)}") from e
+        finally:
+            self.manifest.save()
+
+    def compact_cache(self) -> tuple[int, int]:
+        """
+        整理缓存存储，回收已删除语音占用的空间，返回 (整理前字节数, 整理后字节数)
+
+        其他进程正在使用缓存时抛出 RuntimeError。
+        """
+        return self.store.compact()
+
+
+class VoicePrefetcher:
+    """
+    边学边生成的语音预取器
+
+    不在开始前生成整个单元的语音，而是始终保持当前位置之后 lookahead 条语音在后台生成，
+    第一题只需等待第一条语音。生成任务在音频引擎的事件循环中执行。
+    """
+
+    def __init__(
+        self,
+        voice_player: VoicePlayerWithCache,
+        texts: List[str],
+        voice: str,
+        lookahead: int,
+    ):
+        self.voice_player = voice_player
+        self.texts = texts
+        self.voice = voice
+        self.lookahead = max(1, lookahead)
+        self._futures: Dict[int, concurrent.futures.Future] = dict()
+
+    def advance(self, index: int) -> None:
+        """当前位置移动到index，提交 index 之后 lookahead 条还没提交的生成任务"""
+        for i in range(index, min(index + self.lookahead, len(self.texts))):
+            if i not in self._futures and self.texts[i].strip():
+                self._futures[i] = self.voice_player.audio_engine.submit(
+                    self.voice_player.ensure_cached(self.texts[i], self.voice)
+                )
+
+    def wait_ready(self, index: int) -> None:
+        """
+        等待第index条语音生成完毕
+
+        生成失败时不抛出异常，朗读时会再尝试生成一次。
+        """
+        self.advance(index)
+        future = self._futures.get(index)
+        if future is None:
+            return
+        try:
+            future.result()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        """取消还没开始的生成任务"""
+        for future in self._futures.values():
+            future.cancel()
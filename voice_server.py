@@ -0,0 +1,317 @@
+"""
+多人共用的单词本和语音服务器
+
+机房里每台机器各自运行 main.py 时，每台机器都要解析一遍单词本、把同样的单词合成一遍、
+再各自保存一份缓存。在一台机器上运行服务器，其他机器用 main.py --server 连接（见 voice_client.py），
+单词本只解析一次，每条语音只合成一次，所有人共用服务器上的一份语音缓存。
+
+    python voice_server.py                             按 settings.json 中 server 的设置监听
+    python voice_server.py --host 0.0.0.0 --port 8765  允许其他机器连接
+
+服务器基于 asyncio，所有连接在同一个事件循环中处理。HTTP 接口（响应为 JSON，出错时为 {"error": ...}）：
+
+    GET  /api/node?path=单词本&path=分组   目录节点的子节点名称，或单元的单词和短语
+    GET  /api/search?q=查询&limit=20       查找单词和短语
+    GET  /api/audio?voice=语音模型&text=文本 语音数据（没有缓存时先合成），可加 &speed=0.75 取变速后的语音
+    POST /api/pregenerate                  {"voice": ..., "texts": [...]}，批量预生成，返回统计结果
+    GET  /api/status                       运行状态
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import asdict
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from audio_postprocess import check_playback_speed
+from metrics import configure_metrics, get_metrics
+from py_handle_profiles.handle_word_books import parse_all_word_books
+from py_handle_profiles.word_search import WordSearchIndex
+from voice_player_with_cache import (
+    VoicePlayerWithCache,
+    voice_player_options_from_settings,
+)
+
+BASE_DIR = Path(__file__).absolute().parent
+DEFAULT_PORT = 8765
+# 请求内容的大小上限（批量预生成的文本列表）
+MAX_BODY_BYTES = 4 * 1024 * 1024
+
+Response = Tuple[str, bytes]
+Handler = Callable[[Dict[str, List[str]], bytes], Awaitable[Response]]
+
+
+def json_response(data: Any) -> Response:
+    # 单词和短语是 WordEntry，按字典输出
+    return "application/json; charset=utf-8", json.dumps(
+        data, ensure_ascii=False, default=dict
+    ).encode("utf-8")
+
+
+def get_param(params: Dict[str, List[str]], name: str) -> str:
+    values = params.get(name)
+    if not values:
+        raise ValueError(f"缺少参数 {name}")
+    return values[0]
+
+
+def build_response(
+    status: int, content_type: str, body: bytes, keep_alive: bool
+) -> bytes:
+    head = (
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+class VoiceServer:
+    """在一个事件循环中为所有客户端提供单词本、查找和语音"""
+
+    def __init__(self, voice_player: VoicePlayerWithCache, word_books: dict):
+        """
+        Args:
+            voice_player: 所有客户端共用的语音播放器（只用来合成和读取缓存，服务器不播放）
+            word_books: parse_all_word_books() 的结果
+        """
+        self.voice_player = voice_player
+        self.word_books = word_books
+        self.search_index = WordSearchIndex(word_books)
+        # 所有客户端的批量预生成共用一个限流器，并发数不会因为客户端多而超出上限
+        self.limiter = voice_player.create_limiter()
+        self.started_time = time.time()
+        self.connections = 0
+        self.requests = 0
+
+        self.routes: Dict[Tuple[str, str], Handler] = {
+            ("GET", "/api/node"): self.handle_node,
+            ("GET", "/api/search"): self.handle_search,
+            ("GET", "/api/audio"): self.handle_audio,
+            ("POST", "/api/pregenerate"): self.handle_pregenerate,
+            ("GET", "/api/status"): self.handle_status,
+        }
+
+        metrics = get_metrics()
+        self._request_seconds = metrics.histogram(
+            "server_request_seconds", "服务器处理一个请求的耗时（包括合成）"
+        )
+        self._request_errors = metrics.counter(
+            "server_request_errors_total", "服务器返回错误的请求数"
+        )
+        self._audio_bytes = metrics.counter(
+            "server_audio_bytes_total", "服务器发送给客户端的语音字节数"
+        )
+
+    async def handle_node(self, params: Dict[str, List[str]], body: bytes) -> Response:
+        path = params.get("path", [])
+        node = self.word_books
+        for key in path:
+            if node.get("words") is not None or key not in node:
+                raise LookupError(f"单词本中没有 {' -> '.join(path)}")
+            node = node[key]
+        if node.get("words") is not None:
+            return json_response({"words": node["words"], "phrases": node["phrases"]})
+        return json_response({"children": list(node)})
+
+    async def handle_search(
+        self, params: Dict[str, List[str]], body: bytes
+    ) -> Response:
+        index = self.search_index
+        entry_ids = index.search(
+            get_param(params, "q"), int(params.get("limit", ["20"])[0])
+        )
+        return json_response(
+            [
+                {
+                    "headword": index.get_headword(index.entries[i]),
+                    "meaning": index.entries[i].get("meaning", ""),
+                    "locations": index.locations[i],
+                }
+                for i in entry_ids
+            ]
+        )
+
+    async def handle_audio(self, params: Dict[str, List[str]], body: bytes) -> Response:
+        text = get_param(params, "text")
+        if not text.strip():
+            raise ValueError("文本不能为空")
+        speed = float(params.get("speed", ["1"])[0])
+        check_playback_speed(speed)
+        audio = await self.voice_player.read_audio(
+            text, get_param(params, "voice"), speed
+        )
+        self._audio_bytes.inc(len(audio))
+        return ("audio/wav" if audio[:4] == b"RIFF" else "audio/mpeg"), audio
+
+    async def handle_pregenerate(
+        self, params: Dict[str, List[str]], body: bytes
+    ) -> Response:
+        request = json.loads(body)
+        texts = request.get("texts") if isinstance(request, dict) else None
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            raise ValueError("texts 应为字符串列表")
+        report = await self.voice_player.pregenerate_voices(
+            texts,
+            voice=request.get("voice"),
+            show_progress_bar=False,
+            limiter=self.limiter,
+        )
+        return json_response(asdict(report))
+
+    async def handle_status(
+        self, params: Dict[str, List[str]], body: bytes
+    ) -> Response:
+        manifest = self.voice_player.manifest
+        return json_response(
+            {
+                "uptime": time.time() - self.started_time,
+                "connections": self.connections,
+                "requests": self.requests,
+                "word_books": len(self.word_books),
+                "search_entries": len(self.search_index.entries),
+                "cache_entries": len(manifest.entries),
+                "cache_bytes": manifest.total_size(),
+                "synthesis_concurrency": self.limiter.limit,
+            }
+        )
+
+    async def dispatch(
+        self, method: str, target: str, body: bytes
+    ) -> Tuple[int, Response]:
+        """调用对应的接口，返回 (状态码, (Content-Type, 响应内容))"""
+        start_time = time.monotonic()
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        try:
+            if handler is None:
+                raise LookupError(f"接口 {method} {url.path} 不存在")
+            status, response = 200, await handler(parse_qs(url.query), body)
+        except LookupError as e:
+            status, response = 404, json_response({"error": str(e)})
+        except ValueError as e:
+            status, response = 400, json_response({"error": str(e)})
+        except Exception as e:
+            # 合成失败等，客户端朗读时会显示错误，服务器继续运行
+            status, response = 500, json_response({"error": str(e)})
+
+        self.requests += 1
+        if status != 200:
+            self._request_errors.inc()
+        self._request_seconds.observe(time.monotonic() - start_time)
+        return status, response
+
+    @staticmethod
+    async def read_request(
+        reader: asyncio.StreamReader,
+    ) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """读取一个请求，返回 (方法, 路径, 请求头, 请求内容)，连接已关闭时返回None"""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+        headers = dict()
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY_BYTES:
+            raise ValueError("请求内容过大")
+        body = await reader.readexactly(length) if length else b""
+        return method, target, headers, body
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """处理一个客户端连接上的所有请求（HTTP/1.1 长连接）"""
+        self.connections += 1
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, (content_type, payload) = await self.dispatch(
+                    method, target, body
+                )
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(build_response(status, content_type, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # 客户端断开或请求格式错误，直接关闭连接
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        addresses = ", ".join(
+            "{}:{}".format(*sock.getsockname()[:2]) for sock in server.sockets
+        )
+        print(
+            f"语音服务器已启动: {addresses}，单词本 {len(self.word_books)} 本，"
+            f"语音缓存 {len(self.voice_player.manifest.entries)} 条，按 Ctrl+C 停止"
+        )
+        async with server:
+            await server.serve_forever()
+
+
+def main() -> None:
+    with open(BASE_DIR / "settings.json", "r", encoding="utf-8") as f:
+        settings = json.load(f)
+    server_settings = settings.get("server", dict())
+
+    parser = argparse.ArgumentParser(description="多人共用的单词本和语音服务器")
+    parser.add_argument(
+        "--host",
+        default=server_settings.get("host", "127.0.0.1"),
+        help="监听地址，允许其他机器连接时为 0.0.0.0",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=server_settings.get("port", DEFAULT_PORT),
+        help=f"监听端口，默认为 {DEFAULT_PORT}",
+    )
+    args = parser.parse_args()
+
+    metrics_settings = settings.get("metrics", dict())
+    if metrics_settings.get("enabled", False):
+        configure_metrics(
+            enabled=True,
+            path=BASE_DIR / metrics_settings.get("path", "learning_data/metrics.prom"),
+            format=metrics_settings.get("format", "prometheus"),
+            export_interval=metrics_settings.get("export_interval", 30),
+        )
+
+    voice_settings = settings["voice"]
+    voice_player = VoicePlayerWithCache(
+        default_voice=voice_settings[voice_settings["english_pronunciation"]],
+        **voice_player_options_from_settings(settings),
+    )
+    server = VoiceServer(voice_player, parse_all_word_books())
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("语音服务器已停止")
+    finally:
+        voice_player.manifest.save()
+        if voice_player.postprocessor is not None:
+            voice_player.postprocessor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,19 +3,83 @@
 支持中英文语音朗读、错误记录和多轮复习机制
 """
 
-import asyncio
+import concurrent.futures
 import os
 import random
+import time
 from typing import Optional, List, Dict, Any, Union
 
 import colorama
-from tabulate import tabulate
-from colorama import Fore, Cursor
+from colorama import Fore
+from audio_engine import AudioEngine, configure_audio_engine
+from metrics import get_metrics
+from session_io import SessionIO, TerminalIO
+from session_log import SessionEventLog
+from spaced_repetition import ReviewScheduler, get_review_key
+from terminal_render import TerminalRenderer
+from voice_client import RemoteVoicePlayer
 from voice_player_with_cache import VoicePlayerWithCache
-import sys
-import platform
-from time import sleep
-import pygame
+
+PARTS_OF_SPEECH_MAP = {
+    "n.": "名词",
+    "v.": "动词",
+    "adj.": "形容词",
+    "adv.": "副词",
+    "prep.": "介词",
+    "conj.": "连词",
+    "pron.": "代词",
+    "intj.": "感叹词",
+    "num.": "数字",
+    "art.": "冠词",
+}
+
+
+def get_chinese_pos(
+    part_of_speech: str, parts_of_speech_map: Dict[str, str] = PARTS_OF_SPEECH_MAP
+) -> str:
+    """
+    将英文词性描述转换为对应的中文描述。
+    若英文词性包含多个用 '/' 分隔的值，会将每个值转换为中文后用 '或' 连接。
+
+    Args:
+        part_of_speech: 英文词性描述，可能包含多个用 '/' 分隔的值。
+        parts_of_speech_map: 英文词性到中文的映射
+
+    Returns:
+        对应的中文词性描述，若未找到对应翻译则返回原英文词性。
+    """
+    if "/" in part_of_speech:
+        pos_list = [p.strip() for p in part_of_speech.split("/")]
+        chinese_pos = "或".join(parts_of_speech_map.get(p, p) for p in pos_list)
+    else:
+        chinese_pos = parts_of_speech_map.get(part_of_speech, part_of_speech)
+
+    return chinese_pos
+
+
+def build_dictation_read_list(
+    unit_data: Dict[str, List[Dict[str, Any]]],
+    parts_of_speech_map: Dict[str, str] = PARTS_OF_SPEECH_MAP,
+) -> List[str]:
+    """
+    生成听写时朗读的中文提示（顺序与 words + phrases 一致）
+
+    Args:
+        unit_data: 包含单词和短语数据的字典（需包含 'words' 和 'phrases' 键）
+        parts_of_speech_map: 英文词性到中文的映射
+
+    Returns:
+        每个单词/短语对应的中文提示文本列表
+    """
+    return [
+        f"{get_chinese_pos(word['part_of_speech'], parts_of_speech_map)}，"
+        f"{word['meaning']}"
+        for word in unit_data["words"]
+    ] + [
+        f"短语，{get_chinese_pos(phrase.get('part_of_speech', ''), parts_of_speech_map)}，"
+        f"{phrase['meaning']}"
+        for phrase in unit_data["phrases"]
+    ]
 
 
 class WordLearner:
@@ -23,56 +87,77 @@ class WordLearner:
     单词学习核心控制器，提供以下功能：
     - 单词/短语的快速浏览、学习练习、听写测试
     - 语音播放（支持单词发音、中文提示）及预生成缓存
-    - 跨平台终端交互（清屏、无缓冲输入、输入缓冲区清理）
+    - 终端交互（清屏、输入），通过 SessionIO 完成，可以换成脚本输入（见 session_io.py）
     - 学习过程中的错误记录与重复练习
 
     所有方法均包含独立的清屏逻辑，确保终端界面整洁。
     """
 
-    def __init__(self, default_zh_cn_voice: str, default_en_voice: str) -> None:
+    def __init__(
+        self,
+        default_zh_cn_voice: str,
+        default_en_voice: str,
+        voice_player_options: Optional[Dict[str, Any]] = None,
+        prefetch_lookahead: int = 0,
+        sound_cache_max_bytes: Optional[int] = None,
+        review_scheduler: Optional[ReviewScheduler] = None,
+        event_log: Optional[SessionEventLog] = None,
+        io: Optional[SessionIO] = None,
+        voice_player: Optional[Union[VoicePlayerWithCache, RemoteVoicePlayer]] = None,
+    ) -> None:
         """
         初始化单词学习器，配置语音参数和系统环境
 
         Args:
             default_zh_cn_voice: 中文默认语音模型（如 'zh-CN-XiaoxiaoNeural'）
             default_en_voice: 英文默认语音模型（如 'en-US-AriaNeural'）
+            voice_player_options: 传给 VoicePlayerWithCache 的额外参数（如并发数、重试次数）
+            prefetch_lookahead: 大于0时边学边生成语音，始终提前生成接下来这么多条；
+                为0时在开始前生成整个单元的语音
+            sound_cache_max_bytes: 解码后音频的内存缓存上限（字节），None为使用默认值
+            review_scheduler: 间隔重复复习调度器，为None时不记录复习状态，也不能使用复习模式
+            event_log: 作答事件日志，为None时不记录
+            io: 输入输出，默认为真实的终端（见 session_io.py）
+            voice_player: 语音播放器，默认按 voice_player_options 创建；
+                连接语音服务器时传入 RemoteVoicePlayer（见 voice_client.py）
         """
-        self.user_system_type = platform.system()
-        pygame.mixer.init()
-
-        self.parts_of_speech_map = {
-            "n.": "名词",
-            "v.": "动词",
-            "adj.": "形容词",
-            "adv.": "副词",
-            "prep.": "介词",
-            "conj.": "连词",
-            "pron.": "代词",
-            "intj.": "感叹词",
-            "num.": "数字",
-            "art.": "冠词",
-        }
+        self.io = io or TerminalIO()
+        # 音频引擎（pygame）在第一次朗读时才创建
+        configure_audio_engine(sound_cache_max_bytes=sound_cache_max_bytes)
+
+        self.parts_of_speech_map = dict(PARTS_OF_SPEECH_MAP)
 
         self.default_zh_cn_voice = default_zh_cn_voice
         self.default_en_voice = default_en_voice
-
-        self.voice_player: VoicePlayerWithCache = VoicePlayerWithCache(
-            default_voice=self.default_en_voice
+        self.prefetch_lookahead = prefetch_lookahead
+        self.review_scheduler = review_scheduler
+        self.event_log = event_log
+        # 不等待播放结束的朗读出错时由音频引擎的线程记下，下一题画出之前再显示
+        self._background_speak_errors: List[BaseException] = list()
+
+        self.voice_player: Union[VoicePlayerWithCache, RemoteVoicePlayer] = (
+            voice_player
+            or VoicePlayerWithCache(
+                default_voice=self.default_en_voice,
+                **(voice_player_options or dict()),
+            )
         )
         colorama.init()
+        self.renderer = TerminalRenderer(use_ansi=self.io.use_ansi, write=self.io.write)
 
-    def clear_input_buffer(self) -> None:
-        """清除标准输入缓冲区中的残留数据"""
-        if self.user_system_type == "Windows":
-            import msvcrt
-
-            while msvcrt.kbhit():
-                msvcrt.getch()
-        else:
-            import select
+        metrics = get_metrics()
+        self._item_seconds = metrics.histogram(
+            "quiz_item_seconds",
+            "学习、练习、复习中每道题从出现到答对的用时",
+            buckets=(1, 2, 3, 5, 8, 13, 20, 30, 60, 120),
+        )
+        self._wrong_answers = metrics.counter(
+            "quiz_wrong_answers_total", "学习、练习、复习中答错的次数"
+        )
 
-            while select.select([sys.stdin], [], [], 0)[0]:
-                sys.stdin.readline()
+    @property
+    def audio_engine(self) -> AudioEngine:
+        return self.voice_player.audio_engine
 
     def unbuffered_input(self, prompt: str = "") -> str:
         """
@@ -84,20 +169,44 @@ class WordLearner:
         Returns:
             用户输入的字符串
         """
-        self.clear_input_buffer()
-        return input(prompt)
+        return self.io.input(prompt)
 
-    def speak(self, text: str, voice: Optional[str] = None) -> None:
+    def speak(self, text: str, voice: Optional[str] = None, wait: bool = True) -> None:
         """
-        调用语音播放器朗读指定文本
+        调用语音播放器朗读指定文本（在音频引擎的后台事件循环中执行）
 
         Args:
             text: 待朗读的文本内容
             voice: 语音模型名称，默认为None（使用self.default_en_voice）
+            wait: 是否等待播放结束。为False时立即返回，下一次朗读会打断这一次；
+                出错时不抛出异常，由 report_background_speak_errors 显示
         """
         if voice is None:
             voice = self.default_en_voice
-        asyncio.run(self.voice_player.speak(text, voice=voice))
+        future = self.audio_engine.submit(self.voice_player.speak(text, voice=voice))
+        if wait:
+            future.result()
+        else:
+            future.add_done_callback(self._record_background_speak_error)
+
+    def _record_background_speak_error(self, future: concurrent.futures.Future) -> None:
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self._background_speak_errors.append(error)
+
+    def report_background_speak_errors(self) -> None:
+        """显示不等待播放结束的朗读中出现的错误（如语音生成失败），没有错误时什么也不做"""
+        if not self._background_speak_errors:
+            return
+        errors = self._background_speak_errors
+        self._background_speak_errors = list()
+        # 提示会打乱屏幕上的内容，清屏后下一次 draw 整屏重画
+        self.renderer.clear()
+        for error in errors:
+            self.io.print(f"{Fore.YELLOW}朗读失败: {error}{Fore.RESET}")
+        self.io.pause(2)
 
     def pregenerate_voices(
         self, word_list: List[str], voice: Optional[str] = None
@@ -111,14 +220,21 @@ class WordLearner:
         """
         if voice is None:
             voice = self.default_en_voice
-        asyncio.run(self.voice_player.pregenerate_voices(word_list, voice=voice))
+        report = self.audio_engine.run(
+            self.voice_player.pregenerate_voices(
+                word_list, voice=voice, show_progress_bar=self.io.interactive
+            )
+        )
+        if report.failed:
+            self.io.print(
+                f"{Fore.YELLOW}部分语音预生成失败，播放时会重新生成:{Fore.RESET}"
+            )
+            self.io.print(report.summary())
+            self.io.pause(2)
 
     def clear(self) -> None:
         """清空终端屏幕（跨平台兼容）"""
-        if self.user_system_type == "Windows":
-            os.system("cls")
-        else:
-            os.system("clear")
+        self.renderer.clear()
 
     def process_section(
         self,
@@ -138,7 +254,7 @@ class WordLearner:
             key_type: 校验的关键字段（如 'word' 或 'phrase'，用于比对用户输入）
             learning: 是否为学习模式（True则展示单词详情，False则仅提示释义）
             other_wrong_count: 其他部分（如单词/短语）已累计的错误数，用于总错误统计
-            other_args: 额外参数（如首字母提示开关），格式为字典
+            other_args: 额外参数（如首字母提示开关、学习模式、单元路径），格式为字典
 
         Returns:
             学习过程中用户答错的单词/短语列表
@@ -147,6 +263,8 @@ class WordLearner:
 
         # import args from other_args
         first_letter_tip = other_args.get("first_letter_tip", False)
+        mode = other_args.get("mode", "learn" if learning else "practice")
+        unit_name = other_args.get("unit_name", "")
 
         wrong_list = []
         words = section_data.copy()
@@ -155,59 +273,95 @@ class WordLearner:
 
         first_letter: str
 
-        for word in words:
+        prefetcher = None
+        if self.prefetch_lookahead > 0:
+            prefetcher = self.voice_player.prefetch(
+                [word[key_type] for word in words],
+                voice=self.default_en_voice,
+                lookahead=self.prefetch_lookahead,
+            )
+
+        for index, word in enumerate(words):
+            if prefetcher is not None:
+                prefetcher.advance(index)
+            item_start_time = time.monotonic()
             passed = True
             last_wrong_input = ""
             while True:
-                self.clear()
-
-                # print header
-                print(
-                    f"--{section_type}--  ",
-                    f"剩下: {left_words}" f" 错: {len(wrong_list)
-                            + other_wrong_count}\n\n\n",
-                )
-                # wrong word header
-                if not passed:
-                    print("That is wrong: " + Fore.RED + last_wrong_input + Fore.RESET)
-
-                # print word tip
+                self.report_background_speak_errors()
+                # header
+                header_lines = [
+                    f"--{section_type}--   剩下: {left_words}"
+                    f" 错: {len(wrong_list) + other_wrong_count}",
+                    "",
+                    "",
+                    "",
+                ]
+
+                # word tip (with wrong word header)
                 if learning or not passed:
-                    print(tabulate([word], headers="keys"))
-                    self.speak(word[key_type])
-                    self.unbuffered_input("按回车继续")
-                    self.clear()
-                    print(
-                        f"--{section_type}--  ",
-                        f"剩下: {left_words}" f" 错: {len(wrong_list)
-                                + other_wrong_count}\n\n\n",
-                    )
+                    from tabulate import tabulate
+
+                    tip_lines = [tabulate([dict(word)], headers="keys"), "按回车继续"]
+                    if not passed:
+                        tip_lines.insert(
+                            0,
+                            "That is wrong: "
+                            + Fore.RED
+                            + last_wrong_input
+                            + Fore.RESET,
+                        )
+                    self.renderer.draw(header_lines + tip_lines)
+                    if prefetcher is not None:
+                        prefetcher.wait_ready(index)
+                    # 不等待播放结束，边听边按回车
+                    self.speak(word[key_type], wait=False)
+                    self.unbuffered_input()
 
                 # handle user input
                 first_letter = word[key_type][0] if first_letter_tip else ""
                 user_input_tip = f"{word.get('part_of_speech', '')}{word['meaning']}: "
-                print(user_input_tip + first_letter, end="")
+                self.renderer.draw(header_lines + [user_input_tip + first_letter])
+                start_time = time.monotonic()
                 user_input = (first_letter + self.unbuffered_input()).strip()
 
+                if self.event_log is not None:
+                    self.event_log.record(
+                        get_review_key(word),
+                        mode,
+                        user_input == word[key_type],
+                        user_input,
+                        time.monotonic() - start_time,
+                        unit=unit_name,
+                    )
+
                 if user_input == word[key_type]:
-                    print(
-                        f"{Cursor.UP(1)}\r{user_input_tip}{Fore.GREEN}{user_input}"
-                        f"{Fore.RESET} {word.get('phonetic_symbol', '')}",
-                        " " * 50,
+                    # 答对后把输入行改成绿色，下一题只重画变化的行
+                    self.renderer.draw(
+                        header_lines
+                        + [
+                            f"{user_input_tip}{Fore.GREEN}{user_input}"
+                            f"{Fore.RESET} {word.get('phonetic_symbol', '')}"
+                        ]
                     )
-                    self.speak(user_input)
-                    self.clear()
+                    if prefetcher is not None:
+                        prefetcher.wait_ready(index)
+                    self.speak(user_input, wait=False)
                     left_words -= 1
+                    self._item_seconds.observe(time.monotonic() - item_start_time)
                     break
 
+                self._wrong_answers.inc()
+
                 # if not passed but status doesn't change
                 if passed:
                     wrong_list.append(word)
                     passed = False
 
                 last_wrong_input = user_input
-                self.clear()
 
+        if prefetcher is not None:
+            prefetcher.close()
         return wrong_list
 
     def fast_view_once(
@@ -264,19 +418,72 @@ class WordLearner:
             learning: 是否为学习模式
             other_args: 额外参数（如首字母提示）
         """
-        self.pregenerate_voices(
-            [word["word"] for word in unit_data["words"]]
-            + [phrase["phrase"] for phrase in unit_data["phrases"]]
-        )
+        # 开启预取时由 process_section 边学边生成
+        if self.prefetch_lookahead <= 0:
+            self.pregenerate_voices(
+                [word["word"] for word in unit_data["words"]]
+                + [phrase["phrase"] for phrase in unit_data["phrases"]]
+            )
 
         wrong_data = self.fast_view_once(
             unit_data, learning=learning, other_args=other_args
         )
+        # 第一轮的结果决定下次复习的时间，之后重复练习错题不再记录；
+        # 学习模式先显示答案再作答，答对不代表记住，不记入复习记录
+        if self.review_scheduler is not None and not learning:
+            self.review_scheduler.record_results(
+                unit_data["words"] + unit_data["phrases"],
+                wrong_data["words"] + wrong_data["phrases"],
+            )
+            self.review_scheduler.save()
+
         while wrong_data.get("words", []) or wrong_data.get("phrases", []):
             wrong_data = self.fast_view_once(
                 wrong_data, learning=learning, other_args=other_args
             )
 
+    def review(
+        self,
+        unit_data: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+        limit: Optional[int] = None,
+        other_args: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        间隔重复复习：只练习已到期的单词和短语，练习方式与「练习」模式相同
+
+        Args:
+            unit_data: 只复习该单元中到期的内容，None为复习所有单词本中到期的内容
+            limit: 本次最多复习的条数，None为不限制
+            other_args: 额外参数（同 fast_view）
+        """
+        if self.review_scheduler is None:
+            return
+
+        if unit_data is None:
+            # 从堆中按到期时间取出，不需要遍历整个词库
+            due_items = self.review_scheduler.pop_due(limit)
+        else:
+            due_items = [
+                item
+                for item in unit_data["words"] + unit_data["phrases"]
+                if self.review_scheduler.is_due(item)
+            ][:limit]
+
+        if not due_items:
+            self.clear()
+            self.io.print("当前没有需要复习的内容")
+            self.io.pause(2)
+            return
+
+        self.fast_view(
+            {
+                "words": [item for item in due_items if "phrase" not in item],
+                "phrases": [item for item in due_items if "phrase" in item],
+            },
+            learning=False,
+            other_args={**(other_args or dict()), "mode": "review"},
+        )
+
     def get_chinese_pos(self, part_of_speech: str) -> str:
         """
         将英文词性描述转换为对应的中文描述。
@@ -288,15 +495,37 @@ class WordLearner:
         Returns:
             对应的中文词性描述，若未找到对应翻译则返回原英文词性。
         """
-        if "/" in part_of_speech:
-            pos_list = [p.strip() for p in part_of_speech.split("/")]
-            chinese_pos = "或".join(
-                self.parts_of_speech_map.get(p, p) for p in pos_list
-            )
-        else:
-            chinese_pos = self.parts_of_speech_map.get(part_of_speech, part_of_speech)
+        return get_chinese_pos(part_of_speech, self.parts_of_speech_map)
 
-        return chinese_pos
+    def get_dictation_read_list(
+        self, unit_data: Dict[str, List[Dict[str, Any]]]
+    ) -> List[str]:
+        """
+        生成听写时朗读的中文提示（顺序与 words + phrases 一致）
+
+        Args:
+            unit_data: 包含单词和短语数据的字典（需包含 'words' 和 'phrases' 键）
+
+        Returns:
+            每个单词/短语对应的中文提示文本列表
+        """
+        return build_dictation_read_list(unit_data, self.parts_of_speech_map)
+
+    def pin_unit(self, unit_data: Dict[str, List[Dict[str, Any]]]) -> None:
+        """
+        固定单元用到的语音缓存（英文发音和听写提示），缓存超出上限时不会被淘汰
+
+        Args:
+            unit_data: 包含单词和短语数据的字典（需包含 'words' 和 'phrases' 键）
+        """
+        self.voice_player.pin(
+            [word["word"] for word in unit_data["words"]]
+            + [phrase["phrase"] for phrase in unit_data["phrases"]],
+            voice=self.default_en_voice,
+        )
+        self.voice_player.pin(
+            self.get_dictation_read_list(unit_data), voice=self.default_zh_cn_voice
+        )
 
     def dictation(
         self,
@@ -333,68 +562,59 @@ class WordLearner:
         total_items = len(unit_data["words"]) + len(unit_data["phrases"])
         items = unit_data["words"] + unit_data["phrases"]
 
-        read_list = [
-            f"{self.get_chinese_pos(word['part_of_speech'])}，{word['meaning']}"
-            for word in unit_data["words"]
-        ] + [
-            f"短语，{self.get_chinese_pos(phrase.get('part_of_speech', ''))}，"
-            f"{phrase['meaning']}"
-            for phrase in unit_data["phrases"]
-        ]
-        asyncio.run(
-            self.voice_player.pregenerate_voices(
-                read_list, voice=self.default_zh_cn_voice
+        read_list = self.get_dictation_read_list(unit_data)
+        prefetcher = None
+        if self.prefetch_lookahead > 0:
+            # 提示音播放期间就开始生成前几条
+            prefetcher = self.voice_player.prefetch(
+                read_list,
+                voice=self.default_zh_cn_voice,
+                lookahead=self.prefetch_lookahead,
             )
-        )
+            prefetcher.advance(0)
+        else:
+            self.pregenerate_voices(read_list, voice=self.default_zh_cn_voice)
 
         if use_dictation_start_sound:
             self.clear()
-            print(f"{Fore.YELLOW}READY GO!{Fore.RESET}")
-            # 停止当前可能正在播放的音频
-            if pygame.mixer.music.get_busy():
-                pygame.mixer.music.stop()
-
-            # 加载并播放
-            pygame.mixer.music.load(
-                os.path.join(
-                    os.path.dirname(os.path.abspath(__file__)),
-                    "audios",
-                    "dictation_audio-ready_go.wav",
-                )
+            self.io.print(f"{Fore.YELLOW}READY GO!{Fore.RESET}")
+            # 打断当前可能正在播放的音频，播放完成后返回
+            ready_go_path = os.path.join(
+                os.path.dirname(os.path.abspath(__file__)),
+                "audios",
+                "dictation_audio-ready_go.wav",
             )
-            pygame.mixer.music.play()
-
-            # 等待播放完成
-            while pygame.mixer.music.get_busy():
-                import time
-
-                time.sleep(0.1)  # 每 0.1 秒检查一次播放状态
+            self.audio_engine.play(ready_go_path, cache_key=ready_go_path)
 
         for item in items:
             self.clear()
-            print(
+            self.io.print(
                 f"--dictation--  original: {current_count} total: {total_items}\n\n\n"
             )
-            print(f"{item.get('part_of_speech', '')}{item['meaning']}")
+            self.io.print(f"{item.get('part_of_speech', '')}{item['meaning']}")
+            if prefetcher is not None:
+                prefetcher.wait_ready(current_count - 1)
             self.speak(read_list[current_count - 1], voice=self.default_zh_cn_voice)
             self.speak(read_list[current_count - 1], voice=self.default_zh_cn_voice)
-            sleep(delay)
+            self.io.pause(delay)
 
             answer_lines.append(
                 f"{current_count}. {item.get('part_of_speech', '')}{item.get('word') or item.get('phrase')} ----- {item['meaning']}"
             )
             current_count += 1
         self.clear()
+        if prefetcher is not None:
+            prefetcher.close()
 
         # 恢复原始语音设置
         self.voice_player.default_voice = original_voice
 
         # 输出结果
-        print("dictation finished")
+        self.io.print("dictation finished")
         self.speak("dictation finished")
 
         full_answer = "\n".join(answer_lines)
-        print(full_answer)
+        self.io.print(full_answer)
         self.unbuffered_input("按回车退出")
         self.clear()
 
@@ -412,7 +632,7 @@ class WordLearner:
             all_items.extend(unit_data["phrases"])
 
         for item in all_items:
-            print(
+            self.io.print(
                 f'{item["word"] if "word" in item else item["phrase"]} ----- '
                 f'{item.get("part_of_speech", "")}{item["meaning"]}  '
                 f'{item.get("phonetic_symbol", "")}'